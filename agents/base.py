@@ -0,0 +1,63 @@
+from __future__ import annotations
+import time
+from pydantic_ai import Agent
+from utils.anthropic_client import UsageMeter, get_client
+from utils.logging_config import Payload
+from utils.metrics import get_metrics
+from utils.model_router import ModelRouter, get_model_router
+from utils.prompt_builder import estimate_tokens
+from typing import Optional
+
+
+class SpecAgent(Agent):
+    """Base commune des agents : appels au modèle via le client Anthropic partagé."""
+
+    # Priorité des requêtes de l'agent auprès du limiteur de débit (0 = la plus urgente)
+    REQUEST_PRIORITY = 0
+
+    # Modèle imposé à la construction (None = choix par le routeur de modèles)
+    pinned_model: Optional[str] = None
+    model_router: Optional[ModelRouter] = None
+
+    def __init__(self, model: str, **kwargs):
+        # Les appels passent par `complete` : le modèle pydantic_ai (et le SDK
+        # Anthropic qu'il importe) n'est résolu qu'à un éventuel premier run
+        kwargs.setdefault("defer_model_check", True)
+        super().__init__(model, **kwargs)
+
+    def route(self, stage: str, prompt: str, score: Optional[float] = None, final: bool = False) -> str:
+        """Choisit le modèle de l'appel selon l'étape, la taille du prompt et le score courant."""
+        if self.pinned_model:
+            return self.pinned_model
+        router = self.model_router or get_model_router()
+        input_tokens = estimate_tokens(self.system_prompt) + estimate_tokens(prompt)
+        return router.select(stage, input_tokens, score, final)
+
+    def complete(self, prompt: str, model: Optional[str] = None, stage: str = "default") -> str:
+        """Envoie le prompt au modèle choisi avec le prompt système de l'agent."""
+        model = model or self.model_name
+        client = self.client or get_client()
+        meter = UsageMeter()
+        requests = get_metrics().counter(
+            "llm_requests_total", "Appels au modèle par étape et issue", ("stage", "model", "outcome")
+        )
+        # Le prompt n'est formaté (et tronqué) que si le niveau DEBUG est émis
+        self.logger.debug("Prompt envoyé au modèle %s (%s) : %s", model, stage, Payload(prompt))
+        started_at = time.monotonic()
+        try:
+            response = client.generate(
+                prompt=prompt,
+                system_prompt=self.system_prompt,
+                model=model,
+                priority=self.REQUEST_PRIORITY,
+                meter=meter
+            )
+        except Exception:
+            requests.inc(stage=stage, model=model, outcome="error")
+            raise
+        requests.inc(stage=stage, model=model, outcome="success")
+        self.logger.debug("Réponse du modèle %s (%s) : %s", model, stage, Payload(response))
+        (self.model_router or get_model_router()).record(
+            stage, model, time.monotonic() - started_at, meter.input_tokens, meter.output_tokens
+        )
+        return response
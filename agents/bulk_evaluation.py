@@ -0,0 +1,224 @@
+from __future__ import annotations
+import argparse
+import json
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from agents.evaluator import Evaluator
+from agents.workflow import WorkflowContext
+from models.specifications import (
+    VersionedWebSpecification,
+    WebSpecification,
+    VersionMetadata,
+    ModificationType
+)
+from utils.context_manager import ContextManager, get_context_manager
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics
+
+
+@dataclass
+class BulkItem:
+    """Spécification à évaluer, avec son identifiant et son contexte initial."""
+    item_id: str
+    specification: Dict[str, Any]
+    context: Optional[str] = None
+
+
+@dataclass
+class BulkReport:
+    """Bilan d'une évaluation en masse."""
+    total: int = 0
+    evaluated: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+
+def _to_item(record: Dict[str, Any], default_id: str) -> BulkItem:
+    # Un enregistrement est soit une spécification brute, soit une enveloppe {id, context, specification}
+    if "specification" in record:
+        return BulkItem(
+            item_id=str(record.get("id", default_id)),
+            specification=record["specification"],
+            context=record.get("context")
+        )
+    return BulkItem(item_id=str(record.get("id", default_id)), specification=record)
+
+
+def load_items(source: str) -> Iterator[BulkItem]:
+    """Lit les spécifications d'un dossier de fichiers JSON ou d'un fichier JSONL, au fil de l'eau."""
+    path = Path(source)
+    if path.is_dir():
+        for file in sorted(path.glob("*.json")):
+            with open(file, encoding="utf-8") as f:
+                yield _to_item(json.load(f), file.stem)
+        return
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                yield _to_item(json.loads(line), f"{path.stem}:{line_number}")
+
+
+def read_completed_ids(output_path: str) -> Set[str]:
+    """Identifiants déjà évalués avec succès dans un fichier de sortie (reprise après interruption)."""
+    completed: Set[str] = set()
+    path = Path(output_path)
+    if not path.exists():
+        return completed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Dernière ligne tronquée par un arrêt brutal
+                continue
+            if "evaluation" in record:
+                completed.add(record["id"])
+    return completed
+
+
+def repair_output(output_path: str) -> None:
+    """Retire la dernière ligne d'un fichier de sortie si elle a été tronquée par un arrêt brutal.
+
+    Les résultats de la reprise sont ainsi ajoutés sur une nouvelle ligne ;
+    l'enregistrement tronqué, absent des identifiants terminés, est réévalué.
+    """
+    path = Path(output_path)
+    if not path.exists():
+        return
+    with open(path, "r+b") as f:
+        end = f.seek(0, 2)
+        position = end
+        while position > 0:
+            block = min(position, 65536)
+            f.seek(position - block)
+            newline = f.read(block).rfind(b"\n")
+            if newline >= 0:
+                position = position - block + newline + 1
+                break
+            position -= block
+        if position < end:
+            f.truncate(position)
+
+
+class BulkEvaluator:
+    """Évaluation en masse de spécifications archivées.
+
+    Les spécifications sont lues au fil de l'eau et soumises à l'Evaluator par
+    groupes de `batch_size`, avec au plus `concurrency` évaluations simultanées.
+    Chaque résultat est ajouté immédiatement au fichier JSONL de sortie, qui
+    sert aussi de point de reprise : une nouvelle exécution ignore les
+    identifiants déjà évalués avec succès et retente les échecs.
+    """
+
+    def __init__(
+        self,
+        evaluator: Optional[Evaluator] = None,
+        context_manager: Optional[ContextManager] = None,
+        concurrency: int = 4,
+        batch_size: int = 20
+    ):
+        self.context_manager = context_manager or get_context_manager()
+        self.evaluator = evaluator or Evaluator(context_manager=self.context_manager)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.logger = get_logger("BulkEvaluator")
+
+    def run(self, source: str, output_path: str) -> BulkReport:
+        report = BulkReport()
+        completed = read_completed_ids(output_path)
+        repair_output(output_path)
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+        with open(output_path, "a", encoding="utf-8") as output, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = set()
+            for item in load_items(source):
+                report.total += 1
+                if item.item_id in completed:
+                    report.skipped += 1
+                    continue
+                pending.add(executor.submit(self._evaluate, item))
+                # Nombre borné de tâches en vol pour garder une mémoire constante
+                if len(pending) >= self.batch_size:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._write(done, output, report)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                self._write(done, output, report)
+
+        self.logger.info(
+            f"Évaluation en masse terminée : {report.evaluated} évaluées, "
+            f"{report.skipped} déjà traitées, {report.failed} en échec sur {report.total}"
+        )
+        return report
+
+    def _write(self, futures, output, report: BulkReport) -> None:
+        for future in futures:
+            record = future.result()
+            if "error" in record:
+                report.failed += 1
+            else:
+                report.evaluated += 1
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+
+    def _evaluate(self, item: BulkItem) -> Dict[str, Any]:
+        project_id = f"bulk:{item.item_id}"
+        try:
+            with self.context_manager.project_scope(project_id):
+                spec, context = self._prepare(item)
+                evaluation = self.evaluator.evaluate_specification(
+                    WorkflowContext(value=context, project_id=project_id), spec
+                )
+            return {"id": item.item_id, "evaluation": evaluation.model_dump(mode="json")}
+        except Exception as e:
+            self.logger.error(f"Échec de l'évaluation de {item.item_id} : {e}")
+            return {"id": item.item_id, "error": str(e)}
+
+    def _prepare(self, item: BulkItem) -> Tuple[VersionedWebSpecification, str]:
+        """Enregistre la spécification comme version (si nécessaire) et détermine son contexte."""
+        data = dict(item.specification)
+        metadata = data.pop("metadata", None)
+        base_spec = WebSpecification.model_validate(data)
+        if metadata is None:
+            version_id = self.context_manager.store_specification_version(
+                specification_data=base_spec,
+                agent_name="BulkEvaluator",
+                action_type="creation"
+            )
+            metadata = VersionMetadata(
+                version_id=version_id,
+                agent_name="BulkEvaluator",
+                modification_type=ModificationType.CREATION,
+                comment=f"Import pour évaluation en masse ({item.item_id})"
+            )
+        else:
+            metadata = VersionMetadata.model_validate(metadata)
+        spec = VersionedWebSpecification.from_specification(base_spec, metadata)
+        return spec, item.context or base_spec.description
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Évaluation en masse de spécifications archivées")
+    parser.add_argument("source", help="Dossier de fichiers JSON ou fichier JSONL de spécifications")
+    parser.add_argument("-o", "--output", default="bulk_evaluations.jsonl", help="Fichier JSONL de résultats")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Évaluations simultanées")
+    parser.add_argument("-b", "--batch-size", type=int, default=20, help="Nombre maximal de tâches en vol")
+    parser.add_argument("--metrics", help="Fichier JSON où écrire les métriques en fin d'exécution")
+    args = parser.parse_args(argv)
+
+    report = BulkEvaluator(concurrency=args.concurrency, batch_size=args.batch_size).run(
+        args.source, args.output
+    )
+    if args.metrics:
+        get_metrics().dump_json(args.metrics)
+    print(json.dumps(report.__dict__))
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
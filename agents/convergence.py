@@ -0,0 +1,129 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from models.specifications import EvaluationResult, OptimizationResult, VersionedWebSpecification
+from utils.anthropic_client import UsageMeter
+
+# Raisons d'arrêt de la boucle d'optimisation
+TARGET_REACHED = "target_reached"
+MAX_ITERATIONS = "max_iterations"
+PLATEAU = "plateau"
+OSCILLATION = "oscillation"
+NO_CHANGES = "no_changes"
+TOKEN_BUDGET = "token_budget"
+TIME_BUDGET = "time_budget"
+
+
+def _env_number(name: str, cast):
+    value = os.getenv(name)
+    return cast(value) if value else None
+
+
+@dataclass
+class ConvergenceBudget:
+    """Budget d'un projet : tokens consommés et durée de la boucle (None = illimité)."""
+    max_tokens: Optional[int] = None
+    max_seconds: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> "ConvergenceBudget":
+        return cls(
+            max_tokens=_env_number("PROJECT_TOKEN_BUDGET", int),
+            max_seconds=_env_number("PROJECT_TIME_BUDGET", float)
+        )
+
+
+@dataclass
+class ConvergenceState:
+    """Suivi de la boucle d'optimisation d'un projet."""
+    project_id: str
+    budget: ConvergenceBudget
+    started_at: float = field(default_factory=time.monotonic)
+    usage: UsageMeter = field(default_factory=UsageMeter)
+    scores: List[float] = field(default_factory=list)
+    best_specification: Optional[VersionedWebSpecification] = None
+    best_evaluation: Optional[EvaluationResult] = None
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def deltas(self) -> List[float]:
+        return [current - previous for previous, current in zip(self.scores, self.scores[1:])]
+
+    def record_evaluation(self, spec: VersionedWebSpecification, evaluation: EvaluationResult) -> None:
+        self.scores.append(evaluation.total_score)
+        if self.best_evaluation is None or evaluation.total_score > self.best_evaluation.total_score:
+            self.best_specification, self.best_evaluation = spec, evaluation
+
+
+class ConvergenceController:
+    """Décide quand la boucle Evaluator → Optimizer cesse d'être rentable.
+
+    La boucle s'arrête lorsque le score cible est atteint, lorsque le gain
+    entre deux versions passe sous `min_improvement` pendant `patience`
+    itérations (plateau), lorsque le score régresse après une amélioration
+    (oscillation), lorsque l'Optimizer ne propose plus aucune modification,
+    ou lorsque le budget de tokens ou de temps du projet est épuisé.
+    """
+
+    def __init__(
+        self,
+        target_score: float,
+        max_iterations: int = 3,
+        min_improvement: Optional[float] = None,
+        patience: int = 1,
+        default_budget: Optional[ConvergenceBudget] = None
+    ):
+        self.target_score = target_score
+        self.max_iterations = max_iterations
+        self.min_improvement = min_improvement if min_improvement is not None else float(
+            os.getenv("CONVERGENCE_MIN_IMPROVEMENT", "0.01")
+        )
+        self.patience = patience
+        self.default_budget = default_budget or ConvergenceBudget.from_env()
+        self.budgets: Dict[str, ConvergenceBudget] = {}
+
+    def set_budget(self, project_id: str, budget: ConvergenceBudget) -> None:
+        """Définit le budget propre à un projet (sinon le budget par défaut s'applique)."""
+        self.budgets[project_id] = budget
+
+    def start(self, project_id: str, budget: Optional[ConvergenceBudget] = None) -> ConvergenceState:
+        return ConvergenceState(
+            project_id=project_id,
+            budget=budget or self.budgets.get(project_id, self.default_budget)
+        )
+
+    def after_evaluation(self, state: ConvergenceState, iteration: int) -> Optional[str]:
+        """Raison d'arrêt après l'évaluation de l'itération `iteration`, ou None pour optimiser."""
+        score = state.scores[-1]
+        if score >= self.target_score:
+            return TARGET_REACHED
+        if iteration >= self.max_iterations:
+            return MAX_ITERATIONS
+
+        deltas = state.deltas
+        if len(deltas) >= 2 and deltas[-1] < 0 < deltas[-2]:
+            return OSCILLATION
+        recent = deltas[-self.patience:]
+        if len(recent) == self.patience and all(delta < self.min_improvement for delta in recent):
+            return PLATEAU
+
+        return self._budget_exhausted(state)
+
+    def after_optimization(self, state: ConvergenceState, optimization: OptimizationResult) -> Optional[str]:
+        """Raison d'arrêt après une optimisation, avant la réévaluation de la nouvelle version."""
+        if not optimization.changes_made:
+            return NO_CHANGES
+        return self._budget_exhausted(state)
+
+    def _budget_exhausted(self, state: ConvergenceState) -> Optional[str]:
+        budget = state.budget
+        if budget.max_tokens is not None and state.usage.total_tokens >= budget.max_tokens:
+            return TOKEN_BUDGET
+        if budget.max_seconds is not None and state.elapsed >= budget.max_seconds:
+            return TIME_BUDGET
+        return None
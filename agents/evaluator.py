@@ -1,25 +1,64 @@
 from __future__ import annotations
-from pydantic_ai import Agent, RunContext
+from pydantic_ai import RunContext
+from agents.base import SpecAgent
 from models.specifications import (
     VersionedWebSpecification,
     EvaluationResult,
     EvaluationCriteria,
     DependencyContext,
-    ModificationType
+    EvaluatorResponse,
+    CriterionResponse
 )
-from utils.context_manager import ContextManager
-from typing import Optional
-import json
+from utils.context_manager import ContextManager, get_context_manager
+from utils.response_cache import ResponseCache, get_response_cache
+from utils.anthropic_client import AnthropicClient
+from utils.model_router import HAIKU, ModelRouter, EVALUATE, EVALUATE_SECTIONS, EVALUATE_CRITERION
+from utils.spec_sections import blend_scores, scope_specification
+from utils.prompt_builder import PromptBuilder, compact_json, context_section, get_prompt_budget
+from utils.response_parsing import parse_response
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from typing import Any, Dict, List, Optional, Tuple
 from utils.logging_config import get_logger
 
-class Evaluator(Agent):
-    def __init__(self, model="claude-3-haiku-20240307", context_manager: Optional[ContextManager] = None):
+class Evaluator(SpecAgent):
+    # Même priorité que les demandes d'évaluation (DependencyContext)
+    REQUEST_PRIORITY = 1
+
+    # Score en dessous duquel une optimisation est demandée
+    OPTIMIZATION_THRESHOLD = 0.9
+
+    # Pondération des critères d'évaluation
+    CRITERIA_WEIGHTS = {
+        "completeness": 0.25,
+        "coherence": 0.25,
+        "clarity": 0.20,
+        "feasibility": 0.15,
+        "quality": 0.15
+    }
+
+    # Consignes propres à chaque critère pour l'évaluation parallèle
+    CRITERIA_INSTRUCTIONS = {
+        "completeness": "Complétude : vérifie que toutes les exigences du contexte sont couvertes et identifie les éléments manquants ou incomplets.",
+        "coherence": "Cohérence : vérifie la cohérence entre les différentes parties et identifie les contradictions potentielles.",
+        "clarity": "Clarté : évalue la clarté des descriptions et vérifie l'absence d'ambiguïtés.",
+        "feasibility": "Faisabilité : évalue la pertinence des choix techniques et la faisabilité des fonctionnalités.",
+        "quality": "Qualité : vérifie le respect des bonnes pratiques et évalue la qualité générale des spécifications."
+    }
+
+    def __init__(self, model: Optional[str] = None, context_manager: Optional[ContextManager] = None, response_cache: Optional[ResponseCache] = None, client: Optional[AnthropicClient] = None, model_router: Optional[ModelRouter] = None):
         super().__init__(
-            model,
+            model or HAIKU,
             result_type=EvaluationResult,
             deps_type=str
         )
-        self.context_manager = context_manager or ContextManager()
+        self.context_manager = context_manager or get_context_manager()
+        self.response_cache = response_cache or get_response_cache()
+        self.model_name = model or HAIKU
+        # Un modèle explicite désactive le routage
+        self.pinned_model = model
+        self.model_router = model_router
+        self.client = client
         self.logger = get_logger("Evaluator")
         self.logger.info("Initialisation de l'agent Evaluator")
         self.system_prompt = """
@@ -41,13 +80,12 @@ class Evaluator(Agent):
     
     def evaluate_specification(self, context: RunContext[str], spec: VersionedWebSpecification) -> EvaluationResult:
         """Évalue le cahier des charges par rapport au contexte initial."""
-        prompt = f"""
-        Contexte initial du projet :
-        {context.value}
-        
-        Spécifications à évaluer :
-        {json.dumps(spec.model_dump(), indent=2, ensure_ascii=False)}
-        
+        spec_data = spec.model_dump(mode="json", exclude={"metadata"})
+        prompt = PromptBuilder(get_prompt_budget("Evaluator")).add(
+            context_section(context.value, spec_data), trim_priority=0
+        ).add(
+            f"Spécifications à évaluer :\n{compact_json(spec_data)}"
+        ).add(f"""
         Évalue les spécifications selon les critères suivants et fournis un score et un feedback détaillé :
         
         1. Complétude (25%)
@@ -90,63 +128,333 @@ class Evaluator(Agent):
                 "Suggestion d'amélioration 2"
             ]
         }}
-        """
+        """).build()
         
         # Utilisation de l'API Claude pour évaluer les spécifications
         self.logger.debug("Début de l'évaluation des spécifications")
-        response = self.complete(prompt)
+        model = self.route(EVALUATE, prompt)
+        response = self.response_cache.get_or_compute(
+            model,
+            self.system_prompt,
+            prompt,
+            lambda: self.complete(prompt, model, EVALUATE)
+        )
         self.logger.debug("Réponse reçue de Claude")
         
         try:
             self.logger.debug("Traitement de la réponse d'évaluation")
-            # Conversion de la réponse en dictionnaire
-            eval_dict = json.loads(response)
-            
-            # Validation des scores
-            if not all(0 <= score <= 100 for score in eval_dict["criteria"].values()):
-                raise ValueError("Les scores des critères doivent être entre 0 et 100")
-            if not 0 <= eval_dict["total_score"] <= 1:
-                raise ValueError("Le score total doit être entre 0.0 et 1.0")
+            # Validation de la réponse en une seule passe (scores compris)
+            parsed = parse_response(response, EvaluatorResponse)
             
-            # Création de l'objet EvaluationResult
-            result = EvaluationResult(
+            # Création de l'objet EvaluationResult à partir des éléments déjà validés
+            result = EvaluationResult.model_construct(
                 specification_version=spec.metadata.version_id,
-                criteria=EvaluationCriteria(**eval_dict["criteria"]),
-                total_score=eval_dict["total_score"],
-                feedback=eval_dict["feedback"],
+                criteria=parsed.criteria,
+                total_score=parsed.total_score,
+                feedback=parsed.feedback,
                 evaluator_name="Evaluator",
-                improvement_suggestions=eval_dict["improvement_suggestions"]
+                improvement_suggestions=parsed.improvement_suggestions
             )
             
-            # Enregistrement du résultat dans le ContextManager
-            self.context_manager.store_specification_version(
-                specification_data=result.dict(),
-                agent_name="Evaluator",
-                action_type="evaluation",
-                parent_id=spec.metadata.version_id
-            )
+            self._register_result(spec, result)
+            return result
             
-            # Enregistrement de la dépendance avec l'Optimizer si le score est inférieur à 0.9
-            if result.total_score < 0.9:
-                self.context_manager.register_agent_dependency(
-                    source_agent="Evaluator",
-                    target_agent="Optimizer",
-                    context_data=DependencyContext(
-                        source_version_id=spec.metadata.version_id,
-                        target_agent="Optimizer",
-                        context_type="optimization_request",
-                        data={
-                            "specification_id": spec.metadata.version_id,
-                            "evaluation_feedback": result.dict()
-                        },
-                        priority=2
-                    ).dict()
+        except Exception as e:
+            # Une réponse inexploitable ne doit pas être resservie depuis le cache
+            self.response_cache.invalidate(model, self.system_prompt, prompt)
+            error_msg = f"Erreur lors de l'évaluation des spécifications : {str(e)}"
+            self.logger.error(error_msg)
+            raise ValueError(error_msg)
+
+    def evaluate_specification_by_criterion(
+        self,
+        context: RunContext[str],
+        spec: VersionedWebSpecification,
+        max_workers: Optional[int] = None,
+        retries: int = 1
+    ) -> EvaluationResult:
+        """Évalue chaque critère par une requête indépendante, exécutées en parallèle.
+
+        Les résultats partiels sont fusionnés en un seul EvaluationResult avec la
+        pondération habituelle. Chaque requête étant mise en cache séparément,
+        une nouvelle tentative après un échec ne relance que les critères manquants.
+        """
+        spec_data = spec.model_dump(mode="json", exclude={"metadata"})
+        spec_json = compact_json(spec_data)
+        context_text = context_section(context.value, spec_data)
+        criteria = list(self.CRITERIA_WEIGHTS)
+        self.logger.debug("Début de l'évaluation parallèle (%d critères)", len(criteria))
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(criteria)) as executor:
+            # Chaque requête hérite du contexte de l'appelant (projet, comptage des tokens)
+            futures = {
+                name: executor.submit(
+                    contextvars.copy_context().run,
+                    self._evaluate_criterion, context_text, spec_json, name, retries
                 )
+                for name in criteria
+            }
+            partials: Dict[str, CriterionResponse] = {}
+            failures: Dict[str, str] = {}
+            for name, future in futures.items():
+                try:
+                    partials[name] = future.result()
+                except Exception as e:
+                    failures[name] = str(e)
+
+        if failures:
+            details = "; ".join(f"{name} : {error}" for name, error in failures.items())
+            error_msg = f"Erreur lors de l'évaluation des critères : {details}"
+            self.logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        feedback: Dict[str, list] = {"strengths": [], "weaknesses": [], "technical": [], "functional": []}
+        suggestions = []
+        for name in criteria:
+            partial = partials[name]
+            for key in feedback:
+                feedback[key].extend(getattr(partial, key))
+            suggestions.extend(partial.improvement_suggestions)
+
+        scores = {name: partials[name].score for name in criteria}
+        total_score = sum(scores[name] * weight for name, weight in self.CRITERIA_WEIGHTS.items()) / 100
+
+        result = EvaluationResult(
+            specification_version=spec.metadata.version_id,
+            criteria=EvaluationCriteria(**scores),
+            total_score=round(total_score, 4),
+            feedback=feedback,
+            evaluator_name="Evaluator",
+            improvement_suggestions=suggestions
+        )
+        self._register_result(spec, result)
+        return result
+
+    def evaluate_sections(
+        self,
+        context: RunContext[str],
+        spec: VersionedWebSpecification,
+        sections: List[str],
+        previous_evaluation: EvaluationResult
+    ) -> EvaluationResult:
+        """Réévalue uniquement les pages modifiées et réutilise l'évaluation précédente pour le reste.
+
+        Les scores des pages modifiées sont combinés à ceux de l'évaluation
+        précédente au prorata du nombre de pages concernées.
+        """
+        scoped_spec = scope_specification(spec.model_dump(mode="json", exclude={"metadata"}), sections)
+        prompt = self._sections_prompt(
+            context.value, scoped_spec, "Pages modifiées à évaluer (les autres pages sont inchangées)"
+        )
+        
+        self.logger.debug("Début de l'évaluation incrémentale des pages : %s", sections)
+        model = self.route(EVALUATE_SECTIONS, prompt, score=previous_evaluation.total_score)
+        response = self.response_cache.get_or_compute(
+            model,
+            self.system_prompt,
+            prompt,
+            lambda: self.complete(prompt, model, EVALUATE_SECTIONS)
+        )
+        self.logger.debug("Réponse reçue de Claude")
+        
+        try:
+            parsed = parse_response(response, EvaluatorResponse)
+            scoped_criteria = parsed.criteria
             
-            self.logger.info(f"Évaluation terminée avec un score de {result.total_score}")
+            # Combinaison avec les scores des pages inchangées
+            changed, total = len(sections), max(len(spec.pages), 1)
+            previous_criteria = previous_evaluation.criteria.model_dump()
+            criteria = {}
+            for name, score in scoped_criteria.model_dump().items():
+                previous_score = previous_criteria.get(name)
+                if score is None or previous_score is None:
+                    criteria[name] = score if score is not None else previous_score
+                else:
+                    criteria[name] = blend_scores(previous_score, score, changed, total)
+            
+            feedback = {
+                key: list(parsed.feedback.get(key, []))
+                for key in ("strengths", "weaknesses", "technical", "functional")
+            }
+            
+            result = EvaluationResult(
+                specification_version=spec.metadata.version_id,
+                criteria=EvaluationCriteria(**criteria),
+                total_score=round(blend_scores(
+                    previous_evaluation.total_score, parsed.total_score, changed, total
+                ), 4),
+                feedback=feedback,
+                evaluator_name="Evaluator",
+                improvement_suggestions=parsed.improvement_suggestions
+            )
+            self._register_result(spec, result)
             return result
             
         except Exception as e:
+            self.response_cache.invalidate(model, self.system_prompt, prompt)
+            error_msg = f"Erreur lors de l'évaluation des spécifications : {str(e)}"
+            self.logger.error(error_msg)
+            raise ValueError(error_msg)
+
+    def _sections_prompt(self, context_value: str, scoped_spec: Dict[str, Any], heading: str) -> str:
+        """Prompt d'évaluation d'un sous-ensemble de pages."""
+        return PromptBuilder(get_prompt_budget("Evaluator")).add(
+            context_section(context_value, scoped_spec), trim_priority=0
+        ).add(
+            f"{heading} :\n{compact_json(scoped_spec)}"
+        ).add(f"""
+        Évalue ces pages selon les critères de complétude, cohérence, clarté, faisabilité et qualité.
+        
+        Format de sortie attendu :
+        {{
+            "criteria": {{
+                "completeness": 85.0,  # Score entre 0 et 100
+                "coherence": 90.0,
+                "clarity": 80.0,
+                "feasibility": 75.0,
+                "quality": 80.0
+            }},
+            "total_score": 0.85,  # Moyenne pondérée des critères
+            "feedback": {{
+                "strengths": ["Point fort 1"],
+                "weaknesses": ["Point faible 1"],
+                "technical": ["Commentaire technique 1"],
+                "functional": ["Commentaire fonctionnel 1"]
+            }},
+            "improvement_suggestions": ["Suggestion d'amélioration 1"]
+        }}
+        """).build()
+
+    def assess_sections(
+        self,
+        context: RunContext[str],
+        spec_data: Dict[str, Any],
+        sections: List[str]
+    ) -> EvaluatorResponse:
+        """Évalue un sous-ensemble de pages, sans enregistrer de résultat (évaluation en pipeline).
+
+        Les évaluations partielles sont combinées par `merge_section_evaluations`.
+        """
+        prompt = self._sections_prompt(
+            context.value, scope_specification(spec_data, sections), "Pages à évaluer (extrait de la spécification)"
+        )
+        self.logger.debug("Évaluation partielle des pages : %s", sections)
+        model = self.route(EVALUATE_SECTIONS, prompt)
+        response = self.response_cache.get_or_compute(
+            model,
+            self.system_prompt,
+            prompt,
+            lambda: self.complete(prompt, model, EVALUATE_SECTIONS)
+        )
+        try:
+            return parse_response(response, EvaluatorResponse)
+        except Exception as e:
+            self.response_cache.invalidate(model, self.system_prompt, prompt)
             error_msg = f"Erreur lors de l'évaluation des spécifications : {str(e)}"
             self.logger.error(error_msg)
             raise ValueError(error_msg)
+
+    def merge_section_evaluations(
+        self,
+        context: RunContext[str],
+        spec: VersionedWebSpecification,
+        parts: List[Tuple[int, EvaluatorResponse]]
+    ) -> EvaluationResult:
+        """Combine des évaluations partielles (nombre de pages, évaluation) et enregistre le résultat.
+
+        Les scores sont pondérés par le nombre de pages de chaque partie ; les
+        retours et suggestions sont concaténés.
+        """
+        total_pages = sum(pages for pages, _ in parts) or 1
+        criteria = {}
+        for name in self.CRITERIA_WEIGHTS:
+            scored = [(pages, getattr(part.criteria, name)) for pages, part in parts]
+            scored = [(pages, score) for pages, score in scored if score is not None]
+            weight = sum(pages for pages, _ in scored)
+            criteria[name] = sum(pages * score for pages, score in scored) / weight if weight else None
+        feedback: Dict[str, list] = {"strengths": [], "weaknesses": [], "technical": [], "functional": []}
+        suggestions = []
+        for _, part in parts:
+            for key in feedback:
+                feedback[key].extend(part.feedback.get(key, []))
+            suggestions.extend(part.improvement_suggestions)
+
+        result = EvaluationResult(
+            specification_version=spec.metadata.version_id,
+            criteria=EvaluationCriteria(**criteria),
+            total_score=round(sum(pages * part.total_score for pages, part in parts) / total_pages, 4),
+            feedback=feedback,
+            evaluator_name="Evaluator",
+            improvement_suggestions=suggestions
+        )
+        self._register_result(spec, result)
+        return result
+
+    def _evaluate_criterion(self, context_text: str, spec_json: str, criterion: str, retries: int) -> CriterionResponse:
+        """Évalue un seul critère, avec nouvelles tentatives en cas de réponse invalide.
+
+        `context_text` est la section de contexte déjà construite par `context_section`.
+        """
+        prompt = PromptBuilder(get_prompt_budget("Evaluator")).add(
+            context_text, trim_priority=0
+        ).add(
+            f"Spécifications à évaluer :\n{spec_json}"
+        ).add(f"""
+        Évalue uniquement le critère suivant :
+        {self.CRITERIA_INSTRUCTIONS[criterion]}
+        
+        Format de sortie attendu :
+        {{
+            "score": 80.0,  # Score entre 0 et 100
+            "strengths": ["Point fort"],
+            "weaknesses": ["Point faible"],
+            "technical": ["Commentaire technique"],
+            "functional": ["Commentaire fonctionnel"],
+            "improvement_suggestions": ["Suggestion d'amélioration"]
+        }}
+        """).build()
+        last_error: Optional[Exception] = None
+        for attempt in range(retries + 1):
+            model = self.route(EVALUATE_CRITERION, prompt)
+            response = self.response_cache.get_or_compute(
+                model,
+                self.system_prompt,
+                prompt,
+                lambda: self.complete(prompt, model, EVALUATE_CRITERION)
+            )
+            try:
+                return parse_response(response, CriterionResponse)
+            except Exception as e:
+                self.response_cache.invalidate(model, self.system_prompt, prompt)
+                last_error = e
+                self.logger.debug("Réponse invalide pour le critère %s (tentative %d) : %s", criterion, attempt + 1, e)
+        raise ValueError(str(last_error))
+
+    def _register_result(self, spec: VersionedWebSpecification, result: EvaluationResult) -> None:
+        """Enregistre l'évaluation et, si nécessaire, la demande d'optimisation associée."""
+        # Enregistrement du résultat dans le ContextManager
+        self.context_manager.store_specification_version(
+            specification_data=result.model_dump(),
+            agent_name="Evaluator",
+            action_type="evaluation",
+            parent_id=spec.metadata.version_id
+        )
+        
+        # Enregistrement de la dépendance avec l'Optimizer si le score est inférieur au seuil
+        if result.total_score < self.OPTIMIZATION_THRESHOLD:
+            self.context_manager.register_agent_dependency(
+                source_agent="Evaluator",
+                target_agent="Optimizer",
+                context_data=DependencyContext(
+                    source_version_id=spec.metadata.version_id,
+                    target_agent="Optimizer",
+                    context_type="optimization_request",
+                    data={
+                        "specification_id": spec.metadata.version_id,
+                        "evaluation_feedback": result.model_dump()
+                    },
+                    priority=2
+                ).model_dump()
+            )
+        
+        self.logger.info(f"Évaluation terminée avec un score de {result.total_score}")
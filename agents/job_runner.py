@@ -0,0 +1,387 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agents.convergence import MAX_ITERATIONS, ConvergenceState
+from agents.workflow import UNCHANGED, WorkflowContext, WorkflowEngine
+from models.specifications import DependencyContext, EvaluationResult, VersionedWebSpecification
+from utils.anthropic_client import UsageMeter, track_usage
+from utils.job_queue import DONE, Job, JobQueue, get_job_queue
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics
+
+WRITER = "SpecificationWriter"
+EVALUATOR = "Evaluator"
+OPTIMIZER = "Optimizer"
+
+
+def parse_concurrency(value: str) -> Dict[str, int]:
+    """Lit une configuration `Agent=n,Agent=n` (nombre de workers par agent)."""
+    concurrency = {}
+    for item in value.split(","):
+        if item.strip():
+            agent, _, count = item.partition("=")
+            concurrency[agent.strip()] = int(count or 1)
+    return concurrency
+
+
+class JobRunner:
+    """Traitement en arrière-plan des travaux de la file, un groupe de workers par agent.
+
+    Un traitement commence par une demande de rédaction. Les demandes que les
+    agents enregistrent pendant un travail (évaluation après la rédaction,
+    optimisation sous le score cible, réévaluation après une optimisation)
+    deviennent de nouveaux travaux du même traitement, jusqu'à ce que le
+    ConvergenceController du moteur de workflow arrête la boucle (score
+    cible, itérations, plateau, oscillation, absence de modification,
+    budgets), comme pour un workflow interactif. La réservation
+    d'un travail est prolongée tant qu'il s'exécute ; un travail interrompu
+    par un arrêt du processus est repris par un autre worker.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[WorkflowEngine] = None,
+        queue: Optional[JobQueue] = None,
+        concurrency: Optional[Dict[str, int]] = None,
+        poll_interval: Optional[float] = None
+    ):
+        self.engine = engine or WorkflowEngine()
+        self.context_manager = self.engine.context_manager
+        self.queue = queue or get_job_queue()
+        self.handlers: Dict[str, Callable[[Job, WorkflowContext], Dict[str, Any]]] = {
+            WRITER: self._write,
+            EVALUATOR: self._evaluate,
+            OPTIMIZER: self._optimize
+        }
+        self.concurrency = concurrency or parse_concurrency(
+            os.getenv("JOB_WORKERS", f"{WRITER}=1,{EVALUATOR}=2,{OPTIMIZER}=1")
+        )
+        self.poll_interval = poll_interval or float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+        self.logger = get_logger("JobRunner")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, user_input: str, project_id: Optional[str] = None) -> int:
+        """Met en file un traitement complet pour un brief et retourne le numéro de son travail initial."""
+        job_id = self.queue.enqueue(
+            project_id=project_id or uuid.uuid4().hex,
+            target_agent=WRITER,
+            context={
+                "target_agent": WRITER,
+                "context_type": "generation_request",
+                "data": {"user_input": user_input},
+                "priority": 0
+            }
+        )
+        self.wake(WRITER)
+        return job_id
+
+    def wake(self, agent: str) -> None:
+        """Réveille les workers d'un agent (depuis n'importe quel thread)."""
+        if self._loop is not None and agent in self._wakeups:
+            self._loop.call_soon_threadsafe(self._wakeups[agent].set)
+
+    def start(self) -> "JobRunner":
+        """Lance les workers dans un thread dédié, avec sa propre boucle d'événements."""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run()), name="job-runner", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Arrête les workers après leurs travaux en cours."""
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    async def run(self) -> None:
+        """Exécute les workers jusqu'à l'appel de `stop`."""
+        self._stopping = asyncio.Event()
+        self._wakeups = {agent: asyncio.Event() for agent in self.concurrency}
+        self._loop = asyncio.get_running_loop()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        workers = [
+            asyncio.create_task(self._work(agent, f"{prefix}:{agent}:{index}"))
+            for agent, count in self.concurrency.items() if agent in self.handlers
+            for index in range(count)
+        ]
+        self.logger.info(
+            "Traitement en arrière-plan démarré (%s)",
+            ", ".join(f"{agent} × {count}" for agent, count in self.concurrency.items())
+        )
+        await asyncio.gather(*workers)
+
+    async def _work(self, agent: str, worker_id: str) -> None:
+        while not self._stopping.is_set():
+            job = await asyncio.to_thread(self.queue.claim, agent, worker_id)
+            if job is not None:
+                await self._process(job, worker_id)
+                continue
+            wakeup = self._wakeups[agent]
+            try:
+                await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+
+    async def _heartbeat(self, job: Job, worker_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+            if not await asyncio.to_thread(self.queue.heartbeat, job.job_id, worker_id):
+                self.logger.warning(f"Réservation du travail {job.job_id} perdue")
+                return
+
+    async def _process(self, job: Job, worker_id: str) -> None:
+        self.logger.info(f"Travail {job.job_id} ({job.context_type}) pris en charge par {worker_id}")
+        heartbeat = asyncio.create_task(self._heartbeat(job, worker_id))
+        started_at = time.perf_counter()
+        outcome = "error"
+        try:
+            result, dependency_ids = await asyncio.to_thread(self._execute, job)
+            # Les travaux suivants sont mis en file avant de clore celui-ci : un arrêt
+            # entre les deux relance le travail, et la déduplication évite les doublons
+            for dependency_id in dependency_ids:
+                dependency = self.context_manager.get_agent_dependency(dependency_id)
+                if dependency is not None and dependency["target_agent"] in self.handlers:
+                    await asyncio.to_thread(self.queue.enqueue_dependency, dependency, job.root_id)
+                    self.wake(dependency["target_agent"])
+            await asyncio.to_thread(self.queue.complete, job.job_id, worker_id, result)
+            outcome = "success"
+        except Exception as e:
+            retry = await asyncio.to_thread(self.queue.fail, job.job_id, worker_id, str(e))
+            self.logger.error(
+                f"Échec du travail {job.job_id} : {e}" + (" (nouvelle tentative prévue)" if retry else "")
+            )
+        finally:
+            heartbeat.cancel()
+            get_metrics().histogram(
+                "job_duration_seconds", "Durée des travaux en arrière-plan", ("agent", "outcome")
+            ).observe(time.perf_counter() - started_at, agent=job.target_agent, outcome=outcome)
+
+    def _execute(self, job: Job) -> Tuple[Dict[str, Any], List[int]]:
+        """Exécute le travail et retourne son résultat et les demandes enregistrées pendant son exécution."""
+        root = self.queue.get_job(job.root_id) if job.root_id != job.job_id else job
+        context = WorkflowContext(
+            value=root.data.get("user_input", "") if root else "",
+            project_id=job.project_id,
+            usage=UsageMeter()
+        )
+        with self.context_manager.project_scope(job.project_id), track_usage(context.usage), \
+                self.context_manager.capture_dependencies() as dependency_ids:
+            result = self.handlers[job.target_agent](job, context)
+        # Tokens du travail, cumulés d'un travail à l'autre pour le budget du traitement
+        result["tokens"] = context.usage.total_tokens
+        # Traitement terminé : les demandes restantes (optimisation) ne sont pas mises en file
+        return result, [] if result.get("finished") else list(dependency_ids)
+
+    def _specification(self, version_id: str) -> VersionedWebSpecification:
+        spec = self.context_manager.get_specification(version_id)
+        if spec is None:
+            raise ValueError(f"Version introuvable : {version_id}")
+        return spec
+
+    def _iterations(self, version_id: str) -> int:
+        """Nombre d'optimisations ayant conduit à une version depuis sa rédaction ou sa mise à jour."""
+        iterations = 0
+        for version in self.context_manager.get_version_history(version_id, with_data=False):
+            if version["agent_name"] == WRITER:
+                break
+            if version["agent_name"] == OPTIMIZER:
+                iterations += 1
+        return iterations
+
+    def _sections(self, job: Job, version_id: str) -> Optional[List[str]]:
+        """Pages auxquelles l'évaluation d'une version a été limitée (None : toute la spécification)."""
+        for item in self.queue.list_jobs(job.root_id):
+            if item.target_agent == EVALUATOR and item.data.get("specification_id") == version_id:
+                return item.data.get("sections")
+        return None
+
+    def _previous_evaluation(self, job: Job, spec: VersionedWebSpecification) -> Optional[EvaluationResult]:
+        """Évaluation de la version parente, base d'une évaluation limitée aux pages modifiées."""
+        parent_id = spec.metadata.parent_version_id
+        for item in reversed(self.queue.list_jobs(job.root_id)):
+            if item.target_agent == OPTIMIZER and item.data.get("specification_id") == parent_id:
+                return EvaluationResult.model_validate(item.data["evaluation_feedback"])
+        # Version issue de la mise à jour incrémentale : évaluation de la soumission précédente
+        submission = self.context_manager.get_last_submission(job.project_id)
+        if submission and submission["data"]["specification_version_id"] == parent_id \
+                and submission["data"].get("evaluation"):
+            return EvaluationResult.model_validate(submission["data"]["evaluation"])
+        return None
+
+    def _write(self, job: Job, context: WorkflowContext) -> Dict[str, Any]:
+        # Projet déjà traité : seules les pages touchées par la modification sont mises à jour
+        plan = self.engine.incremental_plan(context.value, job.project_id)
+        if plan is None:
+            spec = self.engine.writer.write_specification(context)
+            return {"specification_id": spec.metadata.version_id}
+        version_id = plan.specification.metadata.version_id
+        if not plan.lines:
+            self.logger.info(f"Contexte inchangé pour le projet {job.project_id} : résultat précédent réutilisé")
+            return {
+                "specification_id": version_id,
+                "finished": True,
+                "stop_reason": UNCHANGED,
+                "final_specification_id": version_id
+            }
+        spec = self.engine.writer.update_sections(context, plan.specification, plan.sections, plan.lines)
+        return {
+            "specification_id": spec.metadata.version_id,
+            "sections": self.engine.incremental_scope(plan, spec)
+        }
+
+    def _convergence(self, job: Job, context: WorkflowContext) -> ConvergenceState:
+        """État de convergence du traitement, reconstitué à partir de ses travaux terminés.
+
+        Scores des évaluations précédentes, tokens consommés et durée depuis
+        la mise en file permettent au ConvergenceController d'appliquer les
+        mêmes règles d'arrêt qu'au moteur de workflow.
+        """
+        jobs = self.queue.list_jobs(job.root_id)
+        state = self.engine.convergence.start(job.project_id)
+        state.started_at -= time.time() - (jobs[0].created_at if jobs else job.created_at)
+        for previous in jobs:
+            if previous.job_id == job.job_id or previous.status != DONE or not previous.result:
+                continue
+            state.usage.add(previous.result.get("tokens", 0), 0)
+            if previous.target_agent == EVALUATOR and "total_score" in previous.result:
+                state.scores.append(previous.result["total_score"])
+        state.usage.add(context.usage.input_tokens, context.usage.output_tokens)
+        return state
+
+    def _finish(
+        self,
+        job: Job,
+        context: WorkflowContext,
+        reason: str,
+        spec: VersionedWebSpecification,
+        evaluation: EvaluationResult
+    ) -> Dict[str, Any]:
+        """Fin du traitement : la meilleure version évaluée est mémorisée comme pour un workflow interactif.
+
+        `spec` et `evaluation` sont la dernière version évaluée ; les
+        évaluations précédentes sont celles transmises à l'Optimizer.
+        """
+        jobs = self.queue.list_jobs(job.root_id)
+        feedback = {
+            item.data.get("specification_id"): item.data.get("evaluation_feedback")
+            for item in jobs if item.target_agent == OPTIMIZER and item.data.get("evaluation_feedback")
+        }
+        feedback[spec.metadata.version_id] = evaluation.model_dump(mode="json")
+        evaluated = [
+            (item.result["specification_id"], item.result["total_score"])
+            for item in jobs
+            if item.target_agent == EVALUATOR and item.status == DONE and item.result
+            and item.result.get("specification_id") in feedback
+        ] + [(spec.metadata.version_id, evaluation.total_score)]
+        # Première version au meilleur score, comme ConvergenceState.record_evaluation
+        best_id, best_score = evaluated[0]
+        for version_id, score in evaluated[1:]:
+            if score > best_score:
+                best_id, best_score = version_id, score
+
+        self.context_manager.record_submission(context.value, best_id, feedback[best_id], job.project_id)
+        get_metrics().counter(
+            "workflow_stops_total", "Arrêts de la boucle d'optimisation", ("reason",)
+        ).inc(reason=reason)
+        self.logger.info(f"Traitement {job.root_id} terminé ({reason}) : version retenue {best_id}")
+        return {"finished": True, "stop_reason": reason, "final_specification_id": best_id}
+
+    def _evaluate(self, job: Job, context: WorkflowContext) -> Dict[str, Any]:
+        spec = self._specification(job.data["specification_id"])
+        sections = job.data.get("sections")
+        previous = self._previous_evaluation(job, spec) if sections else None
+        if previous is None:
+            evaluation = self.engine.evaluate(context, spec)
+        else:
+            evaluation = self.engine.evaluator.evaluate_sections(context, spec, sections, previous)
+        result = {
+            "specification_id": spec.metadata.version_id,
+            "total_score": evaluation.total_score,
+            "finished": False
+        }
+        state = self._convergence(job, context)
+        state.scores.append(evaluation.total_score)
+        reason = self.engine.convergence.after_evaluation(state, self._iterations(spec.metadata.version_id))
+        if reason:
+            result.update(self._finish(job, context, reason, spec, evaluation))
+        return result
+
+    def _optimize(self, job: Job, context: WorkflowContext) -> Dict[str, Any]:
+        spec = self._specification(job.data["specification_id"])
+        evaluation = EvaluationResult.model_validate(job.data["evaluation_feedback"])
+        iteration = self._iterations(spec.metadata.version_id) + 1
+        max_iterations = self.engine.convergence.max_iterations
+        if iteration > max_iterations:
+            # Demande sans suite possible : le traitement est clos sur la dernière évaluation
+            return {
+                "specification_id": spec.metadata.version_id,
+                "skipped": MAX_ITERATIONS,
+                **self._finish(job, context, MAX_ITERATIONS, spec, evaluation)
+            }
+        context.final_iteration = iteration == max_iterations
+        sections = self._sections(job, spec.metadata.version_id)
+        if sections:
+            optimization = self.engine.optimizer.optimize_sections(context, spec, evaluation, sections)
+        else:
+            optimization = self.engine.optimizer.optimize_specification(context, spec, evaluation)
+        result = {
+            "specification_id": optimization.new_version_id,
+            "iteration": iteration,
+            "changes": len(optimization.changes_made),
+            "optimization_score": optimization.optimization_score
+        }
+        # Sans modification (ou budget épuisé), la nouvelle version n'est pas réévaluée
+        reason = self.engine.convergence.after_optimization(self._convergence(job, context), optimization)
+        if reason:
+            result.update(self._finish(job, context, reason, spec, evaluation))
+            return result
+        # La nouvelle version est réévaluée (sur les mêmes pages), ce qui poursuit la boucle si nécessaire
+        data = {"specification_id": optimization.new_version_id}
+        if sections:
+            data["sections"] = sections
+        self.context_manager.register_agent_dependency(
+            source_agent=OPTIMIZER,
+            target_agent=EVALUATOR,
+            context_data=DependencyContext(
+                source_version_id=optimization.new_version_id,
+                target_agent=EVALUATOR,
+                context_type="evaluation_request",
+                data=data,
+                priority=1
+            ).model_dump()
+        )
+        return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Workers de traitement en arrière-plan des demandes entre agents")
+    parser.add_argument(
+        "-w", "--workers",
+        help=f"Workers par agent, ex. {WRITER}=1,{EVALUATOR}=2,{OPTIMIZER}=1 (défaut : JOB_WORKERS)"
+    )
+    args = parser.parse_args(argv)
+
+    runner = JobRunner(concurrency=parse_concurrency(args.workers) if args.workers else None)
+    try:
+        asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(runner.queue.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
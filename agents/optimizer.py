@@ -1,30 +1,50 @@
 from __future__ import annotations
-from pydantic_ai import Agent, RunContext
+from pydantic_ai import RunContext
+from agents.base import SpecAgent
 from models.specifications import (
     VersionedWebSpecification,
-    WebSpecification,
     EvaluationResult,
     OptimizationResult,
-    OptimizationChange,
-    PageSection,
-    TechStackCategory,
     VersionMetadata,
-    ModificationType
+    ModificationType,
+    OptimizerResponse,
+    EvaluatorResponse,
+    SectionsResponse
 )
-from utils.context_manager import ContextManager
-from typing import Optional, Dict, Any
+from utils.context_manager import ContextManager, get_context_manager
+from utils.response_cache import ResponseCache, get_response_cache
+from utils.anthropic_client import AnthropicClient
+from utils.model_router import HAIKU, ModelRouter, OPTIMIZE, OPTIMIZE_SECTIONS
+from utils.response_parsing import parse_response
+from utils.prompt_builder import (
+    PromptBuilder,
+    compact_json,
+    compact_list,
+    context_section,
+    get_prompt_budget,
+    unique_items
+)
+from typing import Any, Dict, List, Optional, Tuple, Union
 from datetime import datetime
-import json
 from utils.logging_config import get_logger
 
-class Optimizer(Agent):
-    def __init__(self, model="claude-3-haiku-20240307", context_manager: Optional[ContextManager] = None):
+class Optimizer(SpecAgent):
+    # Même priorité que les demandes d'optimisation (DependencyContext)
+    REQUEST_PRIORITY = 2
+
+    def __init__(self, model: Optional[str] = None, context_manager: Optional[ContextManager] = None, response_cache: Optional[ResponseCache] = None, client: Optional[AnthropicClient] = None, model_router: Optional[ModelRouter] = None):
         super().__init__(
-            model,
+            model or HAIKU,
             result_type=OptimizationResult,
             deps_type=str
         )
-        self.context_manager = context_manager or ContextManager()
+        self.context_manager = context_manager or get_context_manager()
+        self.response_cache = response_cache or get_response_cache()
+        self.model_name = model or HAIKU
+        # Un modèle explicite désactive le routage
+        self.pinned_model = model
+        self.model_router = model_router
+        self.client = client
         self.logger = get_logger("Optimizer")
         self.logger.info("Initialisation de l'agent Optimizer")
         self.system_prompt = """
@@ -46,30 +66,42 @@ class Optimizer(Agent):
     
     def optimize_specification(self, context: RunContext[str], spec: VersionedWebSpecification, evaluation: EvaluationResult) -> OptimizationResult:
         """Optimise le cahier des charges en fonction de l'évaluation et du contexte."""
-        prompt = f"""
-        Contexte initial du projet :
-        {context.value}
-        
-        Spécifications actuelles :
-        {json.dumps(spec.model_dump(), indent=2, ensure_ascii=False)}
-        
+        feedback = evaluation.feedback
+        spec_data = spec.model_dump(mode="json", exclude={"metadata"})
+        # Chaque remarque de l'évaluation n'est transmise qu'une fois, dans sa liste la plus utile
+        weaknesses, suggestions, technical, functional, strengths = unique_items(
+            feedback.get("weaknesses", []),
+            evaluation.improvement_suggestions,
+            feedback.get("technical", []),
+            feedback.get("functional", []),
+            feedback.get("strengths", [])
+        )
+        # Seuls les critères sous le score global orientent l'optimisation
+        weak_criteria = ", ".join(
+            f"{name} {score:g}" for name, score in evaluation.criteria.model_dump().items()
+            if score is not None and score < evaluation.total_score * 100
+        )
+        prompt = PromptBuilder(get_prompt_budget("Optimizer")).add(
+            context_section(context.value, spec_data), trim_priority=0
+        ).add(
+            f"Spécifications actuelles :\n{compact_json(spec_data)}"
+        ).add(f"""
         Évaluation reçue :
         Score total : {evaluation.total_score}
-        Scores détaillés :
-        - Complétude : {evaluation.criteria.completeness}
-        - Cohérence : {evaluation.criteria.coherence}
-        - Faisabilité : {evaluation.criteria.feasibility}
-        - Clarté : {evaluation.criteria.clarity}
+        Critères les plus faibles : {weak_criteria or "aucun"}
         
-        Feedback :
-        Points forts : {json.dumps(evaluation.feedback["strengths"], indent=2, ensure_ascii=False)}
-        Points faibles : {json.dumps(evaluation.feedback["weaknesses"], indent=2, ensure_ascii=False)}
-        Aspects techniques : {json.dumps(evaluation.feedback["technical"], indent=2, ensure_ascii=False)}
-        Aspects fonctionnels : {json.dumps(evaluation.feedback["functional"], indent=2, ensure_ascii=False)}
+        Points faibles :
+        {compact_list(weaknesses)}
         
         Suggestions d'amélioration :
-        {json.dumps(evaluation.improvement_suggestions, indent=2, ensure_ascii=False)}
-        
+        {compact_list(suggestions)}
+        """).add(
+            f"Points forts :\n{compact_list(strengths)}", trim_priority=1
+        ).add(
+            f"Aspects techniques :\n{compact_list(technical)}\n"
+            f"Aspects fonctionnels :\n{compact_list(functional)}",
+            trim_priority=2
+        ).add(f"""
         Optimise les spécifications en tenant compte du feedback et génère une réponse au format JSON suivant :
         {{
             "improved_specification": {{
@@ -91,30 +123,27 @@ class Optimizer(Agent):
         2. Les améliorations sont concrètes et mesurables
         3. La cohérence globale est maintenue
         4. Les changements sont clairement documentés
-        """
+        """).build()
         
         # Utilisation de l'API Claude pour optimiser les spécifications
-        self.logger.debug(f"Début de l'optimisation des spécifications (score actuel: {evaluation.total_score})")
-        response = self.complete(prompt)
+        self.logger.debug("Début de l'optimisation des spécifications (score actuel: %s)", evaluation.total_score)
+        # La dernière optimisation de la boucle peut justifier un modèle plus puissant
+        model = self.route(
+            OPTIMIZE, prompt, score=evaluation.total_score, final=getattr(context, "final_iteration", False)
+        )
+        response = self.response_cache.get_or_compute(
+            model,
+            self.system_prompt,
+            prompt,
+            lambda: self.complete(prompt, model, OPTIMIZE)
+        )
         self.logger.debug("Réponse reçue de Claude")
         
         try:
             self.logger.debug("Traitement de la réponse d'optimisation")
-            # Conversion de la réponse en dictionnaire
-            opt_dict = json.loads(response)
-            
-            # Conversion des pages en objets PageSection dans la spécification améliorée
-            improved_spec = opt_dict["improved_specification"]
-            pages_dict = {}
-            for page_name, page_data in improved_spec["pages"].items():
-                pages_dict[page_name] = PageSection(**page_data)
-            improved_spec["pages"] = pages_dict
-            
-            # Conversion du tech_stack en utilisant l'énumération
-            tech_stack_dict = {}
-            for category, technologies in improved_spec["tech_stack"].items():
-                tech_stack_dict[TechStackCategory(category)] = technologies
-            improved_spec["tech_stack"] = tech_stack_dict
+            # Validation de la réponse en une seule passe (spécification, modifications et score)
+            parsed = parse_response(response, OptimizerResponse)
+            improved_spec = parsed.improved_specification
             
             # Stockage de la nouvelle version dans le ContextManager
             new_version_id = self.context_manager.store_specification_version(
@@ -135,18 +164,15 @@ class Optimizer(Agent):
             )
             
             # Création de la spécification versionnée améliorée
-            improved_spec_obj = VersionedWebSpecification(
-                **WebSpecification(**improved_spec).dict(),
-                metadata=metadata
-            )
+            improved_spec_obj = VersionedWebSpecification.from_specification(improved_spec, metadata)
             
-            # Création de l'objet OptimizationResult
-            result = OptimizationResult(
+            # Création de l'objet OptimizationResult à partir des éléments déjà validés
+            result = OptimizationResult.model_construct(
                 original_version_id=spec.metadata.version_id,
                 new_version_id=new_version_id,
                 improved_specification=improved_spec_obj,
-                changes_made=[OptimizationChange(**change) for change in opt_dict["changes"]],
-                optimization_score=opt_dict["optimization_score"],
+                changes_made=parsed.changes,
+                optimization_score=parsed.optimization_score,
                 optimizer_name="Optimizer",
                 timestamp=datetime.utcnow()
             )
@@ -159,6 +185,146 @@ class Optimizer(Agent):
             return result
             
         except Exception as e:
+            # Une réponse inexploitable ne doit pas être resservie depuis le cache
+            self.response_cache.invalidate(model, self.system_prompt, prompt)
             error_msg = f"Erreur lors de l'optimisation des spécifications : {str(e)}"
             self.logger.error(error_msg)
             raise ValueError(error_msg)
+
+    def optimize_sections(
+        self,
+        context: RunContext[str],
+        spec: VersionedWebSpecification,
+        evaluation: EvaluationResult,
+        sections: List[str]
+    ) -> OptimizationResult:
+        """Optimise uniquement les pages indiquées et conserve les autres à l'identique."""
+        pages = {name: spec.pages[name] for name in sections if name in spec.pages}
+        revision = self.revise_sections(context, pages, evaluation)
+        return self.apply_sections(context, spec, [(sections, revision)])
+
+    def revise_sections(
+        self,
+        context: RunContext[str],
+        pages: Dict[str, Any],
+        evaluation: Union[EvaluationResult, EvaluatorResponse]
+    ) -> SectionsResponse:
+        """Propose une version améliorée des pages indiquées, sans l'enregistrer.
+
+        Les révisions sont appliquées à une spécification par `apply_sections`.
+        """
+        current_pages = {name: page.model_dump() for name, page in pages.items()}
+        weaknesses, suggestions = unique_items(
+            evaluation.feedback.get("weaknesses", []), evaluation.improvement_suggestions
+        )
+        prompt = PromptBuilder(get_prompt_budget("Optimizer")).add(
+            context_section(context.value, current_pages), trim_priority=0
+        ).add(
+            f"Pages à optimiser :\n{compact_json(current_pages)}"
+        ).add(f"""
+        Évaluation reçue (score total : {evaluation.total_score}) :
+        Points faibles :
+        {compact_list(weaknesses)}
+        Suggestions d'amélioration :
+        {compact_list(suggestions)}
+        
+        Optimise uniquement ces pages et génère une réponse au format JSON suivant :
+        {{
+            "pages": {{
+                "page_name": {{
+                    "name": "Nom de la page",
+                    "description": "Description de la page",
+                    "components": ["Liste des composants"],
+                    "dynamic_elements": ["Éléments dynamiques"],
+                    "interactions": ["Interactions utilisateur"]
+                }}
+            }},
+            "changes": [
+                {{
+                    "field_path": "pages.page_name.champ",
+                    "previous_value": "ancienne valeur",
+                    "new_value": "nouvelle valeur",
+                    "reason": "Justification du changement"
+                }}
+            ],
+            "optimization_score": 0.95
+        }}
+        """).build()
+        
+        self.logger.debug("Début de l'optimisation incrémentale des pages : %s", list(pages))
+        model = self.route(
+            OPTIMIZE_SECTIONS, prompt, score=evaluation.total_score, final=getattr(context, "final_iteration", False)
+        )
+        response = self.response_cache.get_or_compute(
+            model,
+            self.system_prompt,
+            prompt,
+            lambda: self.complete(prompt, model, OPTIMIZE_SECTIONS)
+        )
+        self.logger.debug("Réponse reçue de Claude")
+        
+        try:
+            parsed = parse_response(response, SectionsResponse)
+            if parsed.optimization_score is None:
+                raise ValueError("Score d'optimisation manquant dans la réponse")
+            parsed.pages = {name: page for name, page in parsed.pages.items() if name in pages}
+            return parsed
+            
+        except Exception as e:
+            self.response_cache.invalidate(model, self.system_prompt, prompt)
+            error_msg = f"Erreur lors de l'optimisation des spécifications : {str(e)}"
+            self.logger.error(error_msg)
+            raise ValueError(error_msg)
+
+    def apply_sections(
+        self,
+        context: RunContext[str],
+        spec: VersionedWebSpecification,
+        revisions: List[Tuple[List[str], SectionsResponse]]
+    ) -> OptimizationResult:
+        """Enregistre une nouvelle version intégrant les révisions de pages (pages concernées, révision).
+
+        Le score estimé est la moyenne des révisions pondérée par leur nombre de pages.
+        """
+        updated_pages = {}
+        changes = []
+        for sections, revision in revisions:
+            updated_pages.update({name: page for name, page in revision.pages.items() if name in sections})
+            changes.extend(revision.changes)
+        weight = sum(len(sections) for sections, _ in revisions) or 1
+        optimization_score = sum(len(sections) * revision.optimization_score for sections, revision in revisions) / weight
+        improved_spec = spec.specification().model_copy(
+            update={"pages": {**spec.pages, **updated_pages}}
+        )
+        
+        new_version_id = self.context_manager.store_specification_version(
+            specification_data=improved_spec,
+            agent_name="Optimizer",
+            action_type="optimization",
+            parent_id=spec.metadata.version_id
+        )
+        
+        metadata = VersionMetadata(
+            version_id=new_version_id,
+            parent_version_id=spec.metadata.version_id,
+            agent_name="Optimizer",
+            modification_type=ModificationType.OPTIMIZATION,
+            timestamp=datetime.utcnow(),
+            comment=f"Optimisation incrémentale des pages : {', '.join(updated_pages)}"
+        )
+        
+        result = OptimizationResult.model_construct(
+            original_version_id=spec.metadata.version_id,
+            new_version_id=new_version_id,
+            improved_specification=VersionedWebSpecification.from_specification(improved_spec, metadata),
+            changes_made=changes,
+            optimization_score=round(optimization_score, 4),
+            optimizer_name="Optimizer",
+            timestamp=datetime.utcnow()
+        )
+        
+        self.logger.info(
+            f"Optimisation incrémentale terminée : version {new_version_id}, "
+            f"{len(result.changes_made)} modifications"
+        )
+        return result
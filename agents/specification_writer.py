@@ -1,28 +1,41 @@
 from __future__ import annotations
-from pydantic_ai import Agent, RunContext
+from pydantic_ai import RunContext
+from agents.base import SpecAgent
 from models.specifications import (
     VersionedWebSpecification,
     WebSpecification,
-    PageSection,
-    TechStackCategory,
     VersionMetadata,
     ModificationType,
-    DependencyContext
+    DependencyContext,
+    SectionsUpdateResponse
 )
 from typing import Dict, List, Optional
 from datetime import datetime
-from utils.context_manager import ContextManager
-import json
-from utils.logging_config import get_logger
+from utils.context_manager import ContextManager, get_context_manager
+from utils.response_parsing import parse_response
+from utils.prompt_builder import PromptBuilder, compact_json, compact_list, get_prompt_budget
+from utils.response_cache import ResponseCache, get_response_cache
+from utils.anthropic_client import AnthropicClient
+from utils.model_router import HAIKU, ModelRouter, WRITE, UPDATE_SECTIONS
+from utils.logging_config import Payload, get_logger
 
-class SpecificationWriter(Agent):
-    def __init__(self, model="claude-3-haiku-20240307", context_manager: Optional[ContextManager] = None):
+# Champs communs aux pages qu'une mise à jour incrémentale peut aussi modifier
+SHARED_FIELDS = ("features", "tech_stack")
+
+class SpecificationWriter(SpecAgent):
+    def __init__(self, model: Optional[str] = None, context_manager: Optional[ContextManager] = None, response_cache: Optional[ResponseCache] = None, client: Optional[AnthropicClient] = None, model_router: Optional[ModelRouter] = None):
         super().__init__(
-            model,
+            model or HAIKU,
             result_type=VersionedWebSpecification,
             deps_type=str
         )
-        self.context_manager = context_manager or ContextManager()
+        self.context_manager = context_manager or get_context_manager()
+        self.response_cache = response_cache or get_response_cache()
+        self.model_name = model or HAIKU
+        # Un modèle explicite désactive le routage
+        self.pinned_model = model
+        self.model_router = model_router
+        self.client = client
         self.logger = get_logger("SpecificationWriter")
         self.logger.info("Initialisation de l'agent SpecificationWriter")
         self.system_prompt = """
@@ -44,10 +57,9 @@ class SpecificationWriter(Agent):
     
     def write_specification(self, context: RunContext[str]) -> VersionedWebSpecification:
         """Écrit un cahier des charges détaillé basé sur le contexte fourni."""
-        prompt = f"""
-        Contexte du projet :
-        {context.value}
-        
+        prompt = PromptBuilder(get_prompt_budget("SpecificationWriter")).add(
+            f"Contexte du projet :\n{context.value}", trim_priority=0
+        ).add(f"""
         Génère un cahier des charges complet au format JSON avec la structure suivante :
         {{
             "project_name": "Nom du projet",
@@ -78,38 +90,27 @@ class SpecificationWriter(Agent):
         }}
         
         Assure-toi que la sortie est un JSON valide et respecte exactement cette structure.
-        """
+        """).build()
         
         # Utilisation de l'API Claude pour générer les spécifications
-        self.logger.debug(f"Génération des spécifications pour le contexte : {context.value[:100]}...")
-        response = self.complete(prompt)
+        self.logger.debug("Génération des spécifications pour le contexte : %s", Payload(context.value, 100))
+        model = self.route(WRITE, prompt)
+        response = self.response_cache.get_or_compute(
+            model,
+            self.system_prompt,
+            prompt,
+            lambda: self.complete(prompt, model, WRITE)
+        )
         self.logger.debug("Réponse reçue de Claude")
         
         try:
             self.logger.debug("Traitement de la réponse")
-            # Conversion de la réponse en dictionnaire
-            spec_dict = json.loads(response)
-            
-            # Conversion des pages en objets PageSection
-            pages_dict = {}
-            for page_name, page_data in spec_dict["pages"].items():
-                pages_dict[page_name] = PageSection(**page_data)
-            
-            # Mise à jour du dictionnaire avec les pages converties
-            spec_dict["pages"] = pages_dict
-            
-            # Conversion du tech_stack en utilisant l'énumération
-            tech_stack_dict = {}
-            for category, technologies in spec_dict["tech_stack"].items():
-                tech_stack_dict[TechStackCategory(category)] = technologies
-            spec_dict["tech_stack"] = tech_stack_dict
-            
-            # Création de l'objet WebSpecification de base
-            base_spec = WebSpecification(**spec_dict)
+            # Validation de la réponse en une seule passe (pages et stack technique comprises)
+            base_spec = parse_response(response, WebSpecification)
             
             # Stockage dans le ContextManager et récupération de l'ID de version
             version_id = self.context_manager.store_specification_version(
-                specification_data=base_spec.dict(),
+                specification_data=base_spec,
                 agent_name="SpecificationWriter",
                 action_type="creation"
             )
@@ -125,10 +126,7 @@ class SpecificationWriter(Agent):
             )
             
             # Création de la spécification versionnée
-            versioned_spec = VersionedWebSpecification(
-                **base_spec.dict(),
-                metadata=metadata
-            )
+            versioned_spec = VersionedWebSpecification.from_specification(base_spec, metadata)
             
             # Enregistrement de la dépendance avec l'Evaluator
             self.context_manager.register_agent_dependency(
@@ -140,13 +138,131 @@ class SpecificationWriter(Agent):
                     context_type="evaluation_request",
                     data={"specification_id": version_id},
                     priority=1
-                ).dict()
+                ).model_dump()
             )
             
             self.logger.info(f"Spécifications versionnées générées avec succès (version {version_id})")
             return versioned_spec
             
         except Exception as e:
+            # Une réponse inexploitable ne doit pas être resservie depuis le cache
+            self.response_cache.invalidate(model, self.system_prompt, prompt)
             error_msg = f"Erreur lors de la génération des spécifications : {str(e)}"
             self.logger.error(error_msg)
             raise ValueError(error_msg)
+
+    def update_sections(
+        self,
+        context: RunContext[str],
+        spec: VersionedWebSpecification,
+        sections: List[str],
+        changes: List[str]
+    ) -> VersionedWebSpecification:
+        """Régénère uniquement les pages concernées par une modification du contexte.
+
+        Les fonctionnalités et la stack technique (`SHARED_FIELDS`) sont
+        révisées dans la même requête lorsque les lignes modifiées les
+        concernent ; l'évaluation demandée porte alors sur toute la spécification.
+        """
+        current_pages = {
+            name: spec.pages[name].model_dump() for name in sections if name in spec.pages
+        }
+        shared = spec.model_dump(mode="json", include=set(SHARED_FIELDS))
+        prompt = PromptBuilder(get_prompt_budget("SpecificationWriter")).add(
+            f"Contexte du projet (version modifiée) :\n{context.value}", trim_priority=0
+        ).add(f"""
+        Lignes du contexte modifiées depuis la version précédente :
+        {compact_list(changes)}
+        
+        Pages actuelles concernées par ces modifications :
+        {compact_json(current_pages)}
+        
+        Fonctionnalités et stack technique actuelles :
+        {compact_json(shared)}
+        
+        Mets à jour uniquement ces pages pour refléter les modifications et génère une réponse au format JSON suivant :
+        {{
+            "pages": {{
+                "page_name": {{
+                    "name": "Nom de la page",
+                    "description": "Description de la page",
+                    "components": ["Liste des composants"],
+                    "dynamic_elements": ["Éléments dynamiques"],
+                    "interactions": ["Interactions utilisateur"]
+                }}
+            }},
+            "features": ["Liste complète des fonctionnalités"],
+            "tech_stack": {{"frontend": ["Technologies"]}}
+        }}
+        
+        N'inclus "features" et "tech_stack" (listes complètes) que si les lignes modifiées les concernent.
+        Conserve les mêmes identifiants de pages et assure-toi que la sortie est un JSON valide.
+        """).build()
+        
+        self.logger.debug("Mise à jour incrémentale des pages : %s", sections)
+        model = self.route(UPDATE_SECTIONS, prompt)
+        response = self.response_cache.get_or_compute(
+            model,
+            self.system_prompt,
+            prompt,
+            lambda: self.complete(prompt, model, UPDATE_SECTIONS)
+        )
+        self.logger.debug("Réponse reçue de Claude")
+        
+        try:
+            update = parse_response(response, SectionsUpdateResponse)
+            updated_pages = {
+                page_name: page for page_name, page in update.pages.items() if page_name in sections
+            }
+            updated_fields = {
+                name: getattr(update, name) for name in SHARED_FIELDS
+                if getattr(update, name) is not None and getattr(update, name) != getattr(spec, name)
+            }
+            
+            # Fusion avec les pages et champs inchangés de la version précédente
+            base_spec = spec.specification().model_copy(
+                update={"pages": {**spec.pages, **updated_pages}, **updated_fields}
+            )
+            
+            version_id = self.context_manager.store_specification_version(
+                specification_data=base_spec,
+                agent_name="SpecificationWriter",
+                action_type="update",
+                parent_id=spec.metadata.version_id
+            )
+            
+            metadata = VersionMetadata(
+                version_id=version_id,
+                parent_version_id=spec.metadata.version_id,
+                agent_name="SpecificationWriter",
+                modification_type=ModificationType.UPDATE,
+                timestamp=datetime.utcnow(),
+                comment=f"Mise à jour incrémentale : {', '.join([*updated_pages, *updated_fields])}"
+            )
+            
+            versioned_spec = VersionedWebSpecification.from_specification(base_spec, metadata)
+            
+            # Évaluation limitée aux pages modifiées, sauf si un champ commun a changé
+            data = {"specification_id": version_id}
+            if not updated_fields:
+                data["sections"] = list(updated_pages)
+            self.context_manager.register_agent_dependency(
+                source_agent="SpecificationWriter",
+                target_agent="Evaluator",
+                context_data=DependencyContext(
+                    source_version_id=version_id,
+                    target_agent="Evaluator",
+                    context_type="evaluation_request",
+                    data=data,
+                    priority=1
+                ).model_dump()
+            )
+            
+            self.logger.info(f"Pages mises à jour avec succès (version {version_id})")
+            return versioned_spec
+            
+        except Exception as e:
+            self.response_cache.invalidate(model, self.system_prompt, prompt)
+            error_msg = f"Erreur lors de la mise à jour des spécifications : {str(e)}"
+            self.logger.error(error_msg)
+            raise ValueError(error_msg)
@@ -0,0 +1,707 @@
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, replace
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from agents.convergence import NO_CHANGES, TARGET_REACHED, ConvergenceBudget, ConvergenceController, ConvergenceState
+from agents.evaluator import Evaluator
+from agents.optimizer import Optimizer
+from agents.specification_writer import SHARED_FIELDS, SpecificationWriter
+from models.specifications import (
+    VersionedWebSpecification,
+    EvaluationResult,
+    OptimizationResult,
+    VersionMetadata,
+    ModificationType
+)
+from utils.anthropic_client import UsageMeter, track_usage
+from utils.cassette import cassette_mode
+from utils.context_manager import ContextManager, get_context_manager
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics
+from utils.similarity_index import SimilarityIndex, SimilarMatch, get_similarity_index
+from utils.spec_sections import affected_sections, changed_lines
+
+# Raison d'arrêt d'une soumission identique à la précédente (résultat réutilisé)
+UNCHANGED = "unchanged"
+
+
+@dataclass
+class WorkflowContext:
+    """Contexte transmis aux outils des agents (contexte initial du projet)."""
+    value: str
+    project_id: str = "default"
+    # Compteur des tokens consommés par le projet (budget de convergence)
+    usage: Optional[UsageMeter] = None
+    # Dernière optimisation autorisée de la boucle (routage vers un modèle plus puissant)
+    final_iteration: bool = False
+
+
+@dataclass
+class WorkflowResult:
+    """Résultat d'une boucle Evaluator-Optimizer pour un projet."""
+    project_id: str
+    specification: VersionedWebSpecification
+    evaluations: List[EvaluationResult] = field(default_factory=list)
+    optimizations: List[OptimizationResult] = field(default_factory=list)
+    target_reached: bool = False
+    stop_reason: Optional[str] = None
+    tokens_used: int = 0
+    # Spécification d'un brief similaire reprise comme point de départ (version et similarité)
+    warm_start_version: Optional[str] = None
+    warm_start_similarity: Optional[float] = None
+
+    @property
+    def iterations(self) -> int:
+        return len(self.optimizations)
+
+    @property
+    def final_evaluation(self) -> Optional[EvaluationResult]:
+        """Évaluation de la version retenue (la meilleure évaluée)."""
+        for evaluation in reversed(self.evaluations):
+            if evaluation.specification_version == self.specification.metadata.version_id:
+                return evaluation
+        return self.evaluations[-1] if self.evaluations else None
+
+    @property
+    def final_score(self) -> Optional[float]:
+        evaluation = self.final_evaluation
+        return evaluation.total_score if evaluation else None
+
+
+@dataclass
+class IncrementalPlan:
+    """Base d'une mise à jour incrémentale : résultat précédent et modifications du contexte."""
+    specification: VersionedWebSpecification
+    evaluation: EvaluationResult
+    # Lignes ajoutées ou supprimées (aucune : contexte inchangé) et pages concernées
+    lines: List[str]
+    sections: List[str]
+
+
+@dataclass
+class WorkflowEvent:
+    """Étape de progression d'un workflow (writing, evaluating, optimizing, done)."""
+    stage: str
+    message: str
+    iteration: int = 0
+    score: Optional[float] = None
+    result: Optional[WorkflowResult] = None
+
+
+class WorkflowEngine:
+    """Orchestrateur asynchrone SpecificationWriter → Evaluator → Optimizer.
+
+    Les appels bloquants des agents sont exécutés dans des threads afin de ne
+    pas bloquer la boucle d'événements (serveur Gradio), et le nombre de
+    projets traités simultanément est borné par `max_concurrency`. L'arrêt de
+    la boucle d'optimisation est décidé par le ConvergenceController.
+    """
+
+    def __init__(
+        self,
+        context_manager: Optional[ContextManager] = None,
+        writer: Optional[SpecificationWriter] = None,
+        evaluator: Optional[Evaluator] = None,
+        optimizer: Optional[Optimizer] = None,
+        target_score: float = Evaluator.OPTIMIZATION_THRESHOLD,
+        max_iterations: int = 3,
+        max_concurrency: Optional[int] = None,
+        parallel_evaluation: Optional[bool] = None,
+        convergence: Optional[ConvergenceController] = None,
+        similarity_index: Optional[SimilarityIndex] = None,
+        warm_start_threshold: Optional[float] = None,
+        pipelined: Optional[bool] = None,
+        pipeline_groups: Optional[int] = None
+    ):
+        self.context_manager = context_manager or get_context_manager()
+        # Les agents par défaut sont créés au premier usage
+        self._writer = writer
+        self._evaluator = evaluator
+        self._optimizer = optimizer
+        self.target_score = target_score
+        self.max_iterations = max_iterations
+        self.max_concurrency = max_concurrency or int(os.getenv("WORKFLOW_MAX_CONCURRENCY", "4"))
+        # Évaluation critère par critère en requêtes parallèles
+        if parallel_evaluation is None:
+            parallel_evaluation = os.getenv("WORKFLOW_PARALLEL_EVALUATION", "").lower() in ("1", "true", "on")
+        self.parallel_evaluation = parallel_evaluation
+        self.convergence = convergence or ConvergenceController(target_score, max_iterations)
+        # Reprise de la spécification d'un brief quasi identique (0 = désactivée)
+        if warm_start_threshold is None:
+            # Avec une cassette, la reprise dépendrait de l'index local et changerait les prompts
+            warm_start_threshold = 0 if cassette_mode() else float(os.getenv("WARM_START_THRESHOLD", "0.8") or 0)
+        self.warm_start_threshold = warm_start_threshold
+        self._similarity_index = similarity_index
+        # Évaluation et optimisation en pipeline, pages réparties en `pipeline_groups` groupes
+        if pipelined is None:
+            pipelined = os.getenv("WORKFLOW_PIPELINED", "").lower() in ("1", "true", "on")
+        self.pipelined = pipelined
+        self.pipeline_groups = pipeline_groups or int(os.getenv("WORKFLOW_PIPELINE_GROUPS", "4"))
+        self.logger = get_logger("WorkflowEngine")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._agents_lock = threading.Lock()
+
+    @property
+    def writer(self) -> SpecificationWriter:
+        if self._writer is None:
+            with self._agents_lock:
+                if self._writer is None:
+                    self._writer = SpecificationWriter(context_manager=self.context_manager)
+        return self._writer
+
+    @property
+    def evaluator(self) -> Evaluator:
+        if self._evaluator is None:
+            with self._agents_lock:
+                if self._evaluator is None:
+                    self._evaluator = Evaluator(context_manager=self.context_manager)
+        return self._evaluator
+
+    @property
+    def optimizer(self) -> Optimizer:
+        if self._optimizer is None:
+            with self._agents_lock:
+                if self._optimizer is None:
+                    self._optimizer = Optimizer(context_manager=self.context_manager)
+        return self._optimizer
+
+    @property
+    def similarity_index(self) -> SimilarityIndex:
+        if self._similarity_index is None:
+            self._similarity_index = get_similarity_index()
+        return self._similarity_index
+
+    def warm_up(self) -> None:
+        """Crée les agents à l'avance pour que la première requête n'en supporte pas le coût."""
+        for agent in (self.writer, self.evaluator, self.optimizer):
+            self.logger.debug("Agent %s prêt", type(agent).__name__)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Un sémaphore est lié à la boucle d'événements qui l'utilise
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _call(self, context: WorkflowContext, func, *args):
+        """Exécute un appel d'agent bloquant dans un thread, rattaché au projet du contexte."""
+        stage = getattr(func, "__name__", "call").lstrip("_")
+        duration = get_metrics().histogram(
+            "workflow_stage_duration_seconds", "Durée des étapes du workflow", ("stage", "outcome")
+        )
+
+        def run():
+            started_at = time.perf_counter()
+            outcome = "error"
+            try:
+                with self.context_manager.project_scope(context.project_id), track_usage(context.usage):
+                    result = func(context, *args)
+                outcome = "success"
+                return result
+            finally:
+                duration.observe(time.perf_counter() - started_at, stage=stage, outcome=outcome)
+        return await asyncio.to_thread(run)
+
+    def evaluate(self, context: WorkflowContext, spec: VersionedWebSpecification) -> EvaluationResult:
+        """Évaluation complète de la spécification, critère par critère si `parallel_evaluation`."""
+        if self.parallel_evaluation:
+            return self.evaluator.evaluate_specification_by_criterion(context, spec)
+        return self.evaluator.evaluate_specification(context, spec)
+
+    def _find_warm_start(
+        self,
+        context: WorkflowContext
+    ) -> Optional[Tuple[SimilarMatch, VersionedWebSpecification, EvaluationResult]]:
+        """Spécification et évaluation finales du brief indexé le plus proche d'un autre projet."""
+        if not self.warm_start_threshold:
+            return None
+        match = self.similarity_index.find(
+            context.value, self.warm_start_threshold, exclude={context.project_id}
+        )
+        if match is None or not match.payload.get("evaluation"):
+            return None
+        reference = self.context_manager.get_specification(match.payload["specification_version_id"])
+        if reference is None:
+            return None
+        return match, reference, EvaluationResult(**match.payload["evaluation"])
+
+    def _adopt_specification(
+        self,
+        context: WorkflowContext,
+        reference: VersionedWebSpecification
+    ) -> VersionedWebSpecification:
+        """Copie la spécification de référence comme première version du projet."""
+        base_spec = reference.specification()
+        version_id = self.context_manager.store_specification_version(
+            specification_data=base_spec,
+            agent_name="WorkflowEngine",
+            action_type="creation"
+        )
+        metadata = VersionMetadata(
+            version_id=version_id,
+            agent_name="WorkflowEngine",
+            modification_type=ModificationType.CREATION,
+            comment=f"Reprise de la version {reference.metadata.version_id} (brief similaire)"
+        )
+        return VersionedWebSpecification.from_specification(base_spec, metadata)
+
+    @staticmethod
+    def _adaptation_request(
+        evaluation: EvaluationResult,
+        spec: VersionedWebSpecification,
+        lines: List[str]
+    ) -> EvaluationResult:
+        """Évaluation de référence complétée des écarts entre les deux briefs, pour l'Optimizer."""
+        return evaluation.model_copy(update={
+            "specification_version": spec.metadata.version_id,
+            "improvement_suggestions": [
+                f"Adapter la spécification à cet écart avec le brief d'origine : {line}" for line in lines
+            ] + list(evaluation.improvement_suggestions)
+        })
+
+    def _finish(self, result: WorkflowResult, state: ConvergenceState, reason: Optional[str]) -> None:
+        """Conserve la meilleure version évaluée et note la raison de l'arrêt."""
+        result.stop_reason = reason
+        result.target_reached = reason == TARGET_REACHED
+        result.tokens_used = state.usage.total_tokens
+        metrics = get_metrics()
+        metrics.counter(
+            "workflow_stops_total", "Arrêts de la boucle d'optimisation", ("reason",)
+        ).inc(reason=reason)
+        metrics.histogram(
+            "workflow_iterations", "Itérations d'optimisation par workflow", buckets=(0, 1, 2, 3, 5, 8)
+        ).observe(result.iterations)
+        if state.best_specification is not None:
+            result.specification = state.best_specification
+        self.logger.info(
+            f"Arrêt de l'optimisation du projet {state.project_id} ({reason}) après "
+            f"{result.iterations} itération(s), {result.tokens_used} tokens, {state.elapsed:.1f}s"
+        )
+
+    def _pipeline_chunks(self, spec: VersionedWebSpecification) -> List[List[str]]:
+        """Groupes de pages traités en pipeline (liste vide : boucle séquentielle)."""
+        if not self.pipelined or len(spec.pages) < 2:
+            return []
+        names = list(spec.pages)
+        size = -(-len(names) // min(self.pipeline_groups, len(names)))
+        return [names[index:index + size] for index in range(0, len(names), size)]
+
+    async def _run_pipelined(
+        self,
+        context: WorkflowContext,
+        state: ConvergenceState,
+        spec: VersionedWebSpecification,
+        result: WorkflowResult,
+        chunks: List[List[str]]
+    ) -> AsyncIterator[WorkflowEvent]:
+        """Boucle Evaluator-Optimizer en pipeline par groupes de pages.
+
+        Chaque groupe enchaîne évaluation, optimisation et réévaluation de ses
+        pages sans attendre les autres. Les résultats des groupes sont combinés
+        tour par tour en une évaluation et une optimisation de la spécification
+        complète, soumises au ConvergenceController comme dans la boucle
+        séquentielle ; le travail spéculatif d'un groupe en avance sur un arrêt
+        est abandonné. La raison de l'arrêt est notée dans `result.stop_reason`.
+
+        Plus rapide sur les spécifications de plusieurs pages, ce mode consomme
+        davantage de tokens : le contexte, les champs communs et les consignes
+        sont répétés dans les requêtes de chaque groupe.
+        """
+        max_iterations = self.convergence.max_iterations
+        target_score = self.convergence.target_score
+        loop = asyncio.get_running_loop()
+        # Par tour et par groupe : (pages, évaluation partielle), puis révision (None si inchangé)
+        evaluations = [[loop.create_future() for _ in chunks] for _ in range(max_iterations + 1)]
+        revisions = [[loop.create_future() for _ in chunks] for _ in range(max_iterations + 1)]
+        spec_data = spec.model_dump(mode="json", exclude={"metadata"})
+
+        def settle(future: asyncio.Future, value=None, error: Optional[BaseException] = None) -> None:
+            if not future.done():
+                if error is None:
+                    future.set_result(value)
+                else:
+                    future.set_exception(error)
+
+        async def track(index: int, sections: List[str]) -> None:
+            pages = {name: spec.pages[name] for name in sections}
+            try:
+                for round_index in range(max_iterations + 1):
+                    data = {**spec_data, "pages": {name: page.model_dump(mode="json") for name, page in pages.items()}}
+                    partial = await self._call(context, self.evaluator.assess_sections, data, sections)
+                    settle(evaluations[round_index][index], (pages, partial))
+                    if round_index == max_iterations or partial.total_score >= target_score:
+                        break
+                    # Chaque groupe avance à son rythme : le dernier tour est propre au groupe
+                    round_context = replace(context, final_iteration=round_index + 1 == max_iterations)
+                    revision = await self._call(round_context, self.optimizer.revise_sections, pages, partial)
+                    if not revision.changes:
+                        break
+                    settle(revisions[round_index + 1][index], revision)
+                    pages = {**pages, **revision.pages}
+                # Groupe terminé : ses pages et son évaluation valent pour les tours suivants
+                for round_futures in evaluations:
+                    settle(round_futures[index], (pages, partial))
+                for round_futures in revisions:
+                    settle(round_futures[index], None)
+            except Exception as e:
+                for round_futures in evaluations + revisions:
+                    settle(round_futures[index], error=e)
+
+        tasks = [asyncio.create_task(track(index, sections)) for index, sections in enumerate(chunks)]
+        iteration = 0
+        reason = None
+        try:
+            while True:
+                yield WorkflowEvent(
+                    stage="evaluating",
+                    message=f"Évaluation de la version {spec.metadata.version_id} ({len(chunks)} groupes de pages)",
+                    iteration=iteration
+                )
+                parts = [await future for future in evaluations[iteration]]
+                evaluation = await self._call(
+                    context,
+                    self.evaluator.merge_section_evaluations,
+                    spec,
+                    [(len(pages), partial) for pages, partial in parts]
+                )
+                result.evaluations.append(evaluation)
+                state.record_evaluation(spec, evaluation)
+                reason = self.convergence.after_evaluation(state, iteration)
+                if reason:
+                    break
+
+                iteration += 1
+                yield WorkflowEvent(
+                    stage="optimizing",
+                    message=f"Optimisation (itération {iteration}/{max_iterations})",
+                    iteration=iteration,
+                    score=evaluation.total_score
+                )
+                revised = [
+                    (chunks[index], revision)
+                    for index, revision in enumerate([await future for future in revisions[iteration]])
+                    if revision is not None
+                ]
+                if not revised:
+                    reason = NO_CHANGES
+                    break
+                optimization = await self._call(context, self.optimizer.apply_sections, spec, revised)
+                result.optimizations.append(optimization)
+                reason = self.convergence.after_optimization(state, optimization)
+                if reason:
+                    break
+                spec = optimization.improved_specification
+                result.specification = spec
+        finally:
+            for task in tasks:
+                task.cancel()
+            for future in (future for round_futures in evaluations + revisions for future in round_futures):
+                if not future.done():
+                    future.cancel()
+                elif not future.cancelled():
+                    # Résultats spéculatifs abandonnés : les erreurs sont considérées comme lues
+                    future.exception()
+        result.stop_reason = reason
+
+    async def run(
+        self,
+        user_input: str,
+        project_id: Optional[str] = None,
+        budget: Optional[ConvergenceBudget] = None
+    ) -> WorkflowResult:
+        """Exécute la boucle complète pour un projet jusqu'à convergence ou épuisement du budget."""
+        result = None
+        async for event in self.run_stream(user_input, project_id, budget):
+            result = event.result or result
+        return result
+
+    async def run_stream(
+        self,
+        user_input: str,
+        project_id: Optional[str] = None,
+        budget: Optional[ConvergenceBudget] = None
+    ) -> AsyncIterator[WorkflowEvent]:
+        """Variante de `run` qui produit un événement à chaque étape du workflow.
+
+        Le dernier événement (stage "done") porte le WorkflowResult.
+        """
+        context = WorkflowContext(value=user_input, project_id=project_id or uuid.uuid4().hex)
+        yield WorkflowEvent(stage="queued", message="En attente d'un emplacement de traitement")
+        queued_at = time.perf_counter()
+        async with self._get_semaphore():
+            get_metrics().histogram(
+                "workflow_queue_wait_seconds", "Attente d'un emplacement de traitement"
+            ).observe(time.perf_counter() - queued_at)
+            self.logger.info(f"Démarrage du workflow pour le projet {context.project_id}")
+            state = self.convergence.start(context.project_id, budget)
+            context.usage = state.usage
+            warm_start = await asyncio.to_thread(self._find_warm_start, context)
+            adaptation = None
+            if warm_start is None:
+                yield WorkflowEvent(stage="writing", message="Rédaction des spécifications")
+                spec = await self._call(context, self.writer.write_specification)
+                result = WorkflowResult(project_id=context.project_id, specification=spec)
+            else:
+                # Un brief quasi identique a déjà abouti : sa spécification est adaptée
+                # par l'Optimizer au lieu d'être rédigée à partir de zéro
+                match, reference, reference_evaluation = warm_start
+                yield WorkflowEvent(
+                    stage="writing",
+                    message=f"Reprise d'une spécification similaire (similarité {match.similarity:.2f})"
+                )
+                spec = await self._call(context, self._adopt_specification, reference)
+                result = WorkflowResult(
+                    project_id=context.project_id,
+                    specification=spec,
+                    warm_start_version=reference.metadata.version_id,
+                    warm_start_similarity=match.similarity
+                )
+                lines = changed_lines(match.payload.get("user_input", ""), context.value)
+                if lines:
+                    adaptation = self._adaptation_request(reference_evaluation, spec, lines)
+
+            chunks = self._pipeline_chunks(spec) if adaptation is None else []
+            if chunks:
+                async for event in self._run_pipelined(context, state, spec, result, chunks):
+                    yield event
+                reason = result.stop_reason
+            else:
+                iteration = 0
+                while True:
+                    if adaptation is None:
+                        yield WorkflowEvent(
+                            stage="evaluating",
+                            message=f"Évaluation de la version {spec.metadata.version_id}",
+                            iteration=iteration
+                        )
+                        evaluation = await self._call(context, self.evaluate, spec)
+                        result.evaluations.append(evaluation)
+                        state.record_evaluation(spec, evaluation)
+                        reason = self.convergence.after_evaluation(state, iteration)
+                        if reason:
+                            break
+                    else:
+                        # La spécification reprise est d'abord adaptée au nouveau brief, puis évaluée
+                        evaluation, adaptation = adaptation, None
+
+                    iteration += 1
+                    yield WorkflowEvent(
+                        stage="optimizing",
+                        message=f"Optimisation (itération {iteration}/{self.convergence.max_iterations})",
+                        iteration=iteration,
+                        score=evaluation.total_score
+                    )
+                    context.final_iteration = iteration == self.convergence.max_iterations
+                    optimization = await self._call(
+                        context, self.optimizer.optimize_specification, spec, evaluation
+                    )
+                    result.optimizations.append(optimization)
+                    # Sans modification, la nouvelle version n'a pas besoin d'être réévaluée
+                    reason = self.convergence.after_optimization(state, optimization)
+                    if reason:
+                        break
+                    spec = optimization.improved_specification
+                    result.specification = spec
+
+            self._finish(result, state, reason)
+            await self._record_submission(context, result)
+            self.logger.info(
+                f"Workflow terminé pour le projet {context.project_id} : "
+                f"{result.iterations} itération(s), score final {result.final_score}"
+            )
+            yield WorkflowEvent(
+                stage="done",
+                message=f"Workflow terminé ({result.stop_reason})",
+                iteration=result.iterations,
+                score=result.final_score,
+                result=result
+            )
+
+    def incremental_plan(self, user_input: str, project_id: str) -> Optional[IncrementalPlan]:
+        """Compare le contexte à la soumission précédente du projet.
+
+        Retourne None si le workflow complet est nécessaire : pas de
+        soumission évaluée, ou ligne modifiée rattachée à aucune page.
+        """
+        previous = self.context_manager.get_last_submission(project_id)
+        if previous is None or not previous["data"].get("evaluation"):
+            return None
+        data = previous["data"]
+        spec = self.context_manager.get_specification(data["specification_version_id"])
+        if spec is None:
+            return None
+        lines = changed_lines(data["user_input"], user_input)
+        sections = affected_sections(spec.pages, lines) if lines else []
+        if lines and not sections:
+            self.logger.info(f"Modification globale pour le projet {project_id} : workflow complet")
+            return None
+        return IncrementalPlan(spec, EvaluationResult(**data["evaluation"]), lines, sections)
+
+    @staticmethod
+    def incremental_scope(plan: IncrementalPlan, spec: VersionedWebSpecification) -> Optional[List[str]]:
+        """Pages à évaluer et optimiser après la mise à jour, None pour toute la spécification.
+
+        Une mise à jour qui modifie aussi les fonctionnalités ou la stack
+        technique concerne toutes les pages.
+        """
+        if any(getattr(spec, name) != getattr(plan.specification, name) for name in SHARED_FIELDS):
+            return None
+        return plan.sections
+
+    async def run_incremental(self, user_input: str, project_id: str) -> WorkflowResult:
+        """Met à jour un projet existant en ne retraitant que les pages touchées par la modification.
+
+        Le contexte est comparé à la soumission précédente du projet ; les pages
+        concernées sont régénérées, évaluées et optimisées, les autres pages et
+        l'évaluation précédente étant réutilisées. Sans soumission précédente, ou
+        si la modification ne peut être rattachée à des pages, le workflow
+        complet est exécuté.
+        """
+        result = None
+        async for event in self.run_incremental_stream(user_input, project_id):
+            result = event.result or result
+        return result
+
+    async def run_incremental_stream(self, user_input: str, project_id: str) -> AsyncIterator[WorkflowEvent]:
+        """Variante de `run_incremental` qui produit un événement à chaque étape."""
+        plan = await asyncio.to_thread(self.incremental_plan, user_input, project_id)
+        if plan is None:
+            async for event in self.run_stream(user_input, project_id):
+                yield event
+            return
+        if not plan.lines:
+            self.logger.info(f"Contexte inchangé pour le projet {project_id} : résultat précédent réutilisé")
+            result = WorkflowResult(
+                project_id=project_id,
+                specification=plan.specification,
+                evaluations=[plan.evaluation],
+                target_reached=plan.evaluation.total_score >= self.target_score,
+                stop_reason=UNCHANGED
+            )
+            yield WorkflowEvent(
+                stage="done",
+                message="Contexte inchangé : résultat précédent réutilisé",
+                score=result.final_score,
+                result=result
+            )
+            return
+
+        context = WorkflowContext(value=user_input, project_id=project_id)
+        yield WorkflowEvent(stage="queued", message="En attente d'un emplacement de traitement")
+        async with self._get_semaphore():
+            self.logger.info(
+                f"Mise à jour incrémentale du projet {project_id} : pages {', '.join(plan.sections)}"
+            )
+            state = self.convergence.start(project_id)
+            context.usage = state.usage
+            yield WorkflowEvent(
+                stage="writing", message=f"Mise à jour des pages {', '.join(plan.sections)}"
+            )
+            spec = await self._call(
+                context, self.writer.update_sections, plan.specification, plan.sections, plan.lines
+            )
+            result = WorkflowResult(project_id=project_id, specification=spec)
+            sections = self.incremental_scope(plan, spec)
+            evaluation = plan.evaluation
+
+            iteration = 0
+            while True:
+                yield WorkflowEvent(
+                    stage="evaluating",
+                    message=f"Évaluation de la version {spec.metadata.version_id}",
+                    iteration=iteration
+                )
+                if sections is None:
+                    evaluation = await self._call(context, self.evaluate, spec)
+                else:
+                    evaluation = await self._call(
+                        context, self.evaluator.evaluate_sections, spec, sections, evaluation
+                    )
+                result.evaluations.append(evaluation)
+                state.record_evaluation(spec, evaluation)
+                reason = self.convergence.after_evaluation(state, iteration)
+                if reason:
+                    break
+
+                iteration += 1
+                yield WorkflowEvent(
+                    stage="optimizing",
+                    message=f"Optimisation (itération {iteration}/{self.convergence.max_iterations})",
+                    iteration=iteration,
+                    score=evaluation.total_score
+                )
+                context.final_iteration = iteration == self.convergence.max_iterations
+                if sections is None:
+                    optimization = await self._call(
+                        context, self.optimizer.optimize_specification, spec, evaluation
+                    )
+                else:
+                    optimization = await self._call(
+                        context, self.optimizer.optimize_sections, spec, evaluation, sections
+                    )
+                result.optimizations.append(optimization)
+                reason = self.convergence.after_optimization(state, optimization)
+                if reason:
+                    break
+                spec = optimization.improved_specification
+                result.specification = spec
+
+            self._finish(result, state, reason)
+            await self._record_submission(context, result)
+            yield WorkflowEvent(
+                stage="done",
+                message=f"Mise à jour terminée ({result.stop_reason})",
+                iteration=result.iterations,
+                score=result.final_score,
+                result=result
+            )
+
+    async def _record_submission(self, context: WorkflowContext, result: WorkflowResult) -> None:
+        """Mémorise le contexte soumis et son résultat, base des mises à jour incrémentales.
+
+        Les résultats évalués sont aussi indexés pour servir de point de départ
+        aux briefs similaires d'autres projets.
+        """
+        final_evaluation = result.final_evaluation
+        evaluation = final_evaluation.model_dump(mode="json") if final_evaluation else None
+        await asyncio.to_thread(
+            self.context_manager.record_submission,
+            context.value,
+            result.specification.metadata.version_id,
+            evaluation,
+            context.project_id
+        )
+        if evaluation and self.warm_start_threshold:
+            await asyncio.to_thread(
+                self.similarity_index.add,
+                context.project_id,
+                context.value,
+                {
+                    "user_input": context.value,
+                    "specification_version_id": result.specification.metadata.version_id,
+                    "evaluation": evaluation
+                }
+            )
+
+    async def run_many(
+        self,
+        projects: Iterable[Tuple[str, str]]
+    ) -> List[WorkflowResult | BaseException]:
+        """Exécute concurremment les workflows de plusieurs projets (project_id, contexte).
+
+        Un échec sur un projet n'interrompt pas les autres : l'exception est
+        retournée à sa place dans la liste des résultats.
+        """
+        tasks = [self.run(user_input, project_id) for project_id, user_input in projects]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run_sync(self, user_input: str, project_id: Optional[str] = None) -> WorkflowResult:
+        """Variante synchrone de `run` pour les scripts."""
+        return asyncio.run(self.run(user_input, project_id))
@@ -0,0 +1,154 @@
+"""Mémoire occupée par un historique de versions selon sa représentation.
+
+Construit une chaîne de `--iterations` optimisations successives (chacune
+modifie une page et ajoute une fonctionnalité, comme l'Optimizer) et mesure
+avec tracemalloc la mémoire retenue par :
+
+- pydantic : un `VersionedWebSpecification` par version ;
+- json : un dictionnaire indépendant par version (ancien cache du VersionStore) ;
+- store : cache des versions reconstituées du `VersionStore` (données figées
+  par `compact_history.freeze` : chaînes internées, pages inchangées partagées).
+
+Le temps d'accès à une version (reconstruction pydantic à la demande, comme
+`ContextManager.get_specification`) est mesuré sur chacune d'elles.
+
+Usage : python -m benchmarks.bench_history_memory [--iterations 100] [--pages 20]
+"""
+import argparse
+import copy
+import gc
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.fake_model import fake_specification
+from models.specifications import ModificationType, VersionedWebSpecification, VersionMetadata
+from utils.version_store import VersionStore
+
+
+def build_chain(iterations: int, pages: int) -> List[Dict[str, Any]]:
+    """Versions successives au format de `VersionStore.get_version`, sérialisées en JSON."""
+    spec = fake_specification(pages)
+    versions = []
+    parent_id = None
+    for iteration in range(iterations + 1):
+        if iteration:
+            page = spec["pages"][f"page_{iteration % pages}"]
+            page["description"] = f"{page['description'].split(' [')[0]} [révision {iteration}]"
+            page["components"] = page["components"] + [f"composant_ajouté_{iteration}"]
+            spec["features"] = spec["features"] + [f"Fonctionnalité ajoutée {iteration}"]
+        version_id = uuid.uuid4().hex
+        versions.append({
+            "version_id": version_id,
+            "parent_id": parent_id,
+            "agent_name": "Optimizer" if iteration else "SpecificationWriter",
+            "action_type": "optimization" if iteration else "creation",
+            "created_at": time.time(),
+            # Chaque version arrive sérialisée (stockage, réponse du modèle) : aucune chaîne partagée
+            "data": json.loads(json.dumps(spec))
+        })
+        parent_id = version_id
+    return versions
+
+
+def _pydantic(version: Dict[str, Any]) -> VersionedWebSpecification:
+    metadata = VersionMetadata(
+        version_id=version["version_id"],
+        parent_version_id=version["parent_id"],
+        agent_name=version["agent_name"],
+        modification_type=ModificationType(version["action_type"]),
+        timestamp=datetime.utcfromtimestamp(version["created_at"])
+    )
+    return VersionedWebSpecification(**version["data"], metadata=metadata)
+
+
+def keep_pydantic(versions: List[Dict[str, Any]]) -> Tuple[Any, Callable[[int], Any]]:
+    history = [_pydantic(version) for version in versions]
+    return history, lambda index: history[index]
+
+
+def keep_json(versions: List[Dict[str, Any]]) -> Tuple[Any, Callable[[int], Any]]:
+    history = [copy.deepcopy(version) for version in versions]
+    return history, lambda index: _pydantic(history[index])
+
+
+def keep_store(versions: List[Dict[str, Any]]) -> Tuple[Any, Callable[[int], Any]]:
+    """Versions enregistrées dans un VersionStore, puis relues pour peupler son cache."""
+    directory = tempfile.TemporaryDirectory()
+    store = VersionStore(f"{directory.name}/context.sqlite3", cache_size=len(versions))
+    ids = []
+    for version in versions:
+        ids.append(store.add_version(
+            "bench", version["data"], version["agent_name"], version["action_type"],
+            parent_id=ids[-1] if ids else None
+        ))
+    # Mesure limitée au cache : versions relues depuis la base (écritures et connexion hors mesure)
+    store._materialized.clear()
+    tracemalloc.clear_traces()
+    for version_id in ids:
+        store.get_version(version_id, frozen=True)
+    return (store, directory), lambda index: _pydantic(store.get_version(ids[index], frozen=True))
+
+
+REPRESENTATIONS = {"pydantic": keep_pydantic, "json": keep_json, "store": keep_store}
+
+
+def measure(name: str, iterations: int, pages: int) -> Dict[str, float]:
+    # Durée de construction mesurée sans tracemalloc, qui ralentit les allocations
+    versions = build_chain(iterations, pages)
+    started_at = time.perf_counter()
+    REPRESENTATIONS[name](versions)
+    build_seconds = time.perf_counter() - started_at
+
+    # Versions sources générées hors mesure, puis libérées : seule la représentation reste
+    gc.collect()
+    tracemalloc.start()
+    history, access = REPRESENTATIONS[name](versions)
+    del versions
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started_at = time.perf_counter()
+    for index in range(iterations + 1):
+        access(index)
+    access_seconds = (time.perf_counter() - started_at) / (iterations + 1)
+    del history
+    return {
+        "retained_kb": retained / 1024,
+        "peak_kb": peak / 1024,
+        "build_ms": build_seconds * 1000,
+        "access_ms": access_seconds * 1000
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mémoire d'un historique de versions par représentation")
+    parser.add_argument("--iterations", type=int, default=100, help="Optimisations successives")
+    parser.add_argument("--pages", type=int, default=20, help="Pages de la spécification")
+    args = parser.parse_args(argv)
+
+    print(f"Historique de {args.iterations + 1} versions, {args.pages} pages")
+    print(f"{'représentation':<15}{'retenue (Ko)':>14}{'pic (Ko)':>12}{'construction (ms)':>19}{'accès (ms)':>12}")
+    results = {}
+    for name in REPRESENTATIONS:
+        results[name] = measure(name, args.iterations, args.pages)
+        row = results[name]
+        print(
+            f"{name:<15}{row['retained_kb']:>14.0f}{row['peak_kb']:>12.0f}"
+            f"{row['build_ms']:>19.1f}{row['access_ms']:>12.3f}"
+        )
+    print(
+        f"store / pydantic : {results['store']['retained_kb'] / results['pydantic']['retained_kb']:.1%}, "
+        f"store / json : {results['store']['retained_kb'] / results['json']['retained_kb']:.1%}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""Benchmarks hors ligne du pipeline avec un modèle factice déterministe.
+
+Chaque scénario exécute une étape (rédaction, évaluation, optimisation,
+stockage, workflow complet séquentiel ou en pipeline par groupes de pages,
+analyse en streaming de l'interface) pour une
+taille de spécification et un niveau de concurrence donnés, puis rapporte
+le débit, les latences p50/p95/p99 et le pic mémoire.
+
+Usage :
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --latency 0.05 --concurrency 1 8 --save bench.json
+    python -m benchmarks.bench_pipeline --compare bench.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from agents.evaluator import Evaluator
+from agents.optimizer import Optimizer
+from agents.specification_writer import SpecificationWriter
+from agents.workflow import WorkflowContext, WorkflowEngine
+from benchmarks.fake_model import FakeAnthropicClient, FakeMessagesAPI, fake_specification
+from models.specifications import ModificationType, VersionedWebSpecification, VersionMetadata, WebSpecification
+from utils.context_manager import ContextManager
+from utils.model_router import ModelRouter
+from utils.response_cache import ResponseCache
+from utils.similarity_index import SimilarityIndex
+from utils.version_store import VersionStore
+
+# Nombre de pages des spécifications par taille
+SIZES = {"small": 3, "medium": 20, "large": 80}
+
+STAGES = ("writer", "evaluator", "optimizer", "storage", "workflow", "pipelined", "review")
+
+
+@dataclass
+class BenchmarkResult:
+    stage: str
+    size: str
+    concurrency: int
+    operations: int
+    errors: int
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    peak_memory_kb: float
+    tokens_per_op: float = 0.0
+
+    @property
+    def key(self) -> str:
+        return f"{self.stage}/{self.size}/c{self.concurrency}"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentile par rang le plus proche (0 pour une liste vide)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class Environment:
+    """Agents, stockage et cache isolés dans un dossier temporaire, branchés sur le modèle factice."""
+
+    def __init__(self, fake: FakeMessagesAPI, directory: str):
+        self.fake = fake
+        self.client = FakeAnthropicClient(fake)
+        self.context_manager = ContextManager(store=VersionStore(f"{directory}/context.sqlite3"))
+        self.response_cache = ResponseCache(f"{directory}/responses.sqlite3", max_entries=100_000)
+        self.router = ModelRouter()
+        self.similarity_index = SimilarityIndex(f"{directory}/similarity.sqlite3")
+        options = dict(
+            context_manager=self.context_manager,
+            response_cache=self.response_cache,
+            client=self.client,
+            model_router=self.router
+        )
+        self.writer = SpecificationWriter(**options)
+        self.evaluator = Evaluator(**options)
+        self.optimizer = Optimizer(**options)
+
+    def specification(self, pages: int) -> VersionedWebSpecification:
+        base_spec = WebSpecification.model_validate(fake_specification(pages))
+        version_id = self.context_manager.store_specification_version(base_spec, "Benchmark", "creation")
+        metadata = VersionMetadata(
+            version_id=version_id, agent_name="Benchmark", modification_type=ModificationType.CREATION
+        )
+        return VersionedWebSpecification.from_specification(base_spec, metadata)
+
+    def close(self) -> None:
+        self.response_cache.close()
+        self.similarity_index.close()
+        self.client.close()
+
+
+def _context(index: int) -> WorkflowContext:
+    # Un contexte distinct par opération : aucune réponse n'est servie par le cache
+    return WorkflowContext(
+        value=f"Application de gestion de projets collaboratifs, variante {index}.",
+        project_id=f"bench-{index}"
+    )
+
+
+def build_operation(stage: str, env: Environment, pages: int) -> Callable[[int], None]:
+    """Opération unitaire du scénario, appelée avec son numéro d'ordre."""
+    if stage == "writer":
+        return lambda index: env.writer.write_specification(_context(index))
+    if stage == "evaluator":
+        spec = env.specification(pages)
+        return lambda index: env.evaluator.evaluate_specification(_context(index), spec)
+    if stage == "optimizer":
+        spec = env.specification(pages)
+        evaluation = env.evaluator.evaluate_specification(_context(-1), spec)
+        return lambda index: env.optimizer.optimize_specification(_context(index), spec, evaluation)
+    if stage == "storage":
+        spec = env.specification(pages)
+
+        def store(index: int) -> None:
+            # Chaîne de versions dérivées puis reconstruction de la dernière
+            parent_id = spec.metadata.version_id
+            for step in range(5):
+                data = fake_specification(pages, optimizations=step + 1)
+                data["project_name"] = f"Projet {index}"
+                parent_id = env.context_manager.store_specification_version(
+                    data, "Benchmark", "optimization", parent_id=parent_id
+                )
+            env.context_manager.get_specification(parent_id)
+        return store
+    if stage == "review":
+        import main
+        main.get_client = lambda: env.client
+        main.get_response_cache = lambda: env.response_cache
+        main.get_model_router = lambda: env.router
+
+        def review(index: int) -> None:
+            for _ in main.process_specification(f"Projet {index}", "Description", "Exigences", "Contraintes"):
+                pass
+        return review
+    raise ValueError(f"Étape inconnue : {stage}")
+
+
+def _run_threads(operation: Callable[[int], None], operations: int, concurrency: int) -> tuple:
+    latencies: List[float] = []
+    errors = 0
+
+    def timed(index: int) -> Optional[float]:
+        started_at = time.perf_counter()
+        try:
+            operation(index)
+        except Exception:
+            return None
+        return time.perf_counter() - started_at
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency in executor.map(timed, range(operations)):
+            if latency is None:
+                errors += 1
+            else:
+                latencies.append(latency)
+    return latencies, errors
+
+
+def _run_workflows(
+    env: Environment,
+    operations: int,
+    concurrency: int,
+    offset: int,
+    warm_start_threshold: float,
+    pipelined: bool = False
+) -> tuple:
+    engine = WorkflowEngine(
+        context_manager=env.context_manager,
+        writer=env.writer,
+        evaluator=env.evaluator,
+        optimizer=env.optimizer,
+        max_concurrency=concurrency,
+        similarity_index=env.similarity_index,
+        warm_start_threshold=warm_start_threshold,
+        pipelined=pipelined
+    )
+    latencies: List[float] = []
+    errors = 0
+
+    async def timed(index: int) -> None:
+        nonlocal errors
+        started_at = time.perf_counter()
+        try:
+            await engine.run(_context(offset + index).value, f"bench-{offset + index}")
+        except Exception:
+            errors += 1
+            return
+        latencies.append(time.perf_counter() - started_at)
+
+    async def run_all() -> None:
+        await asyncio.gather(*(timed(index) for index in range(operations)))
+
+    asyncio.run(run_all())
+    return latencies, errors
+
+
+def run_scenario(
+    stage: str,
+    size: str,
+    concurrency: int,
+    operations: int,
+    fake_options: Dict,
+    warm_start_threshold: float = 0.0
+) -> BenchmarkResult:
+    pages = SIZES[size]
+
+    def execute(count: int, offset: int, env: Environment) -> tuple:
+        if stage in ("workflow", "pipelined"):
+            return _run_workflows(env, count, concurrency, offset, warm_start_threshold, stage == "pipelined")
+        operation = build_operation(stage, env, pages)
+        return _run_threads(lambda index: operation(offset + index), count, concurrency)
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = Environment(FakeMessagesAPI(pages=pages, **fake_options), directory)
+        try:
+            started_at = time.perf_counter()
+            latencies, errors = execute(operations, 0, env)
+            elapsed = time.perf_counter() - started_at
+            tokens = sum(route["input_tokens"] + route["output_tokens"] for route in env.router.stats())
+
+            # Passe séparée pour la mémoire : tracemalloc fausserait les latences
+            tracemalloc.start()
+            try:
+                execute(min(operations, max(concurrency, 3)), operations, env)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        finally:
+            env.close()
+
+    return BenchmarkResult(
+        stage=stage,
+        size=size,
+        concurrency=concurrency,
+        operations=operations,
+        errors=errors,
+        throughput=len(latencies) / elapsed if elapsed else 0.0,
+        p50_ms=percentile(latencies, 0.50) * 1000,
+        p95_ms=percentile(latencies, 0.95) * 1000,
+        p99_ms=percentile(latencies, 0.99) * 1000,
+        peak_memory_kb=peak / 1024,
+        tokens_per_op=tokens / operations if operations else 0.0
+    )
+
+
+def print_report(results: List[BenchmarkResult]) -> None:
+    print(
+        f"{'scénario':<30} {'ops':>5} {'err':>4} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'mém Ko':>9} {'tokens/op':>10}"
+    )
+    for result in results:
+        print(
+            f"{result.key:<30} {result.operations:>5} {result.errors:>4} {result.throughput:>9.1f} "
+            f"{result.p50_ms:>9.2f} {result.p95_ms:>9.2f} {result.p99_ms:>9.2f} {result.peak_memory_kb:>9.0f} "
+            f"{result.tokens_per_op:>10.0f}"
+        )
+
+
+def compare(results: List[BenchmarkResult], baseline_path: str, tolerance: float) -> List[str]:
+    """Liste des régressions par rapport à une exécution de référence (--save)."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {f"{item['stage']}/{item['size']}/c{item['concurrency']}": item for item in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        reference = baseline.get(result.key)
+        if reference is None:
+            continue
+        if result.p95_ms > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{result.key} : p95 {reference['p95_ms']:.2f} → {result.p95_ms:.2f} ms")
+        if result.throughput < reference["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{result.key} : débit {reference['throughput']:.1f} → {result.throughput:.1f} ops/s"
+            )
+        if result.peak_memory_kb > reference["peak_memory_kb"] * (1 + tolerance):
+            regressions.append(
+                f"{result.key} : mémoire {reference['peak_memory_kb']:.0f} → {result.peak_memory_kb:.0f} Ko"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne du pipeline de spécifications")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Étapes mesurées")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "large"], help="Tailles de spécification")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8], help="Niveaux de concurrence")
+    parser.add_argument("--operations", type=int, default=20, help="Opérations par scénario")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence simulée du modèle (s)")
+    parser.add_argument(
+        "--token-latency", type=float, default=0.0, help="Temps de génération simulé par token produit (s)"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variation aléatoire de la latence (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Proportion d'erreurs réseau simulées")
+    parser.add_argument("--review-tokens", type=int, default=400, help="Tokens produits par l'analyse en streaming")
+    parser.add_argument("--seed", type=int, default=0, help="Graine du modèle factice")
+    parser.add_argument(
+        "--warm-start-threshold", type=float, default=0.0,
+        help="Seuil de reprise des briefs similaires dans le workflow (0 = désactivée)"
+    )
+    parser.add_argument("--save", help="Fichier JSON où enregistrer les résultats")
+    parser.add_argument("--compare", help="Résultats de référence à comparer (fichier produit par --save)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Dégradation tolérée avant signalement")
+    args = parser.parse_args(argv)
+
+    # Les journaux des agents fausseraient les mesures
+    logging.getLogger("agent_workflow").setLevel(logging.ERROR)
+
+    fake_options = dict(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        review_tokens=args.review_tokens,
+        seed=args.seed
+    )
+    results = []
+    for stage in args.stages:
+        for size in args.sizes:
+            for concurrency in args.concurrency:
+                results.append(run_scenario(
+                    stage, size, concurrency, args.operations, fake_options, args.warm_start_threshold
+                ))
+    print_report(results)
+
+    if args.save:
+        Path(args.save).write_text(
+            json.dumps({"options": vars(args), "results": [asdict(result) for result in results]}, indent=2),
+            encoding="utf-8"
+        )
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"Régression : {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Rejeu hors ligne des exécutions enregistrées dans une cassette.
+
+Les exécutions de l'interface notées pendant l'enregistrement
+(LLM_CASSETTE_MODE=record) sont rejouées par les mêmes points d'entrée
+(`process_specification`, `process_with_agents`), les réponses du modèle
+étant servies par la cassette. Comme à l'enregistrement, le cache de
+réponses et la reprise d'un brief similaire sont désactivés ; stockage et
+index de similarité sont isolés dans un dossier temporaire. À pleine vitesse
+(`--delay-factor 0`), seul le temps passé hors du modèle est mesuré ;
+`--profile` en détaille les fonctions les plus coûteuses.
+
+Usage :
+    python -m benchmarks.bench_replay cassettes/session.jsonl.gz
+    python -m benchmarks.bench_replay cassettes/session.jsonl.gz --profile 25
+    python -m benchmarks.bench_replay cassettes/session.jsonl.gz --delay-factor 1
+"""
+import argparse
+import asyncio
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from agents.evaluator import Evaluator
+from agents.optimizer import Optimizer
+from agents.specification_writer import SpecificationWriter
+from agents.workflow import WorkflowEngine
+from utils.anthropic_client import AnthropicClient
+from utils.cassette import REPLAY, Cassette
+from utils.context_manager import ContextManager
+from utils.model_router import ModelRouter
+from utils.response_cache import ResponseCache
+from utils.similarity_index import SimilarityIndex
+from utils.version_store import VersionStore
+
+# Début des messages d'erreur produits par les points d'entrée de l'interface
+_ERROR_HEADER = "### Erreur"
+
+
+class ReplayEnvironment:
+    """Points d'entrée de l'interface branchés sur la cassette et un stockage isolé."""
+
+    def __init__(self, cassette: Cassette, directory: str):
+        import main
+        self.client = AnthropicClient(cassette=cassette)
+        self.context_manager = ContextManager(store=VersionStore(f"{directory}/context.sqlite3"))
+        # Comme à l'enregistrement : ni cache de réponses ni reprise d'un brief similaire
+        self.response_cache = ResponseCache(f"{directory}/responses.sqlite3", enabled=False)
+        self.router = ModelRouter()
+        self.similarity_index = SimilarityIndex(f"{directory}/similarity.sqlite3")
+        options = dict(
+            context_manager=self.context_manager,
+            response_cache=self.response_cache,
+            client=self.client,
+            model_router=self.router
+        )
+        self.engine = WorkflowEngine(
+            context_manager=self.context_manager,
+            writer=SpecificationWriter(**options),
+            evaluator=Evaluator(**options),
+            optimizer=Optimizer(**options),
+            similarity_index=self.similarity_index,
+            warm_start_threshold=0
+        )
+        main.get_client = lambda: self.client
+        main.get_response_cache = lambda: self.response_cache
+        main.get_model_router = lambda: self.router
+        main._workflow_engine = self.engine
+
+    def run(self, run: Dict[str, Any]) -> Optional[str]:
+        """Rejoue une exécution et retourne le dernier affichage produit."""
+        import main
+        output = None
+        if run["entry"] == "review":
+            for output in main.process_specification(*run["inputs"]):
+                pass
+            return output
+
+        async def consume() -> Optional[str]:
+            last = None
+            async for last in main.process_with_agents(*run["inputs"]):
+                pass
+            return last
+        return asyncio.run(consume())
+
+    def close(self) -> None:
+        self.response_cache.close()
+        self.similarity_index.close()
+
+
+def replay(cassette: Cassette, profiler: Optional[cProfile.Profile] = None) -> List[Dict[str, Any]]:
+    """Rejoue toutes les exécutions de la cassette, dans leur ordre d'enregistrement."""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        env = ReplayEnvironment(cassette, directory)
+        try:
+            for run in cassette.runs:
+                served, missed, latency = cassette.served, cassette.missed, cassette.served_latency
+                if profiler is not None:
+                    profiler.enable()
+                started_at = time.perf_counter()
+                output = env.run(run)
+                elapsed = time.perf_counter() - started_at
+                if profiler is not None:
+                    profiler.disable()
+                results.append({
+                    "entry": run["entry"],
+                    "title": run["inputs"][0],
+                    "seconds": elapsed,
+                    "calls": cassette.served - served,
+                    "missed": cassette.missed - missed,
+                    "recorded_model_seconds": cassette.served_latency - latency,
+                    "failed": output is None or _ERROR_HEADER in output
+                })
+        finally:
+            env.close()
+    return results
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    print(f"{'exécution':<12}{'titre':<30}{'durée (s)':>11}{'appels':>8}{'absents':>9}{'modèle enreg. (s)':>19}  état")
+    for row in results:
+        print(
+            f"{row['entry']:<12}{str(row['title'])[:28]:<30}{row['seconds']:>11.3f}{row['calls']:>8}"
+            f"{row['missed']:>9}{row['recorded_model_seconds']:>19.2f}  {'échec' if row['failed'] else 'ok'}"
+        )
+    replayed = sum(row["seconds"] for row in results)
+    recorded = sum(row["recorded_model_seconds"] for row in results)
+    print(f"Rejeu : {replayed:.3f} s, dont modèle enregistré : {recorded:.2f} s d'origine")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rejeu hors ligne des exécutions d'une cassette")
+    parser.add_argument("cassette", help="Cassette enregistrée (.jsonl.gz)")
+    parser.add_argument(
+        "--delay-factor", type=float, default=0.0,
+        help="Fraction des latences enregistrées reproduite (0 = pleine vitesse, 1 = temps réel)"
+    )
+    parser.add_argument("--profile", type=int, default=0, help="Fonctions les plus coûteuses affichées (0 = pas de profilage)")
+    args = parser.parse_args(argv)
+
+    # Rejeu dans le processus courant, sans les journaux détaillés des agents
+    os.environ["APP_WORKERS"] = "0"
+    logging.getLogger("agent_workflow").setLevel(logging.ERROR)
+
+    try:
+        cassette = Cassette(args.cassette, REPLAY, delay_factor=args.delay_factor)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if not cassette.runs:
+        print("Aucune exécution enregistrée dans la cassette.", file=sys.stderr)
+        return 1
+    profiler = cProfile.Profile() if args.profile else None
+    results = replay(cassette, profiler)
+    print_report(results)
+    if profiler is not None:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.profile)
+    return 1 if any(row["failed"] or row["missed"] for row in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
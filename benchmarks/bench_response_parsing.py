@@ -0,0 +1,104 @@
+"""Micro-benchmark du décodage des réponses des agents.
+
+Compare l'ancien chemin (json.loads, conversions manuelles, `.dict()` puis
+reconstruction de la spécification versionnée) à la validation en une seule
+passe (`parse_response` + `VersionedWebSpecification.from_specification`).
+
+Usage : python -m benchmarks.bench_response_parsing [--pages 200] [--repeat 50]
+"""
+import argparse
+import json
+import timeit
+import tracemalloc
+import warnings
+
+from models.specifications import (
+    PageSection,
+    TechStackCategory,
+    VersionedWebSpecification,
+    VersionMetadata,
+    WebSpecification
+)
+from utils.response_parsing import parse_response
+
+
+def build_response(pages: int) -> str:
+    """Réponse de modèle simulée : une spécification de `pages` pages dans un bloc de code."""
+    spec = {
+        "project_name": "Benchmark",
+        "description": "Spécification volumineuse générée pour le benchmark. " * 20,
+        "target_audience": "Utilisateurs professionnels",
+        "pages": {
+            f"page_{index}": {
+                "name": f"Page {index}",
+                "description": f"Description détaillée de la page {index}. " * 5,
+                "components": [f"composant_{index}_{item}" for item in range(10)],
+                "dynamic_elements": [f"element_{index}_{item}" for item in range(5)],
+                "interactions": [f"interaction_{index}_{item}" for item in range(5)]
+            }
+            for index in range(pages)
+        },
+        "features": [f"Fonctionnalité {index}" for index in range(pages)],
+        "tech_stack": {category.value: ["outil_a", "outil_b"] for category in TechStackCategory},
+        "security_requirements": ["HTTPS", "CSP"],
+        "seo_requirements": ["Sitemap"]
+    }
+    return "Voici la spécification :\n```json\n" + json.dumps(spec, ensure_ascii=False) + "\n```"
+
+
+def legacy_path(response: str, metadata: VersionMetadata) -> VersionedWebSpecification:
+    """Reproduction du décodage historique des agents."""
+    text = response[response.index("{"):response.rindex("}") + 1]
+    spec_dict = json.loads(text)
+    spec_dict["pages"] = {
+        name: PageSection(**page) for name, page in spec_dict["pages"].items()
+    }
+    spec_dict["tech_stack"] = {
+        TechStackCategory(key): value for key, value in spec_dict["tech_stack"].items()
+    }
+    base_spec = WebSpecification(**spec_dict)
+    stored = base_spec.dict()
+    return VersionedWebSpecification(**stored, metadata=metadata)
+
+
+def fast_path(response: str, metadata: VersionMetadata) -> VersionedWebSpecification:
+    """Validation en une seule passe depuis le texte brut."""
+    return VersionedWebSpecification.from_specification(
+        parse_response(response, WebSpecification), metadata
+    )
+
+
+def peak_memory(func, *args) -> int:
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark du décodage des réponses des agents")
+    parser.add_argument("--pages", type=int, default=200, help="Nombre de pages de la spécification")
+    parser.add_argument("--repeat", type=int, default=50, help="Nombre d'exécutions mesurées")
+    args = parser.parse_args(argv)
+    # Le chemin historique repose sur `.dict()`, déprécié par pydantic 2
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    response = build_response(args.pages)
+    metadata = VersionMetadata(version_id="bench", agent_name="Benchmark", modification_type="creation")
+    assert legacy_path(response, metadata) == fast_path(response, metadata)
+
+    print(f"Réponse de {len(response) / 1024:.0f} Ko ({args.pages} pages), {args.repeat} exécutions")
+    results = {}
+    for name, func in (("historique", legacy_path), ("une passe", fast_path)):
+        seconds = min(timeit.repeat(lambda: func(response, metadata), number=args.repeat, repeat=3))
+        results[name] = (seconds / args.repeat * 1000, peak_memory(func, response, metadata) / 1024)
+        print(f"{name:>10} : {results[name][0]:8.2f} ms/réponse, pic mémoire {results[name][1]:8.0f} Ko")
+
+    (legacy_ms, legacy_kb), (fast_ms, fast_kb) = results.values()
+    print(f"Gain : x{legacy_ms / fast_ms:.1f} en temps, {100 * (1 - fast_kb / legacy_kb):.0f} % de mémoire en moins")
+
+
+if __name__ == "__main__":
+    main()
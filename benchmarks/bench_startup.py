@@ -0,0 +1,104 @@
+"""Profil du démarrage à froid : temps d'import, modules les plus coûteux et préchauffage.
+
+Chaque mesure est faite dans un nouvel interpréteur (`python -X importtime`)
+pour reproduire le démarrage d'un worker : rien n'est déjà en cache dans
+`sys.modules`.
+
+Usage :
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --module agents.workflow --runs 5 --top 25
+    python -m benchmarks.bench_startup --warm-up
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Dépendances lourdes dont l'import devrait être différé
+HEAVY_MODULES = ("gradio", "pydantic_ai", "anthropic", "httpx")
+
+_PROBE = """
+import json, sys, time
+started_at = time.perf_counter()
+import {module}
+imported_at = time.perf_counter()
+if {warm_up}:
+    {module}.warm_up()
+print(json.dumps({{
+    "import_seconds": imported_at - started_at,
+    "warm_up_seconds": time.perf_counter() - imported_at,
+    "loaded": [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, temps propre, temps cumulé) en microsecondes, d'après `-X importtime`."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def profile(module: str, warm_up: bool, directory: str) -> Dict:
+    probe = _PROBE.format(module=module, warm_up=warm_up, heavy=HEAVY_MODULES)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True,
+        text=True,
+        # Dossier de travail vierge : logs, cache et base éventuellement créés y restent
+        cwd=directory,
+        env={
+            **os.environ,
+            "PYTHONPATH": str(Path(__file__).resolve().parent.parent),
+            "LOG_CONSOLE_LEVEL": "ERROR"
+        }
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(completed.stderr)
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Profil du temps de démarrage à froid")
+    parser.add_argument("--module", default="main", help="Module importé au démarrage")
+    parser.add_argument("--runs", type=int, default=3, help="Nombre d'interpréteurs lancés")
+    parser.add_argument("--top", type=int, default=15, help="Modules les plus coûteux affichés")
+    parser.add_argument("--warm-up", action="store_true", help="Mesure aussi `<module>.warm_up()`")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        runs = [profile(args.module, args.warm_up, directory) for _ in range(args.runs)]
+
+    imports = [run["import_seconds"] for run in runs]
+    print(f"Import de {args.module} : médiane {statistics.median(imports) * 1000:.0f} ms "
+          f"(min {min(imports) * 1000:.0f} ms, {args.runs} exécutions)")
+    if args.warm_up:
+        warm_ups = [run["warm_up_seconds"] for run in runs]
+        print(f"Préchauffage : médiane {statistics.median(warm_ups) * 1000:.0f} ms")
+    loaded = runs[-1]["loaded"]
+    print(f"Dépendances lourdes chargées : {', '.join(loaded) if loaded else 'aucune'}")
+
+    # Temps d'import propre cumulé par paquet, d'après la dernière exécution
+    packages: Dict[str, int] = {}
+    for name, self_us, _ in runs[-1]["imports"]:
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    print(f"\n{'paquet':<30} {'ms':>8}")
+    for name, total_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<30} {total_us / 1000:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Modèle factice déterministe pour mesurer le pipeline sans accès réseau.
+
+`FakeAnthropicClient` remplace uniquement l'API Messages du SDK : le
+limiteur de débit, les nouvelles tentatives, le comptage des tokens et les
+métriques de `AnthropicClient` restent ceux de production.
+"""
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+import anthropic
+import httpx
+
+from models.specifications import TechStackCategory
+from utils.anthropic_client import AnthropicClient
+from utils.prompt_builder import estimate_tokens
+
+OPTIMIZED_MARKER = "(optimisé)"
+_OPTIMIZED_RUN = re.compile(r"(?: \(optimisé\))+")
+
+
+def fake_specification(pages: int, optimizations: int = 0) -> Dict:
+    """Spécification de `pages` pages, identique pour des paramètres identiques."""
+    suffix = "".join(f" {OPTIMIZED_MARKER}" for _ in range(optimizations))
+    return {
+        "project_name": "Projet de référence",
+        "description": f"Application web de gestion de projets collaboratifs.{suffix}",
+        "target_audience": "Équipes projet de PME",
+        "pages": {
+            f"page_{index}": {
+                "name": f"Page {index}",
+                "description": f"Page {index} présentant les informations du module {index}.{suffix}",
+                "components": [f"composant_{index}_{item}" for item in range(6)],
+                "dynamic_elements": [f"liste_{index}", f"filtre_{index}"],
+                "interactions": [f"clic_{index}", f"recherche_{index}"]
+            }
+            for index in range(pages)
+        },
+        "features": [f"Fonctionnalité {index}" for index in range(max(pages, 3))],
+        "tech_stack": {category.value: ["outil_a", "outil_b"] for category in TechStackCategory},
+        "security_requirements": ["HTTPS", "Authentification forte"],
+        "seo_requirements": ["Sitemap"],
+        "accessibility_requirements": ["RGAA AA"]
+    }
+
+
+class FakeMessagesAPI:
+    """Imitation de `anthropic.Anthropic().messages` produisant des réponses valides pour chaque agent.
+
+    Le type de réponse est déduit du format de sortie demandé dans le prompt.
+    Le score d'évaluation augmente de `score_step` à chaque optimisation déjà
+    appliquée à la spécification, ce qui fait converger la boucle.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        token_latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        pages: int = 5,
+        review_tokens: int = 400,
+        base_score: float = 0.7,
+        score_step: float = 0.08,
+        seed: int = 0
+    ):
+        self.latency = latency
+        # Temps de génération par token produit, comme pour un modèle réel
+        self.token_latency = token_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.pages = pages
+        self.review_tokens = review_tokens
+        self._review_text: Optional[str] = None
+        self.base_score = base_score
+        self.score_step = score_step
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def _draw(self) -> tuple:
+        """Tirage (échec, délai) reproductible pour une graine donnée."""
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.failure_rate
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            if failed:
+                self.failures += 1
+            return failed, delay
+
+    @staticmethod
+    def _optimizations(prompt: str) -> int:
+        """Nombre d'optimisations déjà appliquées (plus longue suite de marqueurs dans un texte)."""
+        return max((run.count(OPTIMIZED_MARKER) for run in _OPTIMIZED_RUN.findall(prompt)), default=0)
+
+    def _respond(self, prompt: str) -> str:
+        optimizations = self._optimizations(prompt)
+        score = min(0.99, self.base_score + self.score_step * optimizations)
+        if '"improved_specification"' in prompt:
+            return json.dumps({
+                "improved_specification": fake_specification(self.pages, optimizations + 1),
+                "changes": [self._change("description")],
+                "optimization_score": round(min(0.99, score + self.score_step), 2)
+            }, ensure_ascii=False)
+        if '"optimization_score"' in prompt or ('"pages"' in prompt and '"project_name"' not in prompt):
+            pages = fake_specification(self.pages, optimizations + 1)["pages"]
+            names = re.findall(r'"(page_\d+)":\{', prompt) or list(pages)
+            return json.dumps({
+                "pages": {name: pages[name] for name in names if name in pages},
+                "changes": [self._change(f"pages.{name}.description") for name in names[:1]],
+                "optimization_score": round(min(0.99, score + self.score_step), 2)
+            }, ensure_ascii=False)
+        if re.search(r'"score"\s*:', prompt):
+            return json.dumps({
+                "score": round(score * 100, 1),
+                "strengths": ["Structure claire"],
+                "weaknesses": ["Exigences de performance absentes"],
+                "technical": [],
+                "functional": [],
+                "improvement_suggestions": ["Préciser les exigences de performance"]
+            }, ensure_ascii=False)
+        if '"criteria"' in prompt:
+            criterion = round(score * 100, 1)
+            return json.dumps({
+                "criteria": {
+                    name: criterion
+                    for name in ("completeness", "coherence", "clarity", "feasibility", "quality")
+                },
+                "total_score": round(score, 4),
+                "feedback": {
+                    "strengths": ["Structure claire"],
+                    "weaknesses": ["Exigences de performance absentes"],
+                    "technical": ["Stack cohérente"],
+                    "functional": ["Parcours utilisateur complet"]
+                },
+                "improvement_suggestions": ["Préciser les exigences de performance"]
+            }, ensure_ascii=False)
+        if '"project_name"' in prompt:
+            return "Voici le cahier des charges :\n```json\n" + json.dumps(
+                fake_specification(self.pages), ensure_ascii=False
+            ) + "\n```"
+        return self._review()
+
+    @staticmethod
+    def _change(field_path: str) -> Dict:
+        return {
+            "field_path": field_path,
+            "previous_value": "version précédente",
+            "new_value": "version optimisée",
+            "reason": "Prise en compte de l'évaluation"
+        }
+
+    def _review(self) -> str:
+        """Analyse Markdown d'environ `review_tokens` tokens (réponse de process_specification)."""
+        if self._review_text is None:
+            text = "### Évaluation\n\nNote : 7/10\n\n"
+            index = 0
+            while estimate_tokens(text) < self.review_tokens:
+                text += f"Point d'analyse numéro {index} sur la spécification. "
+                index += 1
+            self._review_text = text
+        return self._review_text
+
+    def _message(self, system: str, messages: List[Dict]) -> tuple:
+        failed, delay = self._draw()
+        prompt = messages[0]["content"]
+        if failed:
+            time.sleep(delay / 2)
+            raise anthropic.APIConnectionError(request=httpx.Request("POST", "http://fake-model/v1/messages"))
+        text = self._respond(prompt)
+        usage = SimpleNamespace(
+            input_tokens=estimate_tokens(system) + estimate_tokens(prompt),
+            output_tokens=estimate_tokens(text)
+        )
+        return text, usage, delay + self.token_latency * usage.output_tokens
+
+    def create(self, model: str, max_tokens: int, system: str, messages: List[Dict]):
+        text, usage, delay = self._message(system, messages)
+        time.sleep(delay)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=text)],
+            usage=usage,
+            model=model
+        )
+
+    @contextmanager
+    def stream(self, model: str, max_tokens: int, system: str, messages: List[Dict]):
+        text, usage, delay = self._message(system, messages)
+        chunks = [text[index:index + 40] for index in range(0, len(text), 40)] or [""]
+
+        def text_stream() -> Iterator[str]:
+            for chunk in chunks:
+                time.sleep(delay / len(chunks))
+                yield chunk
+
+        yield SimpleNamespace(
+            text_stream=text_stream(),
+            get_final_message=lambda: SimpleNamespace(usage=usage)
+        )
+
+
+class FakeAnthropicClient(AnthropicClient):
+    """Client Anthropic dont seule l'API Messages est simulée."""
+
+    def __init__(self, fake: Optional[FakeMessagesAPI] = None, **kwargs):
+        kwargs.setdefault("backoff_base", 0.001)
+        kwargs.setdefault("backoff_max", 0.01)
+        super().__init__(api_key="fake", **kwargs)
+        self.fake = fake or FakeMessagesAPI()
+        self.client = SimpleNamespace(messages=self.fake)
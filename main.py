@@ -1,16 +1,133 @@
-import gradio as gr
-from utils.anthropic_client import AnthropicClient
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator, List, Optional, Tuple
+from utils.anthropic_client import UsageMeter, get_client
+from utils.job_queue import DONE, FAILED, get_job_queue
+from utils.logging_config import get_logger
+from utils.metrics import start_metrics_server
+from utils.model_router import REVIEW, get_model_router
+from utils.prompt_builder import estimate_tokens
+from utils.response_cache import get_response_cache
+from utils.similarity_index import get_similarity_index
+from utils.worker_pool import get_worker_pool
 
-# Initialisation du client Anthropic
-client = AnthropicClient()
+if TYPE_CHECKING:
+    import gradio as gr
+    from agents.job_runner import JobRunner
+    from agents.workflow import WorkflowEngine, WorkflowResult
+
+# Gradio, pydantic_ai et le SDK Anthropic ne sont importés qu'au premier usage
+# (construction de l'interface, premier workflow, première requête) ; le
+# client Anthropic, le cache de réponses et le routeur de modèles partagés
+# sont obtenus via get_client(), get_response_cache() et get_model_router().
+
+SYSTEM_PROMPT = "Vous êtes un expert en spécifications techniques. Fournissez des réponses structurées en Markdown."
+
+logger = get_logger("App")
+
+# Moteur du workflow Evaluator-Optimizer, créé au premier usage
+_workflow_engine: Optional["WorkflowEngine"] = None
+_workflow_engine_lock = threading.Lock()
+
+def get_workflow_engine() -> "WorkflowEngine":
+    """Retourne le moteur de workflow partagé entre les requêtes."""
+    global _workflow_engine
+    with _workflow_engine_lock:
+        if _workflow_engine is None:
+            from agents.workflow import WorkflowEngine
+            _workflow_engine = WorkflowEngine()
+        return _workflow_engine
+
+# Workers des traitements en arrière-plan, créés au premier usage
+_job_runner: Optional["JobRunner"] = None
+_job_runner_lock = threading.Lock()
+
+def get_job_runner() -> "JobRunner":
+    """Retourne le gestionnaire des traitements en arrière-plan (agents du moteur de workflow)."""
+    global _job_runner
+    with _job_runner_lock:
+        if _job_runner is None:
+            from agents.job_runner import JobRunner
+            _job_runner = JobRunner(engine=get_workflow_engine())
+        return _job_runner
+
+def warm_up() -> None:
+    """Prépare les dépendances coûteuses avant la première requête.
+
+    Importe le SDK Anthropic et pydantic_ai, ouvre le cache de réponses et
+    l'index de similarité, et crée le moteur de workflow avec ses agents.
+    """
+    started_at = time.perf_counter()
+    get_client().client
+    get_response_cache()
+    get_model_router()
+    get_similarity_index()
+    get_workflow_engine().warm_up()
+    logger.info("Préchauffage terminé en %.2fs", time.perf_counter() - started_at)
+
+def start_warm_up(mode: Optional[str] = None) -> Optional[threading.Thread]:
+    """Lance le préchauffage selon WARM_UP : background (par défaut), blocking ou off."""
+    mode = (mode or os.getenv("WARM_UP") or "background").lower()
+    if mode == "off":
+        return None
+    if mode == "blocking":
+        warm_up()
+        return None
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def build_user_context(title: str, description: str, requirements: str, constraints: str) -> str:
+    """Assemble les champs du formulaire en contexte initial pour les agents."""
+    return f"""
+Titre : {title}
+Description : {description}
+Exigences : {requirements}
+Contraintes : {constraints}
+"""
+
+def stream_review(prompt: str, model: str) -> Iterator[str]:
+    """Appel en streaming au modèle, avec enregistrement de la latence et du coût de la route."""
+    meter = UsageMeter()
+    started_at = time.monotonic()
+    yield from get_client().stream(prompt=prompt, system_prompt=SYSTEM_PROMPT, model=model, meter=meter)
+    get_model_router().record(REVIEW, model, time.monotonic() - started_at, meter.input_tokens, meter.output_tokens)
+
+def _record_run(entry: str, *inputs: Any) -> None:
+    """Note l'exécution dans la cassette en cours d'enregistrement (LLM_CASSETTE_MODE=record)."""
+    cassette = get_client().cassette
+    if cassette is not None:
+        cassette.record_run(entry, inputs)
 
 def process_specification(
     title: str,
     description: str,
     requirements: str,
-    constraints: str
-) -> str:
-    """Traite une spécification avec Claude."""
+    constraints: str,
+    session_id: Optional[str] = None
+) -> Iterator[str]:
+    """Traite une spécification avec Claude, en produisant le résultat au fil de la génération.
+
+    Avec APP_WORKERS, le traitement est confié à un processus worker. Le
+    résultat est ajouté à l'historique de la session.
+    """
+    pool = get_worker_pool()
+    if pool is not None:
+        yield from pool.stream(_process_specification, title, description, requirements, constraints, session_id)
+    else:
+        yield from _process_specification(title, description, requirements, constraints, session_id)
+
+def _process_specification(
+    title: str,
+    description: str,
+    requirements: str,
+    constraints: str,
+    session_id: Optional[str] = None
+) -> Iterator[str]:
     try:
         # Création du prompt
         prompt = f"""
@@ -28,21 +145,25 @@ Contraintes : {constraints}
 4. Proposez une version améliorée
 """
 
-        # Appel à l'API Anthropic
-        response = client.generate(
-            prompt=prompt,
-            system_prompt="Vous êtes un expert en spécifications techniques. Fournissez des réponses structurées en Markdown.",
-            model="claude-3-5-sonnet-20241022"
-        )
-
-        # Formatage des résultats
-        evaluation_text = f"""
+        header = """
 ### Résultat de l'évaluation
 
-{response}
 """
-        
-        return evaluation_text
+        yield header + "_Analyse en cours..._"
+        _record_run("review", title, description, requirements, constraints)
+
+        # Appel en streaming à l'API Anthropic (ou réponse en cache pour une soumission identique)
+        model = get_model_router().select(REVIEW, estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt))
+        response = ""
+        for chunk in get_response_cache().stream_or_compute(
+            model,
+            SYSTEM_PROMPT,
+            prompt,
+            lambda: stream_review(prompt, model)
+        ):
+            response += chunk
+            yield header + response
+        _record_review(session_id, title, build_user_context(title, description, requirements, constraints), response)
         
     except Exception as e:
         error_text = f"""
@@ -53,60 +174,586 @@ Une erreur s'est produite lors de l'analyse de votre spécification :
 
 Veuillez vérifier vos entrées et réessayer.
 """
-        return error_text
+        yield error_text
 
-# Création de l'interface Gradio
-with gr.Blocks(title="Évaluateur de Spécifications", theme=gr.themes.Soft()) as demo:
-    gr.Markdown("""
-    # Évaluateur de Spécifications
+def format_workflow_result(result: "WorkflowResult") -> str:
+    """Met en forme le résultat du workflow en Markdown."""
+    from agents.workflow import UNCHANGED
+    lines = [
+        "### Résultat du workflow Evaluator-Optimizer",
+        "",
+        f"- Itérations d'optimisation : {result.iterations}",
+        f"- Score final : {result.final_score}",
+        f"- Objectif atteint : {'oui' if result.target_reached else 'non'}",
+        f"- Raison de l'arrêt : {result.stop_reason}",
+        f"- Tokens consommés : {result.tokens_used}",
+        f"- Version finale : {result.specification.metadata.version_id}",
+    ]
+    if result.stop_reason == UNCHANGED:
+        lines.append("- Contexte identique à la soumission précédente : résultat réutilisé")
+    if result.warm_start_version:
+        lines.append(
+            f"- Point de départ : version {result.warm_start_version} d'un brief similaire "
+            f"(similarité {result.warm_start_similarity:.2f})"
+        )
+    lines += [
+        "",
+        "#### Historique des scores",
+    ]
+    for index, evaluation in enumerate(result.evaluations):
+        lines.append(f"{index + 1}. {evaluation.total_score:.2f} (version {evaluation.specification_version})")
+    if result.final_evaluation:
+        feedback = result.final_evaluation.feedback
+        lines += ["", "#### Points à améliorer"]
+        lines += [f"- {item}" for item in feedback.get("weaknesses", [])]
+    lines += [
+        "",
+        "#### Spécification finale",
+        "```json",
+        result.specification.model_dump_json(indent=2),
+        "```",
+    ]
+    return "\n".join(lines)
+
+async def process_with_agents(
+    title: str,
+    description: str,
+    requirements: str,
+    constraints: str,
+    session_id: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Génère, évalue et optimise une spécification avec le workflow d'agents.
+
+    La progression de chaque étape est affichée au fur et à mesure. Avec
+    APP_WORKERS, le workflow s'exécute dans un processus worker.
+    """
+    pool = get_worker_pool()
+    if pool is not None:
+        outputs = pool.stream_async(_process_with_agents, title, description, requirements, constraints, session_id)
+    else:
+        outputs = _process_with_agents(title, description, requirements, constraints, session_id)
+    async for output in outputs:
+        yield output
+
+async def _process_with_agents(
+    title: str,
+    description: str,
+    requirements: str,
+    constraints: str,
+    session_id: Optional[str] = None
+) -> AsyncIterator[str]:
+    progress = ["### Progression du workflow", ""]
+    project_id = _session_project(session_id, title)
+    _link_session(session_id, project_id, "workflow", title)
+    try:
+        _record_run("workflow", title, description, requirements, constraints)
+        # Nouvelle soumission d'un projet de la session : seules les pages modifiées sont retraitées
+        async for event in get_workflow_engine().run_incremental_stream(
+            build_user_context(title, description, requirements, constraints), project_id
+        ):
+            if event.result is not None:
+                yield format_workflow_result(event.result)
+                return
+            line = f"- {event.message}"
+            if event.score is not None:
+                line += f" (score actuel : {event.score:.2f})"
+            progress.append(line)
+            yield "\n".join(progress)
+    except Exception as e:
+        yield f"""
+### Erreur lors du traitement
+
+Une erreur s'est produite pendant le workflow des agents :
+- {str(e)}
+
+Veuillez vérifier vos entrées et réessayer.
+"""
+
+def submit_background_job(
+    title: str,
+    description: str,
+    requirements: str,
+    constraints: str,
+    session_id: Optional[str] = None
+) -> str:
+    """Met en file le workflow d'agents et retourne immédiatement le numéro du traitement."""
+    project_id = _session_project(session_id, title)
+    try:
+        _record_run("workflow", title, description, requirements, constraints)
+        job_id = get_job_runner().submit(
+            build_user_context(title, description, requirements, constraints), project_id
+        )
+        _link_session(session_id, project_id, "background", title)
+    except Exception as e:
+        return f"""
+### Erreur lors de la mise en file
+
+- {str(e)}
+"""
+    return f"""
+### Traitement en arrière-plan
+
+Le traitement n° **{job_id}** a été mis en file. Suivez son avancement
+avec ce numéro dans « Suivi d'un traitement ».
+"""
+
+def format_job_status(job_id: Optional[float]) -> str:
+    """Met en forme l'état d'un traitement en arrière-plan et de ses travaux en Markdown."""
+    if not job_id:
+        return "Indiquez le numéro du traitement."
+    queue = get_job_queue()
+    job = queue.get_job(int(job_id))
+    if job is None:
+        return f"Aucun traitement n° {int(job_id)}."
+    jobs = queue.list_jobs(job.root_id)
+    if any(item.status not in (DONE, FAILED) for item in jobs):
+        status = "en cours"
+    else:
+        status = "en échec" if jobs[-1].status == FAILED else "terminé"
+    lines = [
+        f"### Traitement n° {job.root_id} : {status}",
+        "",
+        "| Travail | Agent | Demande | État | Tentatives | Résultat |",
+        "|---|---|---|---|---|---|",
+    ]
+    for item in jobs:
+        outcome = item.error or ""
+        if item.result:
+            outcome = ", ".join(f"{key} : {value}" for key, value in item.result.items())
+        lines.append(
+            f"| {item.job_id} | {item.target_agent} | {item.context_type} | {item.status} | {item.attempts} | {outcome} |"
+        )
+    latest = next((item.result for item in reversed(jobs) if item.result and "specification_id" in item.result), None)
+    if latest:
+        lines += ["", f"Dernière version : {latest['specification_id']}"]
+    final = next((item.result for item in jobs if item.result and item.result.get("finished")), None)
+    if final and final.get("final_specification_id"):
+        lines.append(f"Version retenue : {final['final_specification_id']} ({final['stop_reason']})")
+    return "\n".join(lines)
+
+# Historique de session : entrées par page et libellés des types d'entrée
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+_HISTORY_KINDS = {"review": "Évaluation", "workflow": "Workflow", "background": "Arrière-plan"}
+
+def new_session_id(session_id: Optional[str]) -> str:
+    """Identifiant de session de l'interface, conservé par le navigateur entre deux rechargements."""
+    return session_id or uuid.uuid4().hex
+
+def _session_project(session_id: Optional[str], title: Optional[str]) -> str:
+    """Projet à mettre à jour : celui déjà soumis sous ce titre dans la session, sinon un nouveau projet."""
+    if session_id:
+        from utils.context_manager import get_context_manager
+        try:
+            project_id = get_context_manager().find_session_project(
+                session_id, (title or "").strip() or None, ["workflow", "background"]
+            )
+            if project_id:
+                return project_id
+        except Exception as e:
+            logger.warning(f"Historique de session non consulté : {e}")
+    return uuid.uuid4().hex
+
+def _link_session(session_id: Optional[str], project_id: str, kind: str, title: Optional[str]) -> None:
+    if not session_id:
+        return
+    from utils.context_manager import get_context_manager
+    try:
+        get_context_manager().link_session(session_id, project_id, kind, (title or "").strip() or None)
+    except Exception as e:
+        logger.warning(f"Historique de session non mis à jour : {e}")
+
+def _record_review(session_id: Optional[str], title: str, user_input: str, review: str) -> None:
+    if not session_id:
+        return
+    from utils.context_manager import get_context_manager
+    project_id = uuid.uuid4().hex
+    try:
+        get_context_manager().record_review(user_input, review, project_id)
+    except Exception as e:
+        logger.warning(f"Évaluation non enregistrée dans l'historique : {e}")
+        return
+    _link_session(session_id, project_id, "review", title)
+
+def _cell(value: Any, limit: int = 200) -> str:
+    """Valeur affichable dans une cellule de tableau Markdown."""
+    if value is None:
+        return "—"
+    if isinstance(value, (list, tuple)):
+        text = ", ".join(str(item) for item in value)
+    elif isinstance(value, dict):
+        text = json.dumps(value, ensure_ascii=False)
+    else:
+        text = str(value)
+    text = " ".join(text.split()).replace("|", "\\|")
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def _format_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+def list_session_history(session_id: Optional[str], page: int = 0) -> Tuple[str, List[Tuple[str, str]], int]:
+    """Page de l'historique d'une session : tableau Markdown, entrées sélectionnables et page retenue.
+
+    Seules les métadonnées des entrées de la page sont lues ; aucun résultat
+    n'est reconstitué avant d'être sélectionné.
+    """
+    from utils.context_manager import get_context_manager
+
+    empty = ("Aucun résultat dans l'historique de cette session.", [], 0)
+    if not session_id:
+        return empty
+    context_manager = get_context_manager()
+    total = context_manager.count_session_history(session_id)
+    if not total:
+        return empty
+    pages = (total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+    page = min(max(int(page or 0), 0), pages - 1)
+    lines = [
+        f"### Historique de la session : {total} résultat(s), page {page + 1}/{pages}",
+        "",
+        "| Date | Type | Titre | Versions | Score |",
+        "|---|---|---|---|---|",
+    ]
+    choices = []
+    for entry in context_manager.list_session_history(session_id, HISTORY_PAGE_SIZE, page * HISTORY_PAGE_SIZE):
+        date = _format_timestamp(entry["created_at"])
+        kind = _HISTORY_KINDS.get(entry["kind"], entry["kind"])
+        title = entry["title"] or "Sans titre"
+        score = f"{entry['score']:.2f}" if entry["score"] is not None else None
+        lines.append(f"| {date} | {kind} | {_cell(title)} | {entry['versions'] or '—'} | {_cell(score)} |")
+        choices.append((f"{date} · {kind} · {title}", entry["project_id"]))
+    return "\n".join(lines), choices, page
+
+def load_history_entry(session_id: Optional[str], project_id: Optional[str]) -> Tuple[str, List[Tuple[str, str]]]:
+    """Réaffiche un résultat de l'historique depuis le stockage, sans appel au modèle.
+
+    Retourne le résultat en Markdown et les versions de spécification du
+    projet (de la plus ancienne à la plus récente) pour la comparaison.
+    """
+    from utils.context_manager import get_context_manager
+    from utils.spec_export import SPECIFICATION_ACTIONS
+
+    if not session_id or not project_id:
+        return "Sélectionnez un résultat de l'historique.", []
+    context_manager = get_context_manager()
+    entry = context_manager.get_session_entry(session_id, project_id)
+    if entry is None:
+        return "Ce résultat n'appartient pas à l'historique de la session.", []
+    title = entry["title"] or "Sans titre"
+
+    if entry["kind"] == "review":
+        review = context_manager.get_latest_version(project_id, "review")
+        if review is None:
+            return "Résultat introuvable dans le stockage.", []
+        return f"""
+### Résultat de l'évaluation : {title}
+
+_Enregistré le {_format_timestamp(review["created_at"])}_
+
+{review["data"]["review"]}""", []
+
+    versions = list(reversed(context_manager.list_versions(project_id, limit=500, with_data=False)))
+    scores = {}
+    for version in versions:
+        if version["action_type"] == "evaluation":
+            evaluation = context_manager.get_specification_version(version["version_id"], frozen=True)
+            scores[version["parent_id"]] = evaluation["data"].get("total_score")
+    specifications = [version for version in versions if version["action_type"] in SPECIFICATION_ACTIONS]
+    if not specifications:
+        return f"### {title}\n\nTraitement en cours : aucune version de spécification enregistrée.", []
+
+    submission = context_manager.get_latest_version(project_id, "submission")
+    final_id = submission["data"]["specification_version_id"] if submission else specifications[-1]["version_id"]
+    evaluation = submission["data"].get("evaluation") if submission else None
+    lines = [
+        f"### Résultat enregistré : {title}",
+        "",
+        f"- Type : {_HISTORY_KINDS.get(entry['kind'], entry['kind'])}",
+        f"- Score final : {evaluation['total_score'] if evaluation else 'traitement en cours ou interrompu'}",
+        f"- Version finale : {final_id}",
+        "",
+        "#### Versions",
+        "",
+        "| Version | Agent | Action | Date | Score |",
+        "|---|---|---|---|---|",
+    ]
+    choices = []
+    for index, version in enumerate(specifications, 1):
+        score = scores.get(version["version_id"])
+        lines.append(
+            f"| {version['version_id']} | {version['agent_name']} | {version['action_type']} "
+            f"| {_format_timestamp(version['created_at'])} | {_cell(f'{score:.2f}' if score is not None else None)} |"
+        )
+        label = f"{index}. {version['action_type']} ({version['agent_name']})"
+        choices.append((label + (f" · {score:.2f}" if score is not None else ""), version["version_id"]))
+    if evaluation:
+        lines += ["", "#### Points à améliorer"]
+        lines += [f"- {item}" for item in evaluation.get("feedback", {}).get("weaknesses", [])]
+    final = context_manager.get_specification_version(final_id, frozen=True)
+    if final is not None:
+        lines += [
+            "",
+            "#### Spécification finale",
+            "```json",
+            json.dumps(final["data"], ensure_ascii=False, indent=2),
+            "```",
+        ]
+    return "\n".join(lines), choices
+
+def format_version_diff(
+    session_id: Optional[str],
+    project_id: Optional[str],
+    old_version_id: Optional[str],
+    new_version_id: Optional[str]
+) -> str:
+    """Différences entre deux versions de spécification d'un résultat de l'historique."""
+    from utils.context_manager import get_context_manager
+    from utils.spec_diff import diff, resolve
+
+    if not (session_id and project_id and old_version_id and new_version_id):
+        return "Sélectionnez un résultat puis deux de ses versions."
+    context_manager = get_context_manager()
+    if context_manager.get_session_entry(session_id, project_id) is None:
+        return "Ce résultat n'appartient pas à l'historique de la session."
+    # Données figées du cache : les pages inchangées, partagées, sont ignorées sans être parcourues
+    old = context_manager.get_specification_version(old_version_id, frozen=True)
+    new = context_manager.get_specification_version(new_version_id, frozen=True)
+    if old is None or new is None or {old["project_id"], new["project_id"]} != {project_id}:
+        return "Versions introuvables pour ce résultat."
+    operations = [op for op in diff(old["data"], new["data"]) if op["path"] != "/timestamp"]
+    if not operations:
+        return "Aucune différence entre les deux versions."
+    lines = [
+        f"### Différences entre les versions {old_version_id} et {new_version_id}",
+        "",
+        f"{len(operations)} modification(s)",
+        "",
+        "| Champ | Avant | Après |",
+        "|---|---|---|",
+    ]
+    for op in operations:
+        before = resolve(old["data"], op["path"]) if op["op"] != "add" else None
+        after = op.get("value") if op["op"] != "remove" else None
+        lines.append(f"| `{op['path']}` | {_cell(before)} | {_cell(after)} |")
+    return "\n".join(lines)
+
+def export_specification(version_id: str, fmt: str, session_id: Optional[str] = None) -> Optional[str]:
+    """Exporte une version de spécification de la session et retourne le chemin du fichier produit."""
+    from utils.context_manager import get_context_manager
+    from utils.spec_export import FORMATS, SpecificationExporter, check_version_id
+
+    version_id = (version_id or "").strip().lower()
+    if not version_id or not session_id:
+        return None
+    try:
+        check_version_id(version_id)
+        # Seules les versions des projets de la session sont exportables depuis l'interface
+        context_manager = get_context_manager()
+        project_id = context_manager.get_version_project_id(version_id)
+        if project_id is None or context_manager.get_session_entry(session_id, project_id) is None:
+            raise ValueError(f"Version absente de l'historique de la session : {version_id}")
+        path = os.path.join(os.getenv("EXPORT_DIR", "exports"), f"{version_id}{FORMATS[fmt]}")
+        return str(SpecificationExporter(context_manager).export_to_file(version_id, fmt, path))
+    except ValueError as e:
+        logger.warning(f"Export impossible : {e}")
+        return None
+
+def build_demo() -> "gr.Blocks":
+    """Construit l'interface Gradio (gradio n'est importé qu'ici)."""
+    import gradio as gr
+
+    with gr.Blocks(title="Évaluateur de Spécifications", theme=gr.themes.Soft()) as demo:
+        gr.Markdown("""
+        # Évaluateur de Spécifications
     
-    Cet outil vous aide à évaluer vos spécifications techniques.
-    Remplissez le formulaire ci-dessous pour commencer.
-    """)
+        Cet outil vous aide à évaluer vos spécifications techniques.
+        Remplissez le formulaire ci-dessous pour commencer.
+        """)
     
-    with gr.Row():
-        with gr.Column():
-            title_input = gr.Textbox(
-                label="Titre",
-                placeholder="Entrez le titre de votre spécification"
-            )
-            description_input = gr.Textbox(
-                label="Description",
-                placeholder="Décrivez votre projet en détail",
-                lines=5
-            )
-            requirements_input = gr.Textbox(
-                label="Exigences",
-                placeholder="Entrez une exigence par ligne",
-                lines=5
-            )
-            constraints_input = gr.Textbox(
-                label="Contraintes",
-                placeholder="Entrez une contrainte par ligne",
-                lines=5
-            )
-            submit_btn = gr.Button("Évaluer", variant="primary")
-        
-        with gr.Column():
-            evaluation_output = gr.Markdown(label="Résultats de l'Évaluation")
-            with gr.Accordion("Options", open=False):
-                copy_btn = gr.Button("📋 Copier les résultats", variant="secondary")
-                copy_btn.click(
-                    None,
-                    inputs=evaluation_output,
-                    js="(text) => navigator.clipboard.writeText(text)"
+        with gr.Row():
+            with gr.Column():
+                title_input = gr.Textbox(
+                    label="Titre",
+                    placeholder="Entrez le titre de votre spécification"
+                )
+                description_input = gr.Textbox(
+                    label="Description",
+                    placeholder="Décrivez votre projet en détail",
+                    lines=5
                 )
+                requirements_input = gr.Textbox(
+                    label="Exigences",
+                    placeholder="Entrez une exigence par ligne",
+                    lines=5
+                )
+                constraints_input = gr.Textbox(
+                    label="Contraintes",
+                    placeholder="Entrez une contrainte par ligne",
+                    lines=5
+                )
+                submit_btn = gr.Button("Évaluer", variant="primary")
+                workflow_btn = gr.Button("Générer et optimiser (agents)", variant="secondary")
+                background_btn = gr.Button("Lancer en arrière-plan", variant="secondary")
+        
+            with gr.Column():
+                evaluation_output = gr.Markdown(label="Résultats de l'Évaluation")
+                with gr.Accordion("Options", open=False):
+                    copy_btn = gr.Button("📋 Copier les résultats", variant="secondary")
+                    copy_btn.click(
+                        None,
+                        inputs=evaluation_output,
+                        js="(text) => navigator.clipboard.writeText(text)"
+                    )
+                with gr.Accordion("Suivi d'un traitement", open=False):
+                    job_id_input = gr.Number(label="Numéro du traitement", precision=0)
+                    status_btn = gr.Button("Afficher l'état", variant="secondary")
+                with gr.Accordion("Export d'une spécification", open=False):
+                    export_version_input = gr.Textbox(
+                        label="Version",
+                        placeholder="Identifiant d'une version de la session (résultat du workflow ou d'un traitement)"
+                    )
+                    export_format_input = gr.Dropdown(
+                        label="Format",
+                        choices=[
+                            ("Markdown", "markdown"),
+                            ("HTML", "html"),
+                            ("HTML imprimable", "print"),
+                            ("JSON", "json"),
+                            ("YAML", "yaml")
+                        ],
+                        value="markdown"
+                    )
+                    export_btn = gr.Button("Exporter", variant="secondary")
+                    export_file = gr.File(label="Fichier exporté")
+                with gr.Accordion("Historique de la session", open=False):
+                    history_output = gr.Markdown()
+                    with gr.Row():
+                        history_prev_btn = gr.Button("◀ Plus récents", size="sm")
+                        history_refresh_btn = gr.Button("Rafraîchir", size="sm")
+                        history_next_btn = gr.Button("Plus anciens ▶", size="sm")
+                    history_entry = gr.Dropdown(label="Résultat à afficher", choices=[])
+                    with gr.Row():
+                        version_a = gr.Dropdown(label="Version de référence", choices=[])
+                        version_b = gr.Dropdown(label="Version comparée", choices=[])
+                    diff_btn = gr.Button("Comparer les versions", variant="secondary")
+
+        # Identifiant de session conservé dans le navigateur : l'historique survit aux rechargements
+        session_id = gr.Textbox(visible=False)
+        history_page = gr.State(0)
     
-    submit_btn.click(
-        fn=process_specification,
-        inputs=[
-            title_input,
-            description_input,
-            requirements_input,
-            constraints_input
-        ],
-        outputs=evaluation_output
-    )
+        def show_history(session: str, page: int):
+            table, choices, page = list_session_history(session, page)
+            return table, gr.update(choices=choices, value=None), page
+
+        def show_history_entry(session: str, project_id: str):
+            text, versions = load_history_entry(session, project_id)
+            ids = [version_id for _, version_id in versions]
+            return (
+                text,
+                gr.update(choices=versions, value=ids[-2] if len(ids) > 1 else None),
+                gr.update(choices=versions, value=ids[-1] if ids else None)
+            )
+
+        history_inputs = [session_id, history_page]
+        history_outputs = [history_output, history_entry, history_page]
+
+        submit_btn.click(
+            fn=process_specification,
+            inputs=[
+                title_input,
+                description_input,
+                requirements_input,
+                constraints_input,
+                session_id
+            ],
+            outputs=evaluation_output
+        ).then(fn=show_history, inputs=history_inputs, outputs=history_outputs)
+
+        workflow_btn.click(
+            fn=process_with_agents,
+            inputs=[
+                title_input,
+                description_input,
+                requirements_input,
+                constraints_input,
+                session_id
+            ],
+            outputs=evaluation_output
+        ).then(fn=show_history, inputs=history_inputs, outputs=history_outputs)
+
+        background_btn.click(
+            fn=submit_background_job,
+            inputs=[
+                title_input,
+                description_input,
+                requirements_input,
+                constraints_input,
+                session_id
+            ],
+            outputs=evaluation_output
+        ).then(fn=show_history, inputs=history_inputs, outputs=history_outputs)
+
+        status_btn.click(fn=format_job_status, inputs=job_id_input, outputs=evaluation_output)
+
+        export_btn.click(
+            fn=export_specification,
+            inputs=[export_version_input, export_format_input, session_id],
+            outputs=export_file
+        )
+
+        history_refresh_btn.click(fn=show_history, inputs=history_inputs, outputs=history_outputs)
+        history_prev_btn.click(
+            fn=lambda session, page: show_history(session, page - 1),
+            inputs=history_inputs,
+            outputs=history_outputs
+        )
+        history_next_btn.click(
+            fn=lambda session, page: show_history(session, page + 1),
+            inputs=history_inputs,
+            outputs=history_outputs
+        )
+        # Réaffichage depuis le stockage, sans appel au modèle
+        history_entry.input(
+            fn=show_history_entry,
+            inputs=[session_id, history_entry],
+            outputs=[evaluation_output, version_a, version_b]
+        )
+        diff_btn.click(
+            fn=format_version_diff,
+            inputs=[session_id, history_entry, version_a, version_b],
+            outputs=evaluation_output
+        )
+
+        demo.load(
+            fn=new_session_id,
+            inputs=session_id,
+            outputs=session_id,
+            js="() => localStorage.getItem('spec_session_id') || ''"
+        ).then(fn=show_history, inputs=history_inputs, outputs=history_outputs)
+        session_id.change(
+            fn=None,
+            inputs=session_id,
+            js="(id) => { localStorage.setItem('spec_session_id', id); }"
+        )
+
+    # Requêtes traitées simultanément : réparties entre les workers lorsque APP_WORKERS est défini
+    demo.queue(default_concurrency_limit=int(os.getenv("GRADIO_CONCURRENCY_LIMIT", "16")))
+    return demo
+
+def __getattr__(name: str):
+    # `main.demo` (rechargement automatique de Gradio) construit l'interface au premier accès
+    if name == "demo":
+        demo = globals()["demo"] = build_demo()
+        return demo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
-    demo.launch(show_api=False)
+    # Export des métriques (/metrics et /metrics.json) si METRICS_PORT est défini
+    start_metrics_server()
+    # Avec APP_WORKERS, les workers se préchauffent au démarrage ; sinon agents, SDK
+    # et cache sont préparés en parallèle du démarrage du serveur
+    if get_worker_pool(initializer=warm_up) is None:
+        start_warm_up()
+    # Traitements en arrière-plan (désactivés avec JOB_RUNNER=off, ex. workers lancés à part)
+    if os.getenv("JOB_RUNNER", "on").lower() != "off":
+        get_job_runner().start()
+    build_demo().launch(show_api=False)
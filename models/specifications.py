@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
+from datetime import datetime
 from enum import Enum
 
 class PageSection(BaseModel):
@@ -29,10 +30,107 @@ class WebSpecification(BaseModel):
     seo_requirements: Optional[List[str]] = Field(None, description="Exigences SEO")
     accessibility_requirements: Optional[List[str]] = Field(None, description="Exigences d'accessibilité")
 
+class ModificationType(str, Enum):
+    CREATION = "creation"
+    UPDATE = "update"
+    EVALUATION = "evaluation"
+    OPTIMIZATION = "optimization"
+
+class VersionMetadata(BaseModel):
+    version_id: str = Field(..., description="Identifiant unique de la version")
+    parent_version_id: Optional[str] = Field(None, description="Version dont celle-ci est dérivée")
+    agent_name: str = Field(..., description="Agent ayant produit la version")
+    modification_type: ModificationType = Field(..., description="Nature de la modification")
+    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Date de création")
+    comment: Optional[str] = Field(None, description="Commentaire associé à la version")
+
+class VersionedWebSpecification(WebSpecification):
+    metadata: VersionMetadata = Field(..., description="Métadonnées de version")
+
+    @classmethod
+    def from_specification(cls, spec: WebSpecification, metadata: VersionMetadata) -> "VersionedWebSpecification":
+        """Associe des métadonnées à une spécification déjà validée, sans nouvelle validation ni copie profonde."""
+        fields = {name: getattr(spec, name) for name in WebSpecification.model_fields}
+        return cls.model_construct(
+            _fields_set=spec.model_fields_set | {"metadata"},
+            **fields,
+            metadata=metadata
+        )
+
+    def specification(self) -> WebSpecification:
+        """Retourne la spécification sans ses métadonnées (copie superficielle, sans validation)."""
+        fields = {name: getattr(self, name) for name in WebSpecification.model_fields}
+        return WebSpecification.model_construct(
+            _fields_set=self.model_fields_set - {"metadata"},
+            **fields
+        )
+
+class DependencyContext(BaseModel):
+    source_version_id: str = Field(..., description="Version à l'origine de la dépendance")
+    target_agent: str = Field(..., description="Agent destinataire")
+    context_type: str = Field(..., description="Type de demande (evaluation_request, optimization_request...)")
+    data: Dict[str, Any] = Field(default_factory=dict, description="Données transmises à l'agent")
+    priority: int = Field(0, description="Priorité de traitement (plus petit = plus prioritaire)")
+
+class EvaluationCriteria(BaseModel):
+    completeness: float = Field(..., ge=0, le=100, description="Complétude (25%)")
+    coherence: float = Field(..., ge=0, le=100, description="Cohérence (25%)")
+    clarity: float = Field(..., ge=0, le=100, description="Clarté (20%)")
+    feasibility: float = Field(..., ge=0, le=100, description="Faisabilité (15%)")
+    quality: Optional[float] = Field(None, ge=0, le=100, description="Qualité (15%)")
+
 class EvaluationResult(BaseModel):
-    score: float
-    feedback: str
+    specification_version: str = Field(..., description="Version évaluée")
+    criteria: EvaluationCriteria = Field(..., description="Scores détaillés par critère")
+    total_score: float = Field(..., ge=0, le=1, description="Moyenne pondérée des critères")
+    feedback: Dict[str, List[str]] = Field(..., description="Points forts, faibles, techniques et fonctionnels")
+    evaluator_name: str = Field("Evaluator", description="Agent ayant réalisé l'évaluation")
+    improvement_suggestions: List[str] = Field(default_factory=list, description="Suggestions d'amélioration")
+    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Date de l'évaluation")
+
+class OptimizationChange(BaseModel):
+    field_path: str = Field(..., description="Chemin du champ modifié")
+    previous_value: Optional[Any] = Field(None, description="Valeur précédente")
+    new_value: Optional[Any] = Field(None, description="Nouvelle valeur")
+    reason: str = Field(..., description="Justification du changement")
 
 class OptimizationResult(BaseModel):
+    original_version_id: str = Field(..., description="Version optimisée")
+    new_version_id: str = Field(..., description="Version produite")
+    improved_specification: VersionedWebSpecification = Field(..., description="Spécification améliorée")
+    changes_made: List[OptimizationChange] = Field(default_factory=list, description="Modifications apportées")
+    optimization_score: float = Field(..., ge=0, le=1, description="Score estimé après optimisation")
+    optimizer_name: str = Field("Optimizer", description="Agent ayant réalisé l'optimisation")
+    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Date de l'optimisation")
+
+# Modèles des réponses brutes des agents, validées directement depuis le JSON du modèle
+
+class EvaluatorResponse(BaseModel):
+    criteria: EvaluationCriteria
+    total_score: float = Field(..., ge=0, le=1)
+    feedback: Dict[str, List[str]] = Field(default_factory=dict)
+    improvement_suggestions: List[str] = Field(default_factory=list)
+
+class CriterionResponse(BaseModel):
+    score: float = Field(..., ge=0, le=100)
+    strengths: List[str] = Field(default_factory=list)
+    weaknesses: List[str] = Field(default_factory=list)
+    technical: List[str] = Field(default_factory=list)
+    functional: List[str] = Field(default_factory=list)
+    improvement_suggestions: List[str] = Field(default_factory=list)
+
+class OptimizerResponse(BaseModel):
     improved_specification: WebSpecification
-    changes_made: List[str]
+    changes: List[OptimizationChange] = Field(default_factory=list)
+    optimization_score: float = Field(..., ge=0, le=1)
+
+class SectionsResponse(BaseModel):
+    pages: Dict[str, PageSection]
+    changes: List[OptimizationChange] = Field(default_factory=list)
+    optimization_score: Optional[float] = Field(None, ge=0, le=1)
+
+class SectionsUpdateResponse(BaseModel):
+    pages: Dict[str, PageSection] = Field(default_factory=dict)
+    # Présents uniquement si les lignes modifiées du contexte les concernent
+    features: Optional[List[str]] = None
+    tech_stack: Optional[Dict[TechStackCategory, List[str]]] = None
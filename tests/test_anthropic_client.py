@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import anthropic
+import pytest
+
+from utils.anthropic_client import AnthropicClient
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Serveur local imitant l'API Messages : réponses programmées, requêtes reçues notées."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.responses = []
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reply(self, status: int = 200, headers=None, text: str = "ok") -> None:
+        self.responses.append((status, headers or {}, text))
+
+    def next_response(self, prompt: str):
+        with self._lock:
+            self.prompts.append(prompt)
+            return self.responses.pop(0) if self.responses else (200, {}, "ok")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        status, headers, text = self.server.next_response(request["messages"][0]["content"])
+        if status == 200:
+            body = {
+                "id": "msg_test", "type": "message", "role": "assistant", "model": request["model"],
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": 10, "output_tokens": 5}
+            }
+        else:
+            body = {"type": "error", "error": {"type": "api_error", "message": text}}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FakeServer()
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server, **options) -> AnthropicClient:
+    options.setdefault("backoff_base", 0.01)
+    return AnthropicClient(api_key="test", base_url=server.url, **options)
+
+
+def test_retry_after_429(server):
+    server.reply(429, {"retry-after": "0.3"}, "limite de débit")
+    server.reply(text="réponse")
+    client = _client(server)
+    started_at = time.monotonic()
+    assert client.generate("bonjour") == "réponse"
+    assert time.monotonic() - started_at >= 0.3
+    assert len(server.prompts) == 2
+    client.close()
+
+
+def test_definitive_error_is_not_retried(server):
+    server.reply(400, text="requête invalide")
+    client = _client(server)
+    with pytest.raises(anthropic.BadRequestError):
+        client.generate("bonjour")
+    assert len(server.prompts) == 1
+    client.close()
+
+
+def test_failed_attempts_are_refunded(server):
+    for _ in range(3):
+        server.reply(500, text="erreur serveur")
+    client = _client(server, max_retries=2, tokens_per_minute=60000)
+    with pytest.raises(anthropic.InternalServerError):
+        client.generate("x" * 40000)
+    assert len(server.prompts) == 3
+    # Trois tentatives d'environ 10 000 tokens estimés, toutes rendues au limiteur
+    assert client.rate_limiter.tokens.tokens == client.rate_limiter.tokens.capacity
+    client.close()
+
+
+def test_priority_order(server):
+    client = _client(server, requests_per_minute=600)
+    # Seau vide : chaque requête attend son créneau (0,1 s) dans la file à priorités
+    client.rate_limiter.requests.tokens = 0
+    background = threading.Thread(target=client.generate, args=("lot",), kwargs={"priority": 5})
+    background.start()
+    while not client.rate_limiter._queue:
+        time.sleep(0.001)
+    client.generate("interactif", priority=0)
+    background.join()
+    assert server.prompts == ["interactif", "lot"]
+    client.close()
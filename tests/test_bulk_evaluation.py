@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from agents.bulk_evaluation import BulkEvaluator, repair_output
+from benchmarks.bench_pipeline import Environment
+from benchmarks.fake_model import FakeMessagesAPI, fake_specification
+
+
+@pytest.fixture
+def env(tmp_path):
+    environment = Environment(FakeMessagesAPI(pages=2), str(tmp_path))
+    yield environment
+    environment.close()
+
+
+def _bulk(env) -> BulkEvaluator:
+    return BulkEvaluator(evaluator=env.evaluator, context_manager=env.context_manager, concurrency=1)
+
+
+def _records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_after_truncated_last_line(env, tmp_path):
+    source = tmp_path / "specs.jsonl"
+    source.write_text(
+        "".join(json.dumps({"id": f"spec-{index}", "specification": fake_specification(2)}) + "\n" for index in range(3)),
+        encoding="utf-8"
+    )
+    output = tmp_path / "out" / "evaluations.jsonl"
+    report = _bulk(env).run(str(source), str(output))
+    assert (report.evaluated, report.skipped) == (3, 0)
+
+    # Arrêt brutal simulé pendant l'écriture du deuxième résultat
+    lines = output.read_text(encoding="utf-8").splitlines(keepends=True)
+    output.write_text(lines[0] + lines[1][:len(lines[1]) // 2], encoding="utf-8")
+
+    report = _bulk(env).run(str(source), str(output))
+    assert (report.evaluated, report.skipped, report.failed) == (2, 1, 0)
+    records = _records(output)
+    assert sorted(record["id"] for record in records) == ["spec-0", "spec-1", "spec-2"]
+    assert all("evaluation" in record for record in records)
+
+    # Point de reprise sain : plus rien à évaluer
+    report = _bulk(env).run(str(source), str(output))
+    assert (report.evaluated, report.skipped) == (0, 3)
+
+
+def test_repair_output(tmp_path):
+    output = tmp_path / "evaluations.jsonl"
+    output.write_bytes(b'{"id": "a"}\n{"id": "b", "eval')
+    repair_output(str(output))
+    assert output.read_bytes() == b'{"id": "a"}\n'
+
+    repair_output(str(output))
+    assert output.read_bytes() == b'{"id": "a"}\n'
+
+    output.write_bytes(b'{"id": "partiel')
+    repair_output(str(output))
+    assert output.read_bytes() == b""
+
+    repair_output(str(tmp_path / "absent.jsonl"))
@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import main
+from agents.evaluator import Evaluator
+from agents.optimizer import Optimizer
+from agents.specification_writer import SpecificationWriter
+from agents.workflow import WorkflowEngine
+from benchmarks.bench_replay import replay
+from benchmarks.fake_model import FakeAnthropicClient, FakeMessagesAPI
+from utils import response_cache
+from utils.cassette import RECORD, REPLAY, Cassette
+from utils.context_manager import ContextManager
+from utils.model_router import ModelRouter
+from utils.similarity_index import SimilarityIndex
+from utils.version_store import VersionStore
+
+BRIEF = ("Réservation de salles", "Une application de réservation de salles de réunion", "Calendrier partagé", "Mobile")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Points d'entrée de l'interface branchés sur le modèle factice et un stockage isolé."""
+    monkeypatch.setenv("APP_WORKERS", "0")
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "responses.sqlite3"))
+    monkeypatch.delenv("LLM_CASSETTE_MODE", raising=False)
+    opened = []
+
+    def use(client: FakeAnthropicClient) -> response_cache.ResponseCache:
+        # Cache partagé créé à nouveau selon la configuration courante
+        monkeypatch.setattr(response_cache, "_response_cache", None)
+        cache = response_cache.get_response_cache()
+        context_manager = ContextManager(store=VersionStore(str(tmp_path / "context.sqlite3")))
+        similarity_index = SimilarityIndex(str(tmp_path / "similarity.sqlite3"))
+        router = ModelRouter()
+        options = dict(context_manager=context_manager, response_cache=cache, client=client, model_router=router)
+        engine = WorkflowEngine(
+            context_manager=context_manager,
+            writer=SpecificationWriter(**options),
+            evaluator=Evaluator(**options),
+            optimizer=Optimizer(**options),
+            similarity_index=similarity_index
+        )
+        monkeypatch.setattr(main, "get_client", lambda: client)
+        monkeypatch.setattr(main, "get_model_router", lambda: router)
+        monkeypatch.setattr(main, "_workflow_engine", engine)
+        opened.extend([cache, similarity_index])
+        return cache
+
+    yield use
+    for resource in opened:
+        resource.close()
+
+
+def _run_entry_points() -> None:
+    for _ in main.process_specification(*BRIEF):
+        pass
+
+    async def consume() -> None:
+        async for _ in main.process_with_agents(*BRIEF):
+            pass
+    asyncio.run(consume())
+
+
+def test_replay_recorded_runs(app, tmp_path, monkeypatch):
+    fake = FakeMessagesAPI(pages=2)
+    # Traitement antérieur : cache de réponses et index de similarité déjà alimentés
+    assert app(FakeAnthropicClient(fake)).enabled
+    _run_entry_points()
+
+    monkeypatch.setenv("LLM_CASSETTE_MODE", RECORD)
+    path = str(tmp_path / "session.jsonl.gz")
+    cassette = Cassette(path, RECORD)
+    client = FakeAnthropicClient(fake)
+    client.client = cassette.wrap(SimpleNamespace(messages=fake))
+    client.cassette = cassette
+    assert not app(client).enabled
+    calls = fake.calls
+    _run_entry_points()
+    assert fake.calls > calls
+    cassette.close()
+
+    # Rejeu hors ligne : chaque appel du traitement enregistré figure dans la cassette
+    results = replay(Cassette(path, REPLAY))
+    assert [row["entry"] for row in results] == ["review", "workflow"]
+    assert all(not row["failed"] and row["missed"] == 0 for row in results)
+    assert sum(row["calls"] for row in results) == fake.calls - calls
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+
+import main
+from agents.evaluator import Evaluator
+from agents.optimizer import Optimizer
+from agents.specification_writer import SpecificationWriter
+from agents.workflow import UNCHANGED, WorkflowEngine
+from benchmarks.fake_model import FakeAnthropicClient, FakeMessagesAPI
+from utils import context_manager as context_module
+from utils.context_manager import ContextManager
+from utils.model_router import ModelRouter
+from utils.response_cache import ResponseCache
+from utils.version_store import VersionStore
+
+TITLE = "Réservation de salles"
+
+
+class NamedPagesAPI(FakeMessagesAPI):
+    """Modèle factice dont une page porte un nom rattachable au brief.
+
+    Une mise à jour demandée pour une ligne mentionnant « export » révise
+    aussi la liste des fonctionnalités.
+    """
+
+    def __init__(self):
+        super().__init__(pages=2)
+        self.prompts = []
+
+    def _respond(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        text = super()._respond(prompt).replace("Page 1", "Calendrier partagé")
+        if "Lignes du contexte modifiées" in prompt and "export" in prompt.split("Pages actuelles")[0]:
+            response = json.loads(text)
+            response["features"] = ["Réservation", "Export du calendrier"]
+            text = json.dumps(response, ensure_ascii=False)
+        return text
+
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    monkeypatch.setenv("APP_WORKERS", "0")
+    monkeypatch.delenv("LLM_CASSETTE_MODE", raising=False)
+    api = NamedPagesAPI()
+    client = FakeAnthropicClient(api)
+    context_manager = ContextManager(store=VersionStore(str(tmp_path / "context.sqlite3")))
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), enabled=False)
+    router = ModelRouter()
+    options = dict(context_manager=context_manager, response_cache=cache, client=client, model_router=router)
+    engine = WorkflowEngine(
+        context_manager=context_manager,
+        writer=SpecificationWriter(**options),
+        evaluator=Evaluator(**options),
+        optimizer=Optimizer(**options),
+        warm_start_threshold=0
+    )
+    monkeypatch.setattr(context_module, "_context_manager", context_manager)
+    monkeypatch.setattr(main, "_workflow_engine", engine)
+    yield api, context_manager
+    cache.close()
+
+
+def _submit(requirements: str, session_id: str = "session") -> str:
+    async def consume() -> str:
+        output = ""
+        async for output in main.process_with_agents(TITLE, "Application interne", requirements, "Mobile", session_id):
+            pass
+        return output
+    return asyncio.run(consume())
+
+
+def _scoped_evaluations(api: NamedPagesAPI) -> int:
+    return sum("Pages modifiées à évaluer" in prompt for prompt in api.prompts)
+
+
+def test_session_resubmission_updates_affected_pages(fake):
+    api, context_manager = fake
+    _submit("Calendrier partagé")
+    project_id = context_manager.list_session_history("session")[0]["project_id"]
+    first = context_manager.get_last_submission(project_id)["data"]["specification_version_id"]
+
+    # Ligne modifiée rattachée à la page du calendrier : mise à jour limitée à cette page
+    _submit("Calendrier partagé avec rappels")
+    assert context_manager.count_session_history("session") == 1
+    submission = context_manager.get_last_submission(project_id)["data"]
+    history = context_manager.get_version_history(submission["specification_version_id"], with_data=False)
+    assert first in [version["version_id"] for version in history]
+    update = next(version for version in history if version["agent_name"] == "SpecificationWriter")
+    assert update["action_type"] == "update"
+    writes = [
+        version["action_type"] for version in context_manager.list_versions(project_id, with_data=False)
+        if version["agent_name"] == "SpecificationWriter"
+    ]
+    assert writes == ["update", "creation"]
+    assert _scoped_evaluations(api) >= 1
+
+    # Contexte identique : résultat précédent réutilisé sans appel au modèle
+    calls = len(api.prompts)
+    assert UNCHANGED in _submit("Calendrier partagé avec rappels")
+    assert len(api.prompts) == calls
+
+    # Fonctionnalités révisées par la mise à jour : toute la spécification est réévaluée
+    scoped = _scoped_evaluations(api)
+    _submit("Calendrier partagé avec rappels et export")
+    submission = context_manager.get_last_submission(project_id)["data"]
+    spec = context_manager.get_specification(submission["specification_version_id"])
+    assert "Export du calendrier" in spec.features
+    assert _scoped_evaluations(api) == scoped
+
+    # Autre session : nouveau projet, rédigé à partir de zéro
+    _submit("Calendrier partagé avec rappels", session_id="autre")
+    assert context_manager.list_session_history("autre")[0]["project_id"] != project_id
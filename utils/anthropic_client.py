@@ -0,0 +1,368 @@
+import heapq
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics
+from utils.prompt_builder import estimate_tokens
+
+if TYPE_CHECKING:
+    import anthropic
+
+    from utils.cassette import Cassette
+
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+
+# Codes HTTP justifiant une nouvelle tentative (limite de débit, surcharge, erreurs serveur)
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def _sdk():
+    """Modules `anthropic` et `httpx`, importés au premier usage."""
+    import anthropic
+    import httpx
+    return anthropic, httpx
+
+
+def _is_api_error(error: Exception) -> bool:
+    """Erreur de l'API Anthropic ? Le SDK n'est pas importé pour le savoir : sans SDK
+    chargé (rejeu d'une cassette), aucune erreur ne peut en provenir."""
+    anthropic = sys.modules.get("anthropic")
+    return anthropic is not None and isinstance(error, anthropic.APIError)
+
+
+class TokenBucket:
+    """Seau à jetons rechargé en continu à `rate_per_minute` jetons par minute."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Délai avant que `amount` jetons soient disponibles (0 si disponibles)."""
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Limiteur requêtes/minute et tokens/minute avec file d'attente par priorité.
+
+    Les demandes sont servies par priorité croissante (0 = la plus urgente),
+    puis par ordre d'arrivée ; une demande ne consomme les jetons que
+    lorsqu'elle est en tête de file, ce qui évite la famine des demandes
+    coûteuses et les rafales simultanées après une attente.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._condition = threading.Condition()
+        self._queue = []
+        self._counter = itertools.count()
+
+    def acquire(self, tokens: int = 0, priority: int = 0) -> float:
+        """Bloque jusqu'à obtention d'un créneau ; retourne le temps d'attente en secondes."""
+        started_at = time.monotonic()
+        entry = (priority, next(self._counter))
+        with self._condition:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    if self._queue[0] == entry:
+                        now = time.monotonic()
+                        delay = 0.0
+                        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                            if bucket is not None:
+                                bucket.refill(now)
+                                delay = max(delay, bucket.wait_time(amount))
+                        if delay <= 0:
+                            if self.requests is not None:
+                                self.requests.tokens -= 1
+                            if self.tokens is not None:
+                                self.tokens.tokens -= min(tokens, self.tokens.capacity)
+                            return time.monotonic() - started_at
+                        self._condition.wait(timeout=delay)
+                    else:
+                        self._condition.wait()
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+
+    def record_usage(self, extra_tokens: int) -> None:
+        """Débite (ou recrédite) l'écart entre les tokens estimés et réellement consommés."""
+        if self.tokens is None or not extra_tokens:
+            return
+        with self._condition:
+            self.tokens.refill(time.monotonic())
+            self.tokens.tokens = min(self.tokens.capacity, self.tokens.tokens - extra_tokens)
+            self._condition.notify_all()
+
+
+class UsageMeter:
+    """Compteur des tokens consommés par un ensemble d'appels (un projet, par exemple)."""
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def add(self, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.requests += 1
+
+
+# Compteur de la tâche en cours, alimenté par chaque réponse du modèle
+_current_meter: ContextVar[Optional[UsageMeter]] = ContextVar("current_meter", default=None)
+
+
+@contextmanager
+def track_usage(meter: Optional[UsageMeter]) -> Iterator[Optional[UsageMeter]]:
+    """Comptabilise dans `meter` les tokens des appels effectués dans le bloc (tâche ou thread courant)."""
+    token = _current_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _current_meter.reset(token)
+
+
+class AnthropicClient:
+    """Client partagé pour l'API Messages d'Anthropic.
+
+    Les connexions HTTP sont réutilisées via un pool, les appels passent par
+    un limiteur de débit à priorités, et les erreurs 429/5xx sont retentées
+    avec un délai exponentiel aléatoire (full jitter) en respectant
+    l'en-tête Retry-After. `base_url` permet de cibler un serveur de test local.
+    Avec une `cassette`, les appels sont enregistrés ou rejoués hors ligne.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_tokens: int = 4096,
+        max_connections: int = 20,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 4,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        timeout: float = 120.0,
+        cassette: Optional["Cassette"] = None
+    ):
+        # Le SDK Anthropic (long à importer) n'est chargé qu'à la première requête
+        self._sdk_options = dict(
+            api_key=api_key or os.getenv("ANTHROPIC_API_KEY"),
+            base_url=base_url or os.getenv("ANTHROPIC_BASE_URL") or None,
+            max_connections=max_connections,
+            timeout=timeout
+        )
+        self._sdk_lock = threading.Lock()
+        self.http_client = None
+        self._client = None
+        self.cassette = cassette
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.logger = get_logger("AnthropicClient")
+
+    @property
+    def client(self) -> "anthropic.Anthropic":
+        """Client du SDK, créé au premier appel avec son pool de connexions."""
+        if self._client is None:
+            with self._sdk_lock:
+                if self._client is None and self.cassette is not None and self.cassette.replaying:
+                    # Rejeu hors ligne : aucune connexion n'est ouverte
+                    self._client = self.cassette.wrap()
+                if self._client is None:
+                    anthropic, httpx = _sdk()
+                    options = self._sdk_options
+                    self.http_client = httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=options["max_connections"],
+                            max_keepalive_connections=options["max_connections"]
+                        ),
+                        timeout=options["timeout"]
+                    )
+                    sdk_client = anthropic.Anthropic(
+                        api_key=options["api_key"],
+                        base_url=options["base_url"],
+                        http_client=self.http_client,
+                        # Les nouvelles tentatives sont gérées ici, de concert avec le limiteur
+                        max_retries=0
+                    )
+                    self._client = self.cassette.wrap(sdk_client) if self.cassette is not None else sdk_client
+        return self._client
+
+    @client.setter
+    def client(self, value) -> None:
+        self._client = value
+
+    def generate(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        model: str = DEFAULT_MODEL,
+        max_tokens: Optional[int] = None,
+        priority: int = 0,
+        meter: Optional[UsageMeter] = None
+    ) -> str:
+        """Envoie un prompt et retourne le texte complet de la réponse.
+
+        Les tokens consommés sont ajoutés à `meter` s'il est fourni.
+        """
+        estimated = estimate_tokens(system_prompt) + estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            self._acquire(estimated, priority, model)
+            try:
+                self.logger.debug("Requête envoyée au modèle %s (priorité %d)", model, priority)
+                message = self.client.messages.create(
+                    model=model,
+                    max_tokens=max_tokens or self.max_tokens,
+                    system=system_prompt,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+            except Exception as e:
+                if not _is_api_error(e):
+                    raise
+                # Requête refusée ou interrompue : les tokens réservés sont rendus au limiteur
+                self.rate_limiter.record_usage(-estimated)
+                self._handle_error(e, attempt, model)
+                continue
+            self._record_usage(message.usage, estimated, meter)
+            return "".join(block.text for block in message.content if block.type == "text")
+
+    def stream(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        model: str = DEFAULT_MODEL,
+        max_tokens: Optional[int] = None,
+        priority: int = 0,
+        meter: Optional[UsageMeter] = None
+    ) -> Iterator[str]:
+        """Envoie un prompt et produit les fragments de texte au fil de leur réception.
+
+        Une nouvelle tentative n'est possible que tant qu'aucun fragment n'a été produit.
+        """
+        estimated = estimate_tokens(system_prompt) + estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            self._acquire(estimated, priority, model)
+            emitted = False
+            try:
+                self.logger.debug("Requête en streaming envoyée au modèle %s (priorité %d)", model, priority)
+                with self.client.messages.stream(
+                    model=model,
+                    max_tokens=max_tokens or self.max_tokens,
+                    system=system_prompt,
+                    messages=[{"role": "user", "content": prompt}]
+                ) as stream:
+                    for text in stream.text_stream:
+                        emitted = True
+                        yield text
+                    usage = stream.get_final_message().usage
+                self._record_usage(usage, estimated, meter)
+                return
+            except Exception as e:
+                if emitted or not _is_api_error(e):
+                    raise
+                self.rate_limiter.record_usage(-estimated)
+                self._handle_error(e, attempt, model)
+
+    def close(self) -> None:
+        if self.http_client is not None:
+            self.http_client.close()
+        if self.cassette is not None:
+            self.cassette.close()
+
+    def _acquire(self, estimated: int, priority: int, model: str) -> None:
+        waited = self.rate_limiter.acquire(estimated, priority)
+        get_metrics().histogram(
+            "llm_queue_wait_seconds", "Attente dans le limiteur de débit avant envoi", ("model",)
+        ).observe(waited, model=model)
+
+    def _record_usage(self, usage, estimated: int, meter: Optional[UsageMeter] = None) -> None:
+        self.rate_limiter.record_usage(usage.input_tokens + usage.output_tokens - estimated)
+        current = _current_meter.get()
+        for target in (meter, current if current is not meter else None):
+            if target is not None:
+                target.add(usage.input_tokens, usage.output_tokens)
+
+    def _handle_error(self, error: "anthropic.APIError", attempt: int, model: str = "") -> None:
+        """Relève l'erreur si elle est définitive, sinon attend avant la prochaine tentative."""
+        status = getattr(error, "status_code", None)
+        reason = str(status or type(error).__name__)
+        retryable = isinstance(error, _sdk()[0].APIConnectionError) or status in RETRYABLE_STATUS_CODES
+        if not retryable or attempt >= self.max_retries:
+            get_metrics().counter(
+                "llm_api_errors_total", "Erreurs définitives de l'API", ("model", "reason")
+            ).inc(model=model, reason=reason)
+            raise error
+        get_metrics().counter(
+            "llm_retries_total", "Nouvelles tentatives après une erreur de l'API", ("model", "reason")
+        ).inc(model=model, reason=reason)
+
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        self.logger.warning(
+            f"Erreur {status or type(error).__name__} de l'API, nouvelle tentative dans {delay:.2f}s "
+            f"({attempt + 1}/{self.max_retries})"
+        )
+        time.sleep(delay)
+
+
+# Instance partagée du client, créée au premier usage
+_client: Optional[AnthropicClient] = None
+_client_lock = threading.Lock()
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+def get_client() -> AnthropicClient:
+    """Fonction utilitaire pour obtenir le client Anthropic partagé."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from utils.cassette import cassette_from_env
+            cassette = cassette_from_env()
+            # Au rejeu, aucune limite de débit : les réponses sont servies à pleine vitesse
+            limited = cassette is None or not cassette.replaying
+            _client = AnthropicClient(
+                max_connections=int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "20")),
+                requests_per_minute=_env_float("ANTHROPIC_REQUESTS_PER_MINUTE") if limited else None,
+                tokens_per_minute=_env_float("ANTHROPIC_TOKENS_PER_MINUTE") if limited else None,
+                max_retries=int(os.getenv("ANTHROPIC_MAX_RETRIES", "4")),
+                cassette=cassette
+            )
+        return _client
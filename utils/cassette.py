@@ -0,0 +1,371 @@
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics
+
+RECORD = "record"
+REPLAY = "replay"
+MODES = (RECORD, REPLAY)
+FORMAT_VERSION = 1
+
+# Identifiants (uuid) et horodatages ISO, qui changent d'une exécution à l'autre
+_VOLATILE = re.compile(
+    r"\b[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}\b"
+    r"|\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+)
+
+
+def request_key(system_prompt: str, prompt: str) -> str:
+    """Empreinte d'une requête, indépendante du modèle routé et des identifiants qu'elle contient."""
+    normalized = f"{_VOLATILE.sub('#', system_prompt)}\x00{_VOLATILE.sub('#', prompt)}"
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+
+
+def worker_path(path: str) -> str:
+    """Fichier propre au worker courant (WORKER_ID), comme pour les fichiers de log."""
+    worker = os.getenv("WORKER_ID")
+    if not worker:
+        return path
+    directory, name = os.path.split(path)
+    stem, dot, ext = name.partition(".")
+    return os.path.join(directory, f"{stem}.worker-{worker}{dot}{ext}")
+
+
+def _read_lines(path: str) -> Iterator[Dict[str, Any]]:
+    """Lignes d'une cassette ; la fin d'un enregistrement interrompu est ignorée."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        try:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    return
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            return
+
+
+class Cassette:
+    """Échanges avec le modèle enregistrés sur disque, puis rejoués hors ligne.
+
+    Le fichier est au format JSON Lines compressé (gzip). En mode `record`,
+    chaque appel (prompt, réponse ou fragments du streaming, tokens, latence)
+    y est ajouté dès la réponse reçue, les prompts système n'étant écrits
+    qu'une fois ; un nouvel enregistrement remplace le fichier. En mode
+    `replay`, les réponses sont resservies dans l'ordre d'enregistrement pour
+    chaque empreinte de requête (`request_key`), la dernière étant répétée
+    au-delà ; une requête absente lève une ValueError.
+    `delay_factor` reproduit les latences enregistrées (0 = pleine vitesse,
+    1 = temps réel).
+    """
+
+    def __init__(self, path: str, mode: str, delay_factor: float = 0.0):
+        if mode not in MODES:
+            raise ValueError(f"Mode de cassette inconnu : {mode} (attendu : {', '.join(MODES)})")
+        self.path = path
+        self.mode = mode
+        self.delay_factor = delay_factor
+        self.logger = get_logger("Cassette")
+        self._lock = threading.Lock()
+        self._file = None
+        self._systems: Dict[str, str] = {}
+        self._calls: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursors: Counter = Counter()
+        self.runs: List[Dict[str, Any]] = []
+        self.served = 0
+        self.missed = 0
+        self.served_latency = 0.0
+        if mode == REPLAY:
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def files(self) -> List[str]:
+        """Fichier principal et fichiers enregistrés par les workers."""
+        directory, name = os.path.split(self.path)
+        stem, dot, ext = name.partition(".")
+        pattern = os.path.join(glob.escape(directory), f"{glob.escape(stem)}.worker-*{dot}{glob.escape(ext)}")
+        paths = [self.path] if os.path.exists(self.path) else []
+        return paths + sorted(glob.glob(pattern))
+
+    def _load(self) -> None:
+        paths = self.files()
+        if not paths:
+            raise ValueError(f"Cassette introuvable : {self.path}")
+        for path in paths:
+            for entry in _read_lines(path):
+                kind = entry.get("type")
+                if kind == "system":
+                    self._systems[entry["id"]] = entry["text"]
+                elif kind == "call":
+                    self._calls[entry["key"]].append(entry)
+                elif kind == "run":
+                    self.runs.append(entry)
+        self.runs.sort(key=lambda run: run["at"])
+        self.logger.info(
+            "Cassette %s chargée : %d appels, %d exécutions",
+            self.path, sum(len(calls) for calls in self._calls.values()), len(self.runs)
+        )
+
+    def wrap(self, client: Any = None) -> SimpleNamespace:
+        """Client exposant l'API Messages de `client` enregistrée ou rejouée (`client` inutile au rejeu)."""
+        return SimpleNamespace(messages=CassetteMessages(self, client.messages if client is not None else None))
+
+    # Enregistrement
+
+    def _write(self, entries: Sequence[Dict[str, Any]]) -> None:
+        with self._lock:
+            if self._file is None:
+                path = worker_path(self.path)
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._file = gzip.open(path, "wt", encoding="utf-8")
+                self._file.write(json.dumps({"type": "header", "version": FORMAT_VERSION, "created_at": time.time()}) + "\n")
+            for entry in entries:
+                if entry.get("type") == "system":
+                    if entry["id"] in self._systems:
+                        continue
+                    self._systems[entry["id"]] = entry["text"]
+                self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            # Vidage à chaque appel : un enregistrement interrompu reste lisible
+            self._file.flush()
+
+    def record_call(
+        self,
+        model: str,
+        max_tokens: int,
+        system_prompt: str,
+        prompt: str,
+        usage: Any,
+        latency: float,
+        text: Optional[str] = None,
+        chunks: Optional[List[str]] = None,
+        first_chunk: Optional[float] = None
+    ) -> None:
+        """Ajoute un appel terminé : réponse complète (`text`) ou fragments du streaming (`chunks`)."""
+        system_id = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+        call = {
+            "type": "call",
+            "key": request_key(system_prompt, prompt),
+            "model": model,
+            "max_tokens": max_tokens,
+            "system": system_id,
+            "prompt": prompt,
+            "usage": [usage.input_tokens, usage.output_tokens],
+            "latency": round(latency, 4),
+            "at": time.time()
+        }
+        if chunks is None:
+            call["text"] = text
+        else:
+            call["chunks"] = chunks
+            call["first_chunk"] = round(first_chunk or 0.0, 4)
+        self._write([{"type": "system", "id": system_id, "text": system_prompt}, call])
+        self._count("recorded", model)
+
+    def record_run(self, entry: str, inputs: Sequence[Any]) -> None:
+        """Note une exécution de l'interface (point d'entrée et champs saisis) pour la rejouer."""
+        if self.recording:
+            self._write([{"type": "run", "entry": entry, "inputs": list(inputs), "at": time.time()}])
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # Rejeu
+
+    def replay(self, system_prompt: str, prompt: str) -> Dict[str, Any]:
+        """Prochain appel enregistré pour cette requête."""
+        key = request_key(system_prompt, prompt)
+        with self._lock:
+            calls = self._calls.get(key)
+            if not calls:
+                self.missed += 1
+            else:
+                call = calls[min(self._cursors[key], len(calls) - 1)]
+                self._cursors[key] += 1
+                self.served += 1
+                self.served_latency += call["latency"]
+        if not calls:
+            self._count("missing", "")
+            raise ValueError(f"Requête absente de la cassette {self.path} (empreinte {key})")
+        self._count("served", call["model"])
+        return call
+
+    def sleep(self, seconds: float) -> None:
+        if self.delay_factor > 0 and seconds > 0:
+            time.sleep(seconds * self.delay_factor)
+
+    def system_prompt(self, call: Dict[str, Any]) -> str:
+        return self._systems.get(call["system"], "")
+
+    def calls(self) -> Iterator[Dict[str, Any]]:
+        for calls in self._calls.values():
+            yield from calls
+
+    def _count(self, outcome: str, model: str) -> None:
+        get_metrics().counter(
+            "llm_cassette_calls_total", "Appels au modèle enregistrés ou rejoués par la cassette",
+            ("outcome", "model")
+        ).inc(outcome=outcome, model=model)
+
+
+class CassetteMessages:
+    """API Messages du SDK (`create`, `stream`) passant par une cassette.
+
+    En enregistrement, les appels sont transmis à `messages` puis ajoutés à
+    la cassette ; au rejeu, les réponses enregistrées sont servies sans
+    connexion, sous la forme des objets du SDK utilisés par AnthropicClient.
+    """
+
+    def __init__(self, cassette: Cassette, messages: Any = None):
+        self.cassette = cassette
+        self.messages = messages
+
+    def create(self, model: str, max_tokens: int, system: str, messages: List[Dict]):
+        prompt = messages[0]["content"]
+        if self.cassette.replaying:
+            call = self.cassette.replay(system, prompt)
+            self.cassette.sleep(call["latency"])
+            text = call["text"] if "text" in call else "".join(call["chunks"])
+            return SimpleNamespace(
+                content=[SimpleNamespace(type="text", text=text)],
+                usage=SimpleNamespace(input_tokens=call["usage"][0], output_tokens=call["usage"][1]),
+                model=call["model"]
+            )
+
+        started_at = time.perf_counter()
+        message = self.messages.create(model=model, max_tokens=max_tokens, system=system, messages=messages)
+        latency = time.perf_counter() - started_at
+        text = "".join(block.text for block in message.content if block.type == "text")
+        self.cassette.record_call(model, max_tokens, system, prompt, message.usage, latency, text=text)
+        return message
+
+    @contextmanager
+    def stream(self, model: str, max_tokens: int, system: str, messages: List[Dict]):
+        prompt = messages[0]["content"]
+        if self.cassette.replaying:
+            call = self.cassette.replay(system, prompt)
+            chunks = call["chunks"] if "chunks" in call else [call["text"]]
+            first_chunk = call.get("first_chunk", call["latency"])
+            usage = SimpleNamespace(input_tokens=call["usage"][0], output_tokens=call["usage"][1])
+
+            def replayed() -> Iterator[str]:
+                # Premier fragment après le délai initial, les suivants au rythme enregistré
+                self.cassette.sleep(first_chunk)
+                interval = (call["latency"] - first_chunk) / max(1, len(chunks) - 1)
+                for index, chunk in enumerate(chunks):
+                    if index:
+                        self.cassette.sleep(interval)
+                    yield chunk
+
+            yield SimpleNamespace(text_stream=replayed(), get_final_message=lambda: SimpleNamespace(usage=usage))
+            return
+
+        started_at = time.perf_counter()
+        with self.messages.stream(model=model, max_tokens=max_tokens, system=system, messages=messages) as stream:
+            chunks: List[str] = []
+            timing = {}
+
+            def recorded() -> Iterator[str]:
+                for chunk in stream.text_stream:
+                    timing.setdefault("first_chunk", time.perf_counter() - started_at)
+                    chunks.append(chunk)
+                    yield chunk
+
+            def final_message():
+                message = stream.get_final_message()
+                self.cassette.record_call(
+                    model, max_tokens, system, prompt, message.usage, time.perf_counter() - started_at,
+                    chunks=chunks, first_chunk=timing.get("first_chunk")
+                )
+                return message
+
+            yield SimpleNamespace(text_stream=recorded(), get_final_message=final_message)
+
+
+def cassette_mode() -> Optional[str]:
+    """Mode configuré par LLM_CASSETTE_MODE (record ou replay), None si la cassette est désactivée."""
+    mode = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+    return None if mode in ("", "off") else mode
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """Cassette configurée par LLM_CASSETTE_MODE (off, record ou replay) et LLM_CASSETTE_PATH."""
+    mode = cassette_mode()
+    if mode is None:
+        return None
+    return Cassette(
+        os.getenv("LLM_CASSETTE_PATH", "cassettes/session.jsonl.gz"),
+        mode,
+        delay_factor=float(os.getenv("LLM_CASSETTE_DELAY_FACTOR", "0") or 0)
+    )
+
+
+def summarize(cassette: Cassette) -> Dict[str, Any]:
+    """Synthèse d'une cassette chargée : appels, tokens et latences par modèle."""
+    models: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for call in cassette.calls():
+        row = models[call["model"]]
+        row["calls"] += 1
+        row["streamed"] += "chunks" in call
+        row["input_tokens"] += call["usage"][0]
+        row["output_tokens"] += call["usage"][1]
+        row["latency"] += call["latency"]
+    return {
+        "files": cassette.files(),
+        "size_bytes": sum(os.path.getsize(path) for path in cassette.files()),
+        "requests": len({call["key"] for call in cassette.calls()}),
+        "runs": Counter(run["entry"] for run in cassette.runs),
+        "models": {model: dict(row) for model, row in models.items()}
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Synthèse d'une cassette d'appels au modèle")
+    parser.add_argument("path", help="Cassette (.jsonl.gz)")
+    parser.add_argument("--json", action="store_true", help="Synthèse au format JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = summarize(Cassette(args.path, REPLAY))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return 0
+    print(f"{args.path} : {summary['size_bytes'] / 1024:.1f} Ko, {len(summary['files'])} fichier(s)")
+    print(f"Requêtes distinctes : {summary['requests']}")
+    print("Exécutions : " + (", ".join(f"{entry} × {count}" for entry, count in summary["runs"].items()) or "aucune"))
+    print(f"{'modèle':<36}{'appels':>8}{'streaming':>11}{'entrée':>10}{'sortie':>10}{'latence (s)':>13}")
+    for model, row in sorted(summary["models"].items()):
+        print(
+            f"{model:<36}{row['calls']:>8.0f}{row['streamed']:>11.0f}{row['input_tokens']:>10.0f}"
+            f"{row['output_tokens']:>10.0f}{row['latency']:>13.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import sys
+from typing import Any
+
+
+def freeze(value: Any, previous: Any = None) -> Any:
+    """Représentation compacte d'un document JSON, partagée entre versions.
+
+    Les chaînes sont internées (noms de composants et de technologies
+    partagés entre versions et projets) et les listes deviennent des tuples.
+    Les sous-arbres identiques à ceux de `previous` (généralement la version
+    parente) sont repris tels quels : une page inchangée n'existe qu'une
+    fois en mémoire pour toutes les versions qui la contiennent.
+
+    Les dictionnaires restent des `dict` (sérialisation JSON, `spec_diff` et
+    validation pydantic sans conversion) : le document obtenu ne doit pas
+    être modifié, un sous-arbre partagé l'étant aussi pour toutes les autres
+    versions. `thaw` en fournit une copie modifiable.
+    """
+    if value is previous:
+        return previous
+    if isinstance(value, dict):
+        before = previous if isinstance(previous, dict) else {}
+        frozen = {sys.intern(key): freeze(item, before.get(key)) for key, item in value.items()}
+        if before is previous and len(frozen) == len(before) and all(
+            item is before.get(key) for key, item in frozen.items()
+        ):
+            return previous
+        return frozen
+    if isinstance(value, (list, tuple)):
+        before = previous if isinstance(previous, tuple) and len(previous) == len(value) else ()
+        frozen = tuple(
+            freeze(item, before[index] if before else None) for index, item in enumerate(value)
+        )
+        return previous if before and all(a is b for a, b in zip(frozen, before)) else frozen
+    if isinstance(value, str):
+        return sys.intern(value)
+    # Nombres et booléens égaux à ceux de la version précédente : même objet
+    return previous if type(previous) is type(value) and previous == value else value
+
+
+def thaw(value: Any) -> Any:
+    """Copie profonde et modifiable (dictionnaires et listes) d'un document figé par `freeze`.
+
+    Aucun conteneur n'est partagé avec le document figé.
+    """
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
@@ -1,9 +1,232 @@
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from pydantic import BaseModel
+
+from models.specifications import ModificationType, VersionedWebSpecification, VersionMetadata
+from utils.version_store import VersionStore
+
+# Projet de la tâche en cours : permet à plusieurs workflows concurrents
+# de partager un même ContextManager sans mélanger leurs versions
+_current_project: ContextVar[Optional[str]] = ContextVar("current_project", default=None)
+# Dépendances enregistrées par la tâche en cours (voir capture_dependencies)
+_captured_dependencies: ContextVar[Optional[List[int]]] = ContextVar("captured_dependencies", default=None)
+
+
 class ContextManager:
-    def __init__(self):
+    def __init__(
+        self,
+        project_id: str = "default",
+        store: Optional[VersionStore] = None,
+        db_path: Optional[str] = None
+    ):
         self.user_input = ""
-    
+        self.project_id = project_id
+        self.store = store or VersionStore(
+            db_path or os.getenv("CONTEXT_DB_PATH", "data/context.sqlite3")
+        )
+
     def set_user_input(self, input_text):
         self.user_input = input_text
-    
+
     def get_user_input(self):
         return self.user_input
+
+    def set_project(self, project_id: str) -> None:
+        """Change le projet auquel sont rattachées les nouvelles versions."""
+        self.project_id = project_id
+
+    @property
+    def current_project_id(self) -> str:
+        """Projet actif pour la tâche courante, ou projet par défaut du gestionnaire."""
+        return _current_project.get() or self.project_id
+
+    @contextmanager
+    def project_scope(self, project_id: str) -> Iterator[None]:
+        """Rattache au projet indiqué les versions créées dans le bloc (tâche ou thread courant)."""
+        token = _current_project.set(project_id)
+        try:
+            yield
+        finally:
+            _current_project.reset(token)
+
+    @contextmanager
+    def capture_dependencies(self) -> Iterator[List[int]]:
+        """Collecte les identifiants des dépendances enregistrées dans le bloc (tâche ou thread courant)."""
+        captured: List[int] = []
+        token = _captured_dependencies.set(captured)
+        try:
+            yield captured
+        finally:
+            _captured_dependencies.reset(token)
+
+    def store_specification_version(
+        self,
+        specification_data: Union[Dict[str, Any], BaseModel],
+        agent_name: str,
+        action_type: str,
+        parent_id: Optional[str] = None
+    ) -> str:
+        """Enregistre une version de spécification et retourne son identifiant.
+
+        Une version dérivée est rattachée au projet de sa version parente.
+        """
+        project_id = self.current_project_id
+        if parent_id is not None:
+            project_id = self.store.get_project_id(parent_id) or project_id
+        return self.store.add_version(
+            project_id=project_id,
+            data=specification_data,
+            agent_name=agent_name,
+            action_type=action_type,
+            parent_id=parent_id
+        )
+
+    def get_specification_version(self, version_id: str, frozen: bool = False) -> Optional[Dict[str, Any]]:
+        """Retourne une version stockée (métadonnées et données, figées et partagées si `frozen`)."""
+        return self.store.get_version(version_id, frozen=frozen)
+
+    def get_specification(self, version_id: str) -> Optional[VersionedWebSpecification]:
+        """Reconstruit une spécification versionnée à partir du stockage."""
+        # Données figées du cache, validées par pydantic sans copie intermédiaire
+        version = self.store.get_version(version_id, frozen=True)
+        if version is None:
+            return None
+        metadata = VersionMetadata(
+            version_id=version["version_id"],
+            parent_version_id=version["parent_id"],
+            agent_name=version["agent_name"],
+            modification_type=ModificationType(version["action_type"]),
+            timestamp=datetime.utcfromtimestamp(version["created_at"])
+        )
+        return VersionedWebSpecification(**version["data"], metadata=metadata)
+
+    def get_latest_version(
+        self,
+        project_id: Optional[str] = None,
+        action_type: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Retourne la dernière version du projet courant ou du projet indiqué."""
+        return self.store.get_latest_version(project_id or self.current_project_id, action_type)
+
+    def get_version_history(
+        self,
+        version_id: str,
+        max_depth: Optional[int] = None,
+        with_data: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Retourne l'ascendance d'une version, de la plus récente à la racine."""
+        return self.store.get_ancestry(version_id, max_depth, with_data)
+
+    def get_child_versions(self, version_id: str) -> List[Dict[str, Any]]:
+        """Retourne les versions dérivées d'une version."""
+        return self.store.get_children(version_id)
+
+    def list_versions(
+        self,
+        project_id: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        with_data: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Liste paginée des versions d'un projet, des plus récentes aux plus anciennes."""
+        return self.store.list_versions(
+            project_id or self.current_project_id, limit, offset, with_data=with_data
+        )
+
+    def record_submission(
+        self,
+        user_input: str,
+        specification_version_id: str,
+        evaluation: Optional[Dict[str, Any]] = None,
+        project_id: Optional[str] = None
+    ) -> str:
+        """Enregistre une soumission utilisateur et le résultat obtenu pour ce contexte."""
+        return self.store.add_version(
+            project_id=project_id or self.current_project_id,
+            data={
+                "user_input": user_input,
+                "specification_version_id": specification_version_id,
+                "evaluation": evaluation
+            },
+            agent_name="User",
+            action_type="submission"
+        )
+
+    def get_last_submission(self, project_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Retourne la dernière soumission enregistrée pour un projet."""
+        return self.store.get_latest_version(project_id or self.current_project_id, "submission")
+
+    def record_review(self, user_input: str, review: str, project_id: Optional[str] = None) -> str:
+        """Enregistre une évaluation rapide (sans agents) et son résultat Markdown."""
+        return self.store.add_version(
+            project_id=project_id or self.current_project_id,
+            data={"user_input": user_input, "review": review},
+            agent_name="User",
+            action_type="review"
+        )
+
+    def link_session(self, session_id: str, project_id: str, kind: str, title: Optional[str] = None) -> None:
+        """Rattache un projet à la session de l'interface qui l'a lancé."""
+        self.store.add_session_entry(session_id, project_id, kind, title)
+
+    def find_session_project(self, session_id: str, title: Optional[str], kinds: List[str]) -> Optional[str]:
+        """Projet de la session déjà soumis sous ce titre (None s'il n'y en a pas)."""
+        return self.store.find_session_project(session_id, title, kinds)
+
+    def list_session_history(self, session_id: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """Historique paginé d'une session, du plus récent au plus ancien."""
+        return self.store.list_session_entries(session_id, limit, offset)
+
+    def count_session_history(self, session_id: str) -> int:
+        return self.store.count_session_entries(session_id)
+
+    def get_version_project_id(self, version_id: str) -> Optional[str]:
+        """Projet auquel appartient une version (None si elle n'existe pas)."""
+        return self.store.get_project_id(version_id)
+
+    def get_session_entry(self, session_id: str, project_id: str) -> Optional[Dict[str, Any]]:
+        """Entrée d'historique d'une session (None si le projet n'appartient pas à la session)."""
+        return self.store.get_session_entry(session_id, project_id)
+
+    def register_agent_dependency(
+        self,
+        source_agent: str,
+        target_agent: str,
+        context_data: Dict[str, Any]
+    ) -> int:
+        """Enregistre une demande de traitement d'un agent vers un autre."""
+        project_id = self.current_project_id
+        source_version_id = context_data.get("source_version_id")
+        if source_version_id:
+            project_id = self.store.get_project_id(source_version_id) or project_id
+        dependency_id = self.store.add_dependency(project_id, source_agent, target_agent, context_data)
+        captured = _captured_dependencies.get()
+        if captured is not None:
+            captured.append(dependency_id)
+        return dependency_id
+
+    def get_agent_dependencies(self, target_agent: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Retourne les demandes destinées à un agent, par ordre de priorité."""
+        return self.store.get_dependencies(target_agent, limit)
+
+    def get_agent_dependency(self, dependency_id: int) -> Optional[Dict[str, Any]]:
+        """Retourne une demande enregistrée par son identifiant."""
+        return self.store.get_dependency(dependency_id)
+
+
+# Gestionnaire partagé par les agents du processus, créé au premier usage
+_context_manager: Optional[ContextManager] = None
+_context_manager_lock = threading.Lock()
+
+def get_context_manager() -> ContextManager:
+    """Fonction utilitaire pour obtenir le gestionnaire de contexte partagé."""
+    global _context_manager
+    with _context_manager_lock:
+        if _context_manager is None:
+            _context_manager = ContextManager()
+        return _context_manager
@@ -0,0 +1,21 @@
+import os
+import sqlite3
+from pathlib import Path
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Connexion SQLite partageable entre threads et entre processus.
+
+    Une base fichier passe en journal WAL (lectures concurrentes pendant une
+    écriture) ; un écrivain attend jusqu'à SQLITE_BUSY_TIMEOUT millisecondes
+    que le verrou d'un autre processus soit libéré au lieu d'échouer.
+    """
+    timeout = int(os.getenv("SQLITE_BUSY_TIMEOUT", "10000")) / 1000
+    if db_path != ":memory:":
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=False, timeout=timeout)
+    if db_path != ":memory:":
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Durable à chaque point de contrôle, suffisant en WAL et bien plus rapide que FULL
+        conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,324 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from utils.database import connect
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics
+
+# États d'un travail
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """Travail destiné à un agent, construit à partir d'un DependencyContext."""
+    job_id: int
+    root_id: int
+    project_id: str
+    target_agent: str
+    context_type: Optional[str]
+    source_version_id: Optional[str]
+    priority: int
+    status: str
+    attempts: int
+    data: Dict[str, Any]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+
+
+class JobQueue:
+    """File de travaux durable (SQLite) pour les demandes entre agents.
+
+    Un travail est réservé par un worker pour `visibility_timeout` secondes,
+    prolongées par `heartbeat` tant que le traitement se poursuit ; un
+    travail dont la réservation expire (worker arrêté brutalement) redevient
+    disponible. Un travail en échec est retenté avec un délai croissant
+    jusqu'à `max_attempts` tentatives. Les travaux identiques (même agent,
+    même demande, mêmes données) ne sont mis en file qu'une fois tant que le
+    premier n'est pas terminé. La réservation est atomique entre processus.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/jobs.sqlite3",
+        visibility_timeout: float = 300.0,
+        max_attempts: int = 3,
+        retry_delay: float = 5.0
+    ):
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.logger = get_logger("JobQueue")
+        self._lock = threading.Lock()
+
+        self._conn = connect(db_path)
+        self._conn.row_factory = sqlite3.Row
+        # Transactions explicites : la réservation d'un travail doit être atomique
+        self._conn.isolation_level = None
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                root_id INTEGER,
+                dependency_id INTEGER UNIQUE,
+                project_id TEXT NOT NULL,
+                target_agent TEXT NOT NULL,
+                context_type TEXT,
+                source_version_id TEXT,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                dedup_key TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                data TEXT NOT NULL,
+                result TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_claim
+                ON jobs (target_agent, status, priority, id);
+            CREATE INDEX IF NOT EXISTS idx_jobs_root ON jobs (root_id);
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedup
+                ON jobs (dedup_key) WHERE status IN ('pending', 'running');
+            """
+        )
+
+    @staticmethod
+    def dedup_key(target_agent: str, context: Dict[str, Any]) -> str:
+        """Clé identifiant un travail : agent, type de demande, version source et données."""
+        payload = json.dumps(
+            [target_agent, context.get("context_type"), context.get("source_version_id"), context.get("data")],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def enqueue(
+        self,
+        project_id: str,
+        target_agent: str,
+        context: Dict[str, Any],
+        root_id: Optional[int] = None,
+        dependency_id: Optional[int] = None
+    ) -> int:
+        """Met un travail en file et retourne son identifiant.
+
+        `context` a la forme d'un DependencyContext ; un travail identique en
+        attente ou en cours est retourné au lieu d'en créer un nouveau.
+        """
+        key = self.dedup_key(target_agent, context)
+        payload = json.dumps(context, ensure_ascii=False, default=str)
+        for _ in range(2):
+            now = time.time()
+            with self._lock:
+                # Insertion et rattachement à la racine dans une même transaction : aucun
+                # worker ne peut réserver le travail tant que `root_id` n'est pas renseigné
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO jobs (root_id, dependency_id, project_id, target_agent, context_type, "
+                        "source_version_id, priority, status, dedup_key, available_at, created_at, updated_at, data) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            root_id, dependency_id, project_id, target_agent, context.get("context_type"),
+                            context.get("source_version_id"), int(context.get("priority", 0)), PENDING, key,
+                            now, now, now, payload
+                        )
+                    )
+                    inserted = cursor.rowcount > 0
+                    if inserted:
+                        job_id = cursor.lastrowid
+                        if root_id is None:
+                            self._conn.execute("UPDATE jobs SET root_id = ? WHERE id = ?", (job_id, job_id))
+                    else:
+                        row = self._conn.execute(
+                            "SELECT id FROM jobs WHERE dependency_id = ? OR (dedup_key = ? AND status IN (?, ?)) "
+                            "ORDER BY id DESC LIMIT 1",
+                            (dependency_id, key, PENDING, RUNNING)
+                        ).fetchone()
+                        job_id = row["id"] if row is not None else None
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            if inserted:
+                self._count(target_agent, "enqueued")
+                return job_id
+            if job_id is not None:
+                self._count(target_agent, "deduplicated")
+                self.logger.debug("Travail identique déjà en file pour %s (travail %s)", target_agent, job_id)
+                return job_id
+            # Le doublon s'est terminé entre-temps : nouvelle tentative d'insertion
+        raise ValueError(f"Travail pour {target_agent} refusé par la file (données incomplètes)")
+
+    def enqueue_dependency(self, dependency: Dict[str, Any], root_id: Optional[int] = None) -> int:
+        """Met en file la demande enregistrée par `ContextManager.register_agent_dependency`."""
+        return self.enqueue(
+            project_id=dependency["project_id"],
+            target_agent=dependency["target_agent"],
+            context=dependency["context"],
+            root_id=root_id,
+            dependency_id=dependency["id"]
+        )
+
+    def claim(self, target_agent: str, worker_id: str) -> Optional[Job]:
+        """Réserve le travail le plus prioritaire disponible pour un agent."""
+        while True:
+            now = time.time()
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Travaux en attente, ou en cours dont la réservation a expiré
+                    row = self._conn.execute(
+                        "SELECT * FROM jobs WHERE target_agent = ? AND status IN (?, ?) AND available_at <= ? "
+                        "ORDER BY priority, id LIMIT 1",
+                        (target_agent, PENDING, RUNNING, now)
+                    ).fetchone()
+                    if row is None:
+                        self._conn.execute("COMMIT")
+                        return None
+                    expired = row["status"] == RUNNING
+                    if expired and row["attempts"] >= self.max_attempts:
+                        self._conn.execute(
+                            "UPDATE jobs SET status = ?, lease_owner = NULL, error = ?, updated_at = ? WHERE id = ?",
+                            (FAILED, "Délai de traitement dépassé", now, row["id"])
+                        )
+                        self._conn.execute("COMMIT")
+                        self._count(target_agent, "failed")
+                        continue
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, available_at = ?, lease_owner = ?, "
+                        "updated_at = ? WHERE id = ?",
+                        (RUNNING, now + self.visibility_timeout, worker_id, now, row["id"])
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            if expired:
+                self.logger.warning(f"Reprise du travail {row['id']} abandonné par {row['lease_owner']}")
+                self._count(target_agent, "recovered")
+            return self.get_job(row["id"])
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """Prolonge la réservation d'un travail ; False si elle a été perdue."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET available_at = ?, updated_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+                (now + self.visibility_timeout, now, job_id, RUNNING, worker_id)
+            )
+        return cursor.rowcount > 0
+
+    def complete(self, job_id: int, worker_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        """Marque un travail comme terminé ; False si la réservation avait été perdue."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, result = ?, error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (DONE, json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id, RUNNING, worker_id)
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """Enregistre l'échec d'un travail ; retourne True s'il sera retenté."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts, target_agent FROM jobs WHERE id = ? AND status = ? AND lease_owner = ?",
+                (job_id, RUNNING, worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+            retry = row["attempts"] < self.max_attempts
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_owner = NULL, error = ?, updated_at = ? "
+                "WHERE id = ?",
+                (
+                    PENDING if retry else FAILED,
+                    now + self.retry_delay * 2 ** (row["attempts"] - 1),
+                    error, now, job_id
+                )
+            )
+        self._count(row["target_agent"], "retried" if retry else "failed")
+        return retry
+
+    def get_job(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, root_id: int) -> List[Job]:
+        """Travaux d'un même traitement (travail initial et travaux qui en découlent)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE root_id = ? ORDER BY id", (root_id,)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """Nombre de travaux par état."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _count(target_agent: str, outcome: str) -> None:
+        get_metrics().counter(
+            "job_queue_jobs_total", "Travaux de la file par agent et issue", ("agent", "outcome")
+        ).inc(agent=target_agent, outcome=outcome)
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Job:
+        return Job(
+            job_id=row["id"],
+            root_id=row["root_id"],
+            project_id=row["project_id"],
+            target_agent=row["target_agent"],
+            context_type=row["context_type"],
+            source_version_id=row["source_version_id"],
+            priority=row["priority"],
+            status=row["status"],
+            attempts=row["attempts"],
+            data=json.loads(row["data"]).get("data", {}),
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"]
+        )
+
+
+# File partagée, créée au premier usage
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Fonction utilitaire pour obtenir la file de travaux partagée."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                db_path=os.getenv("JOB_QUEUE_PATH", "data/jobs.sqlite3"),
+                visibility_timeout=float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300")),
+                max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+            )
+        return _job_queue
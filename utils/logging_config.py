@@ -1,38 +1,181 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+from datetime import date, datetime
 from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+# Attributs standard d'un LogRecord (les autres sont des champs `extra`)
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class Payload:
+    """Contenu volumineux (prompt, réponse) formaté uniquement si l'enregistrement est émis.
+
+    S'utilise comme argument de journalisation : `logger.debug("Prompt : %s", Payload(prompt))`.
+    Le texte est tronqué à `max_chars` caractères.
+    """
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value: Union[str, Callable[[], Any]], max_chars: Optional[int] = None):
+        self.value = value
+        self.max_chars = max_chars if max_chars is not None else int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+
+    def __str__(self) -> str:
+        text = str(self.value() if callable(self.value) else self.value)
+        if self.max_chars and len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... [{len(text) - self.max_chars} caractères omis]"
+        return text
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Un objet JSON par ligne : horodatage, niveau, logger, message et champs `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RotatingLogFileHandler(logging.handlers.BaseRotatingHandler):
+    """Fichier de log avec rotation quotidienne et par taille.
+
+    Le fichier courant est archivé sous `<nom>.<date>[.<n>]` au changement de
+    jour ou lorsqu'il dépasse `max_bytes` ; seules les `backup_count` archives
+    les plus récentes sont conservées.
+    """
+
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0, encoding: str = "utf-8"):
+        super().__init__(filename, "a", encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        path = Path(self.baseFilename)
+        self.current_date = date.fromtimestamp(path.stat().st_mtime) if path.exists() else date.today()
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if date.today() != self.current_date:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            size = self.stream.tell()
+            return size > 0 and size + len(self.format(record)) + 1 > self.max_bytes
+        return False
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        base = Path(self.baseFilename)
+        if base.exists():
+            target = base.with_name(f"{base.name}.{self.current_date:%Y-%m-%d}")
+            index = 1
+            while target.exists():
+                target = base.with_name(f"{base.name}.{self.current_date:%Y-%m-%d}.{index}")
+                index += 1
+            self.rotate(str(base), str(target))
+        self.current_date = date.today()
+        if self.backup_count > 0:
+            archives = sorted(base.parent.glob(f"{base.name}.*"), key=lambda path: path.stat().st_mtime)
+            for archive in archives[:-self.backup_count]:
+                archive.unlink(missing_ok=True)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Met l'enregistrement en file sans le formater : le formatage a lieu dans le thread d'écriture.
+
+    `on_first_record` est appelé avant le premier enregistrement (démarrage différé des handlers).
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, on_first_record: Optional[Callable[[], None]] = None):
+        super().__init__(log_queue)
+        self.on_first_record = on_first_record
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.on_first_record is not None:
+            start, self.on_first_record = self.on_first_record, None
+            start()
+        super().enqueue(record)
+
 
 class AgentLogger:
+    """Journalisation non bloquante des agents.
+
+    Les appels de log ne font que déposer l'enregistrement dans une file ; un
+    thread d'écriture le formate puis l'écrit dans la console et dans un
+    fichier à rotation quotidienne et par taille (texte ou JSON lines).
+    Le dossier, les handlers et le thread ne sont créés qu'au premier
+    enregistrement émis : importer ce module n'a aucun effet de bord.
+    """
+
     def __init__(self):
-        # Création du dossier logs s'il n'existe pas
-        log_dir = Path("logs")
-        log_dir.mkdir(exist_ok=True)
-        
         # Configuration du logger principal
         self.logger = logging.getLogger("agent_workflow")
-        self.logger.setLevel(logging.DEBUG)
-        
+        self.logger.setLevel(os.getenv("LOG_LEVEL", "DEBUG").upper())
+        self.logger.propagate = False
+
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.logger.handlers = [_DeferredQueueHandler(self._queue, on_first_record=self.start)]
+
+    def start(self) -> None:
+        """Crée le dossier de logs et les handlers, puis démarre le thread d'écriture."""
+        if self.listener is not None:
+            return
+        # Création du dossier logs s'il n'existe pas
+        log_dir = Path(os.getenv("LOG_DIR", "logs"))
+        log_dir.mkdir(parents=True, exist_ok=True)
+
         # Formatter pour les logs
         formatter = logging.Formatter(
             "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
         )
-        
-        # Handler pour les fichiers de log quotidiens
-        daily_file = log_dir / f"agent_{datetime.now().strftime('%Y%m%d')}.log"
-        file_handler = logging.FileHandler(daily_file, encoding="utf-8")
+
+        # Handler pour le fichier de log, archivé chaque jour et au-delà de LOG_MAX_BYTES
+        file_handler = RotatingLogFileHandler(
+            str(log_dir / os.getenv("LOG_FILE", "agent.log")),
+            max_bytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+            backup_count=int(os.getenv("LOG_BACKUP_COUNT", "14"))
+        )
         file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(formatter)
-        
+        file_handler.setFormatter(
+            JsonLinesFormatter() if os.getenv("LOG_FORMAT", "text").lower() == "json" else formatter
+        )
+
         # Handler pour la console
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
+        console_handler.setLevel(os.getenv("LOG_CONSOLE_LEVEL", "INFO").upper())
         console_handler.setFormatter(formatter)
-        
-        # Ajout des handlers
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
-    
+
+        # Écriture déportée dans un thread dédié, alimenté par la file
+        self.listener = logging.handlers.QueueListener(
+            self._queue, file_handler, console_handler, respect_handler_level=True
+        )
+        self.listener.start()
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """Vide la file d'attente et arrête le thread d'écriture."""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
     def get_agent_logger(self, agent_name: str) -> logging.Logger:
         """Crée un logger spécifique pour un agent."""
         logger = self.logger.getChild(agent_name)
@@ -0,0 +1,264 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Bornes par défaut des histogrammes de durée (secondes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        unknown = set(labels) - set(self.label_names)
+        if unknown:
+            raise ValueError(f"Labels inconnus pour la métrique {self.name} : {', '.join(sorted(unknown))}")
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Compteur monotone, par combinaison de labels."""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {"labels": dict(zip(self.label_names, key)), "value": value}
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Gauge(Counter):
+    """Valeur instantanée (file d'attente, connexions...)."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Distribution de valeurs (durées, tailles) répartie en intervalles cumulatifs."""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][index] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Mesure la durée du bloc, y compris lorsqu'il se termine par une exception."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, dict(state, counts=list(state["counts"]))) for key, state in self._values.items())
+        lines = self._header()
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    "labels": dict(zip(self.label_names, key)),
+                    "count": state["count"],
+                    "sum": state["sum"],
+                    "mean": state["sum"] / state["count"] if state["count"] else 0.0,
+                    "buckets": {
+                        _format_value(bound): count for bound, count in zip(self.buckets, state["counts"])
+                    }
+                }
+                for key, state in sorted(self._values.items())
+            ]
+
+
+class MetricsRegistry:
+    """Registre en mémoire des métriques du processus.
+
+    Les métriques sont créées au premier usage (`counter`, `gauge`,
+    `histogram`) et exportées au format texte de Prometheus ou en JSON.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, description: str, label_names: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, description, label_names, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"La métrique {name} est déjà déclarée comme {metric.kind}")
+            return metric
+
+    def counter(self, name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, description, label_names)
+
+    def gauge(self, name: str, description: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, description, label_names)
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, description, label_names, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Export au format texte d'exposition de Prometheus."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        return {
+            metric.name: {"type": metric.kind, "help": metric.description, "values": metric.snapshot()}
+            for metric in metrics
+        }
+
+    def dump_json(self, path: Optional[str] = None) -> str:
+        """Export JSON de toutes les métriques, écrit dans `path` s'il est fourni."""
+        payload = json.dumps({"timestamp": time.time(), "metrics": self.snapshot()}, ensure_ascii=False, indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(payload)
+        return payload
+
+    def reset(self) -> None:
+        """Remet toutes les valeurs à zéro en conservant les métriques déclarées."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            with metric._lock:
+                metric._values.clear()
+
+
+# Registre partagé du processus
+_registry = MetricsRegistry()
+
+def get_metrics() -> MetricsRegistry:
+    """Fonction utilitaire pour obtenir le registre de métriques partagé."""
+    return _registry
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """Expose /metrics (Prometheus) et /metrics.json sur un port dédié (METRICS_PORT).
+
+    Retourne None si aucun port n'est configuré.
+    """
+    port = port if port is not None else int(os.getenv("METRICS_PORT") or 0)
+    if not port:
+        return None
+    registry = get_metrics()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/metrics.json":
+                body, content_type = registry.dump_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics
+
+HAIKU = "claude-3-haiku-20240307"
+HAIKU_3_5 = "claude-3-5-haiku-20241022"
+SONNET = "claude-3-5-sonnet-20241022"
+
+# Tarifs en dollars par million de tokens (entrée, sortie)
+MODEL_PRICES = {
+    HAIKU: (0.25, 1.25),
+    HAIKU_3_5: (0.80, 4.00),
+    SONNET: (3.00, 15.00),
+}
+
+# Étapes des appels au modèle
+WRITE = "write"
+UPDATE_SECTIONS = "update_sections"
+EVALUATE = "evaluate"
+EVALUATE_CRITERION = "evaluate_criterion"
+EVALUATE_SECTIONS = "evaluate_sections"
+OPTIMIZE = "optimize"
+OPTIMIZE_SECTIONS = "optimize_sections"
+# Analyse directe en streaming de l'interface (évaluation et version améliorée en une réponse)
+REVIEW = "review"
+
+
+@dataclass
+class RoutingRule:
+    """Règle de routage : la première règle dont toutes les conditions sont remplies s'applique."""
+    model: str
+    stages: Optional[List[str]] = None
+    max_input_tokens: Optional[int] = None
+    min_input_tokens: Optional[int] = None
+    min_score: Optional[float] = None
+    final: Optional[bool] = None
+
+    def matches(self, stage: str, input_tokens: int, score: Optional[float], final: bool) -> bool:
+        if self.stages is not None and stage not in self.stages:
+            return False
+        if self.max_input_tokens is not None and input_tokens > self.max_input_tokens:
+            return False
+        if self.min_input_tokens is not None and input_tokens < self.min_input_tokens:
+            return False
+        if self.final is not None and final != self.final:
+            return False
+        if self.min_score is not None and (score is None or score < self.min_score):
+            return False
+        return True
+
+
+@dataclass
+class RoutingPolicy:
+    name: str
+    rules: List[RoutingRule]
+    default_model: str = HAIKU
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RoutingPolicy":
+        return cls(
+            name=data.get("name", "custom"),
+            rules=[RoutingRule(**rule) for rule in data.get("rules", [])],
+            default_model=data.get("default_model", HAIKU)
+        )
+
+
+# Politiques prédéfinies (MODEL_ROUTING_POLICY)
+ROUTING_POLICIES = {
+    # Modèle rapide pour tous les appels
+    "economy": RoutingPolicy("economy", [], default_model=HAIKU),
+    # Modèle rapide pour les évaluations et les pages isolées, modèle plus
+    # puissant pour les grandes rédactions et la dernière optimisation
+    "balanced": RoutingPolicy("balanced", [
+        RoutingRule(HAIKU, stages=[EVALUATE, EVALUATE_CRITERION, EVALUATE_SECTIONS]),
+        RoutingRule(SONNET, stages=[OPTIMIZE_SECTIONS], final=True),
+        RoutingRule(HAIKU, stages=[UPDATE_SECTIONS, OPTIMIZE_SECTIONS]),
+        RoutingRule(HAIKU_3_5, stages=[WRITE], min_input_tokens=3000),
+        RoutingRule(SONNET, stages=[OPTIMIZE], final=True),
+        RoutingRule(SONNET, stages=[OPTIMIZE], min_score=0.8),
+        RoutingRule(HAIKU_3_5, stages=[REVIEW], max_input_tokens=500),
+        RoutingRule(SONNET, stages=[REVIEW]),
+    ], default_model=HAIKU),
+    # Modèle le plus capable, sauf pour les évaluations
+    "quality": RoutingPolicy("quality", [
+        RoutingRule(HAIKU_3_5, stages=[EVALUATE, EVALUATE_CRITERION, EVALUATE_SECTIONS]),
+    ], default_model=SONNET),
+}
+
+
+@dataclass
+class RouteStats:
+    """Latence, tokens et coût cumulés d'une route (étape, modèle)."""
+    stage: str
+    model: str
+    calls: int = 0
+    total_latency: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+
+    @property
+    def average_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0.0
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Coût en dollars d'un appel (0 pour un modèle sans tarif connu)."""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class ModelRouter:
+    """Choisit le modèle de chaque appel selon l'étape, la taille du prompt et le score courant.
+
+    Les appels effectués sont enregistrés par route (étape, modèle) avec leur
+    latence, leurs tokens et leur coût afin d'ajuster les politiques.
+    """
+
+    def __init__(self, policy: Optional[RoutingPolicy] = None):
+        self.policy = policy or ROUTING_POLICIES["balanced"]
+        self._stats: Dict[Tuple[str, str], RouteStats] = {}
+        self._lock = threading.Lock()
+        self.logger = get_logger("ModelRouter")
+
+    def select(
+        self,
+        stage: str,
+        input_tokens: int,
+        score: Optional[float] = None,
+        final: bool = False
+    ) -> str:
+        for rule in self.policy.rules:
+            if rule.matches(stage, input_tokens, score, final):
+                return rule.model
+        return self.policy.default_model
+
+    def record(self, stage: str, model: str, latency: float, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            stats = self._stats.setdefault((stage, model), RouteStats(stage=stage, model=model))
+            stats.calls += 1
+            stats.total_latency += latency
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.cost += estimate_cost(model, input_tokens, output_tokens)
+        metrics = get_metrics()
+        metrics.histogram(
+            "llm_request_duration_seconds", "Durée des appels au modèle (attente du limiteur comprise)",
+            ("stage", "model")
+        ).observe(latency, stage=stage, model=model)
+        tokens = metrics.counter("llm_tokens_total", "Tokens consommés", ("stage", "model", "direction"))
+        tokens.inc(input_tokens, stage=stage, model=model, direction="input")
+        tokens.inc(output_tokens, stage=stage, model=model, direction="output")
+        metrics.counter(
+            "llm_cost_dollars_total", "Coût estimé des appels au modèle", ("stage", "model")
+        ).inc(estimate_cost(model, input_tokens, output_tokens), stage=stage, model=model)
+        self.logger.debug(
+            "Route %s → %s : %.2fs, %d + %d tokens", stage, model, latency, input_tokens, output_tokens,
+            extra={
+                "stage": stage, "model": model, "latency": latency,
+                "input_tokens": input_tokens, "output_tokens": output_tokens
+            }
+        )
+
+    def stats(self) -> List[Dict]:
+        """Statistiques par route, triées par coût décroissant."""
+        with self._lock:
+            routes = sorted(self._stats.values(), key=lambda route: route.cost, reverse=True)
+            return [
+                {**asdict(route), "average_latency": route.average_latency}
+                for route in routes
+            ]
+
+
+def load_policy(name: Optional[str] = None, config_path: Optional[str] = None) -> RoutingPolicy:
+    """Politique nommée, ou politique personnalisée lue depuis un fichier JSON."""
+    if config_path:
+        with open(config_path, encoding="utf-8") as f:
+            return RoutingPolicy.from_dict(json.load(f))
+    if name not in ROUTING_POLICIES:
+        raise ValueError(f"Politique de routage inconnue : {name}")
+    return ROUTING_POLICIES[name]
+
+
+# Routeur partagé, créé au premier usage
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+def get_model_router() -> ModelRouter:
+    """Fonction utilitaire pour obtenir le routeur de modèles partagé."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter(load_policy(
+                os.getenv("MODEL_ROUTING_POLICY", "balanced"),
+                os.getenv("MODEL_ROUTING_CONFIG") or None
+            ))
+        return _router
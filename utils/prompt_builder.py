@@ -0,0 +1,198 @@
+import json
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional, Tuple
+
+# Budget de tokens par défaut des prompts de chaque agent (surchargeable via PROMPT_BUDGET_<AGENT>)
+DEFAULT_PROMPT_BUDGETS = {
+    "SpecificationWriter": 6000,
+    "Evaluator": 8000,
+    "Optimizer": 10000
+}
+
+# Nombre moyen de caractères par token pour du texte français ou du JSON
+CHARS_PER_TOKEN = 3.5
+
+# Phrases d'un contexte (jusqu'à la ponctuation finale incluse)
+_SENTENCE = re.compile(r"[^.;!?]+[.;!?]*")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation rapide du nombre de tokens d'un texte, sans appel au tokenizer."""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def _prune(value: Any) -> Any:
+    """Supprime récursivement les valeurs nulles et les collections vides."""
+    if isinstance(value, dict):
+        pruned = {key: _prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_prune(item) for item in value if item not in (None, "", [], {})]
+    return value
+
+
+def compact_json(data: Any) -> str:
+    """Sérialisation JSON compacte pour les prompts : sans indentation ni champs vides."""
+    return json.dumps(_prune(data), ensure_ascii=False, separators=(",", ":"))
+
+
+def compact_list(items: List[str]) -> str:
+    """Liste à puces, un élément par ligne (réductible ligne à ligne par le PromptBuilder)."""
+    return "\n".join(f"- {item}" for item in items or [])
+
+
+def compact_text(text: str) -> str:
+    """Supprime l'indentation et les lignes vides consécutives d'un bloc de texte."""
+    lines = []
+    for line in (text or "").strip().splitlines():
+        line = line.strip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def _leaves(value: Any, path: str = "") -> Iterator[Tuple[str, str]]:
+    """Chaînes d'un document JSON avec leur chemin (`pages.accueil.description`, `features[2]`)."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _leaves(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _leaves(item, f"{path}[{index}]")
+    elif isinstance(value, str):
+        yield path, value
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def context_section(context: str, specification: Any, min_chars: int = 24) -> str:
+    """Section « contexte initial » d'un prompt qui accompagne une spécification.
+
+    Les phrases du contexte reprises mot pour mot dans la spécification
+    (description, exigences recopiées) ne sont envoyées qu'une fois : elles
+    sont remplacées par une référence à la section qui les contient.
+    """
+    leaves = [(path, _normalize(text)) for path, text in _leaves(specification) if len(text) >= min_chars]
+    lines = []
+    referenced = False
+    for line in compact_text(context).splitlines():
+        # Libellé court conservé tel quel (« Description : ... »)
+        label, separator, body = line.partition(": ")
+        if not separator or len(label) > 30:
+            label, separator, body = "", "", line
+        parts: List[str] = []
+        for sentence in _SENTENCE.findall(body):
+            normalized = _normalize(sentence).rstrip(".;!? ")
+            path = next(
+                (path for path, text in leaves if normalized in text), None
+            ) if len(normalized) >= min_chars else None
+            if path is None:
+                parts.append(sentence.strip())
+            else:
+                reference = f"[voir {path}]"
+                if not parts or parts[-1] != reference:
+                    parts.append(reference)
+                referenced = True
+        lines.append(f"{label}{separator}{' '.join(part for part in parts if part)}")
+    header = "Contexte initial du projet"
+    if referenced:
+        header += " ([voir <section>] : passage repris tel quel dans la section indiquée de la spécification)"
+    return f"{header} :\n" + "\n".join(lines)
+
+
+def unique_items(*groups: List[str]) -> List[List[str]]:
+    """Retire des listes de feedback les éléments déjà présents dans une liste précédente."""
+    seen = set()
+    result = []
+    for items in groups:
+        kept = []
+        for item in items or []:
+            key = _normalize(item)
+            if key and key not in seen:
+                seen.add(key)
+                kept.append(item)
+        result.append(kept)
+    return result
+
+
+def get_prompt_budget(agent_name: str) -> Optional[int]:
+    """Retourne le budget de tokens configuré pour un agent (None = illimité)."""
+    value = os.getenv(f"PROMPT_BUDGET_{agent_name.upper()}")
+    if value is not None:
+        return int(value) if value else None
+    return DEFAULT_PROMPT_BUDGETS.get(agent_name)
+
+
+@dataclass
+class _Section:
+    text: str
+    trim_priority: Optional[int]
+
+
+class PromptBuilder:
+    """Assemble un prompt compact par sections en respectant un budget de tokens.
+
+    Les sections réductibles (`trim_priority` renseigné) sont raccourcies par
+    ordre de priorité croissante lorsque le budget est dépassé : le contexte
+    le plus ancien (priorité 0) est réduit en premier. Une section réduite
+    conserve ses premières lignes et indique le nombre de lignes omises.
+    """
+
+    def __init__(self, budget_tokens: Optional[int] = None):
+        self.budget_tokens = budget_tokens
+        self.sections: List[_Section] = []
+
+    def add(self, text: str, trim_priority: Optional[int] = None) -> "PromptBuilder":
+        self.sections.append(_Section(compact_text(text), trim_priority))
+        return self
+
+    def estimate_tokens(self) -> int:
+        return estimate_tokens(self._join(section.text for section in self.sections))
+
+    def build(self) -> str:
+        texts = [section.text for section in self.sections]
+        if self.budget_tokens is not None:
+            trimmable = sorted(
+                (index for index, section in enumerate(self.sections) if section.trim_priority is not None),
+                key=lambda index: self.sections[index].trim_priority
+            )
+            for index in trimmable:
+                excess = estimate_tokens(self._join(texts)) - self.budget_tokens
+                if excess <= 0:
+                    break
+                texts[index] = self._shorten(texts[index], excess)
+        return self._join(texts)
+
+    @staticmethod
+    def _join(texts) -> str:
+        return "\n\n".join(text for text in texts if text)
+
+    @staticmethod
+    def _shorten(text: str, excess_tokens: int) -> str:
+        """Retire des lignes en fin de section jusqu'à résorber le dépassement.
+
+        La première ligne (titre de la section) est toujours conservée.
+        """
+        lines = text.splitlines()
+        header, body = lines[:1], lines[1:]
+        max_chars = len(text) - int(excess_tokens * CHARS_PER_TOKEN) - sum(len(line) + 1 for line in header)
+        kept: List[str] = []
+        size = 0
+        for line in body:
+            if size + len(line) + 1 > max_chars:
+                break
+            kept.append(line)
+            size += len(line) + 1
+        omitted = len(body) - len(kept)
+        if not kept and body and max_chars > 0:
+            # La première ligne dépasse à elle seule le budget : troncature au caractère
+            kept = [body[0][:max_chars] + " [...]"]
+            omitted -= 1
+        if omitted > 0:
+            kept.append(f"[... {omitted} ligne(s) omise(s)]")
+        return "\n".join(header + kept)
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+from utils.cassette import cassette_mode
+from utils.database import connect
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics
+
+
+class ResponseCache:
+    """Cache persistant des réponses du modèle, adressé par le contenu de la requête.
+
+    La clé est un hash SHA-256 de (modèle, prompt système, prompt normalisé).
+    Les entrées sont stockées dans une base SQLite afin de survivre aux
+    redémarrages, et sont évincées par ancienneté (TTL) puis par usage (LRU)
+    lorsque le nombre maximal d'entrées est dépassé. Désactivé (`enabled`
+    faux), le cache ne sert ni n'enregistre aucune réponse.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "cache/responses.sqlite3",
+        max_entries: int = 1000,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        enabled: bool = True
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.logger = get_logger("ResponseCache")
+        self._lock = threading.Lock()
+
+        self._conn = connect(db_path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Normalise un prompt (indentation, espaces de fin de ligne, lignes vides externes)."""
+        return "\n".join(line.strip() for line in (prompt or "").strip().splitlines())
+
+    def make_key(self, model: str, system_prompt: str, prompt: str) -> str:
+        """Calcule la clé de cache d'une requête."""
+        payload = json.dumps(
+            [str(model), self.normalize_prompt(system_prompt), self.normalize_prompt(prompt)],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Retourne la réponse associée à la clé, ou None si absente ou expirée."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._is_expired(row[1], now):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                self._count("miss")
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            self._count("hit")
+            return row[0]
+
+    @staticmethod
+    def _count(result: str) -> None:
+        get_metrics().counter(
+            "response_cache_requests_total", "Consultations du cache de réponses", ("result",)
+        ).inc(result=result)
+
+    def set(self, key: str, response: str, model: str = "") -> None:
+        """Enregistre une réponse puis applique la politique d'éviction."""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, str(model), response, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def invalidate(self, model: str, system_prompt: str, prompt: str) -> None:
+        """Supprime l'entrée correspondant à une requête (ex: réponse inexploitable)."""
+        key = self.make_key(model, system_prompt, prompt)
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def get_or_compute(
+        self,
+        model: str,
+        system_prompt: str,
+        prompt: str,
+        compute: Callable[[], str]
+    ) -> str:
+        """Retourne la réponse en cache ou l'obtient via `compute` et la met en cache."""
+        key = self.make_key(model, system_prompt, prompt)
+        cached = self.get(key)
+        if cached is not None:
+            self.logger.debug("Réponse servie depuis le cache (%.12s)", key)
+            return cached
+        response = compute()
+        self.set(key, response, model=model)
+        return response
+
+    def stream_or_compute(
+        self,
+        model: str,
+        system_prompt: str,
+        prompt: str,
+        stream: Callable[[], Iterator[str]]
+    ) -> Iterator[str]:
+        """Variante en streaming de `get_or_compute`.
+
+        Une réponse en cache est produite d'un seul bloc ; sinon les fragments
+        sont relayés au fil de l'eau et la réponse n'est mise en cache qu'une
+        fois le flux terminé sans erreur.
+        """
+        key = self.make_key(model, system_prompt, prompt)
+        cached = self.get(key)
+        if cached is not None:
+            self.logger.debug("Réponse servie depuis le cache (%.12s)", key)
+            yield cached
+            return
+        chunks = []
+        for chunk in stream():
+            chunks.append(chunk)
+            yield chunk
+        self.set(key, "".join(chunks), model=model)
+
+    def clear(self) -> None:
+        """Vide le cache et remet les compteurs à zéro."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne les compteurs du cache."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _evict(self, now: float) -> None:
+        # Suppression des entrées expirées
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+        # Suppression des entrées les moins récemment utilisées au-delà de la taille maximale
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+
+# Instance partagée du cache, créée au premier usage
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Fonction utilitaire pour obtenir le cache de réponses partagé."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            ttl = os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600))
+            enabled = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() not in ("0", "false", "off")
+            _response_cache = ResponseCache(
+                db_path=os.getenv("RESPONSE_CACHE_PATH", "cache/responses.sqlite3"),
+                max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+                ttl_seconds=float(ttl) if ttl else None,
+                # Avec une cassette, chaque réponse du modèle doit y être enregistrée ou en être rejouée
+                enabled=enabled and cassette_mode() is None
+            )
+        return _response_cache
@@ -0,0 +1,86 @@
+import re
+import time
+from typing import Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from utils.metrics import get_metrics
+
+T = TypeVar("T", bound=BaseModel)
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*\n(.*?)```", re.DOTALL)
+# Seuls caractères significatifs pour repérer la fin de l'objet JSON
+_STRUCTURAL = re.compile(r'[{}"\\]')
+
+
+def extract_json(text: str) -> str:
+    """Extrait l'objet JSON d'une réponse du modèle.
+
+    Tolère un bloc de code Markdown (```json ... ```) ou du texte avant/après
+    l'objet : le premier objet `{...}` équilibré (hors chaînes) est retourné.
+    """
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("Aucun objet JSON trouvé dans la réponse")
+
+    depth = 0
+    in_string = False
+    escaped_at = -1
+    for match in _STRUCTURAL.finditer(text, start):
+        char, index = match.group(), match.start()
+        if in_string:
+            if char == "\\" and escaped_at != index:
+                escaped_at = index + 1
+            elif char == '"' and escaped_at != index:
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    raise ValueError("Objet JSON incomplet dans la réponse")
+
+
+def _is_syntax_error(error: ValidationError) -> bool:
+    return any(detail["type"] == "json_invalid" for detail in error.errors())
+
+
+def parse_response(text: str, model: Type[T]) -> T:
+    """Valide une réponse du modèle en une seule passe, directement depuis le texte brut.
+
+    Le texte compris entre la première accolade ouvrante et la dernière
+    accolade fermante est validé directement (les balises de code et le texte
+    d'introduction sont ainsi ignorés) ; l'extraction équilibrée n'est
+    utilisée qu'en cas d'échec de l'analyse JSON (accolades dans le texte
+    entourant l'objet, par exemple). La durée de validation est mesurée.
+    """
+    started_at = time.perf_counter()
+    outcome = "error"
+    try:
+        result = _validate(text, model)
+        outcome = "success"
+        return result
+    finally:
+        get_metrics().histogram(
+            "response_validation_seconds", "Durée d'analyse et de validation des réponses",
+            ("model", "outcome")
+        ).observe(time.perf_counter() - started_at, model=model.__name__, outcome=outcome)
+
+
+def _validate(text: str, model: Type[T]) -> T:
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("Aucun objet JSON trouvé dans la réponse")
+    try:
+        return model.model_validate_json(text[start:end + 1])
+    except ValidationError as e:
+        if not _is_syntax_error(e):
+            raise
+    return model.model_validate_json(extract_json(text))
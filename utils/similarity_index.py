@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+from utils.database import connect
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics
+
+# Nombre premier de Mersenne (2^61 - 1) des permutations MinHash
+_PRIME = (1 << 61) - 1
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class SimilarMatch:
+    """Entrée indexée la plus proche d'un texte, avec sa similarité estimée (Jaccard)."""
+    entry_id: str
+    similarity: float
+    payload: Dict[str, Any]
+
+
+class SimilarityIndex:
+    """Index local de quasi-doublons par MinHash sur des shingles de mots.
+
+    Les textes sont normalisés (casse, accents, chiffres remplacés par `#`,
+    pour que deux briefs ne différant que par leurs dates ou leurs nombres
+    soient identiques), découpés en suites de `shingle_size` mots, puis
+    résumés par une signature MinHash. Les candidats sont retrouvés par LSH
+    (signature découpée en `bands` bandes) et départagés par la similarité
+    estimée. Les signatures sont persistées dans une base SQLite partagée :
+    les entrées ajoutées par d'autres processus sont chargées avant chaque
+    recherche.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "cache/similarity.sqlite3",
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        max_entries: int = 5000
+    ):
+        if num_perm % bands:
+            raise ValueError("Le nombre de permutations doit être un multiple du nombre de bandes")
+        self.db_path = db_path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.logger = get_logger("SimilarityIndex")
+        self._lock = threading.Lock()
+        # Permutations (a, b) déterministes : les signatures restent comparables entre processus
+        self._permutations = [
+            (
+                int.from_bytes(hashlib.blake2b(f"a{index}".encode(), digest_size=8).digest(), "big") % (_PRIME - 1) + 1,
+                int.from_bytes(hashlib.blake2b(f"b{index}".encode(), digest_size=8).digest(), "big") % _PRIME
+            )
+            for index in range(num_perm)
+        ]
+        self._signatures: Dict[str, List[int]] = {}
+        self._buckets: Dict[tuple, Set[str]] = {}
+        # Dernière ligne de la base chargée en mémoire
+        self._synced_rowid = 0
+
+        self._conn = connect(db_path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                entry_id TEXT PRIMARY KEY,
+                signature TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        with self._lock:
+            self._sync()
+
+    @staticmethod
+    def normalize(text: str) -> List[str]:
+        """Mots du texte en minuscules, sans accents, chiffres remplacés par `#`."""
+        text = unicodedata.normalize("NFKD", (text or "").lower())
+        text = "".join(char for char in text if not unicodedata.combining(char))
+        return [re.sub(r"\d", "#", word) for word in _WORD.findall(text)]
+
+    def shingles(self, text: str) -> Set[str]:
+        words = self.normalize(text)
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[index:index + self.shingle_size]) for index in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> List[int]:
+        """Signature MinHash du texte (liste vide pour un texte sans mots)."""
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+            for shingle in self.shingles(text)
+        ]
+        if not hashes:
+            return []
+        return [min((a * value + b) % _PRIME for value in hashes) for a, b in self._permutations]
+
+    @staticmethod
+    def similarity(left: List[int], right: List[int]) -> float:
+        """Similarité de Jaccard estimée à partir de deux signatures."""
+        if not left or not right:
+            return 0.0
+        return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+    def _band_keys(self, signature: List[int]) -> List[tuple]:
+        return [
+            (band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def _insert(self, entry_id: str, signature: List[int]) -> None:
+        self._signatures[entry_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(entry_id)
+
+    def _remove(self, entry_id: str) -> None:
+        signature = self._signatures.pop(entry_id, None)
+        if signature is None:
+            return
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _sync(self) -> None:
+        # Un remplacement (INSERT OR REPLACE) crée une nouvelle ligne : il est chargé comme un ajout
+        rows = self._conn.execute(
+            "SELECT rowid, entry_id, signature FROM entries WHERE rowid > ? ORDER BY rowid",
+            (self._synced_rowid,)
+        ).fetchall()
+        for rowid, entry_id, signature in rows:
+            self._remove(entry_id)
+            self._insert(entry_id, json.loads(signature))
+            self._synced_rowid = rowid
+
+    def add(self, entry_id: str, text: str, payload: Dict[str, Any]) -> None:
+        """Indexe un texte ; `payload` est retourné avec les correspondances."""
+        signature = self.signature(text)
+        if not signature:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (entry_id, signature, payload, created_at) VALUES (?, ?, ?, ?)",
+                (entry_id, json.dumps(signature), json.dumps(payload, ensure_ascii=False, default=str), time.time())
+            )
+            self._conn.commit()
+            self._sync()
+            self._evict()
+
+    def find(
+        self,
+        text: str,
+        threshold: float = 0.6,
+        exclude: Optional[Set[str]] = None
+    ) -> Optional[SimilarMatch]:
+        """Entrée la plus similaire au texte, si sa similarité atteint `threshold`."""
+        signature = self.signature(text)
+        if not signature:
+            return None
+        exclude = exclude or set()
+        with self._lock:
+            self._sync()
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates |= self._buckets.get(key, set())
+            scored = sorted(
+                (
+                    (self.similarity(signature, self._signatures[entry_id]), entry_id)
+                    for entry_id in candidates - exclude
+                ),
+                reverse=True
+            )
+            for similarity, entry_id in scored:
+                if similarity < threshold:
+                    break
+                row = self._conn.execute("SELECT payload FROM entries WHERE entry_id = ?", (entry_id,)).fetchone()
+                if row is None:
+                    # Entrée évincée par un autre processus
+                    self._remove(entry_id)
+                    continue
+                self._count("hit")
+                self.logger.debug("Entrée similaire %s (similarité %.2f)", entry_id, similarity)
+                return SimilarMatch(entry_id=entry_id, similarity=similarity, payload=json.loads(row[0]))
+        self._count("miss")
+        return None
+
+    @staticmethod
+    def _count(result: str) -> None:
+        get_metrics().counter(
+            "similarity_index_lookups_total", "Recherches de quasi-doublons", ("result",)
+        ).inc(result=result)
+
+    def remove(self, entry_id: str) -> None:
+        with self._lock:
+            self._remove(entry_id)
+            self._conn.execute("DELETE FROM entries WHERE entry_id = ?", (entry_id,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self) -> None:
+        # Suppression des entrées les plus anciennes au-delà de la taille maximale
+        overflow = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            rows = self._conn.execute(
+                "SELECT entry_id FROM entries ORDER BY created_at ASC LIMIT ?", (overflow,)
+            ).fetchall()
+            for (entry_id,) in rows:
+                self._remove(entry_id)
+                self._conn.execute("DELETE FROM entries WHERE entry_id = ?", (entry_id,))
+            self._conn.commit()
+
+
+# Index partagé, créé au premier usage
+_similarity_index: Optional[SimilarityIndex] = None
+_similarity_index_lock = threading.Lock()
+
+def get_similarity_index() -> SimilarityIndex:
+    """Fonction utilitaire pour obtenir l'index de similarité partagé."""
+    global _similarity_index
+    with _similarity_index_lock:
+        if _similarity_index is None:
+            _similarity_index = SimilarityIndex(
+                db_path=os.getenv("SIMILARITY_INDEX_PATH", "cache/similarity.sqlite3"),
+                max_entries=int(os.getenv("SIMILARITY_INDEX_MAX_ENTRIES", "5000"))
+            )
+        return _similarity_index
@@ -0,0 +1,125 @@
+import copy
+from typing import Any, Callable, Dict, List
+
+# Marqueur d'absence de valeur, distinct de None qui est une valeur JSON valide
+_MISSING = object()
+
+
+def _escape(token: str) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _split_path(path: str) -> List[str]:
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise ValueError(f"Chemin JSON Pointer invalide : {path}")
+    return [_unescape(token) for token in path[1:].split("/")]
+
+
+def resolve(document: Any, path: str, default: Any = None) -> Any:
+    """Valeur désignée par un chemin JSON Pointer, ou `default` si elle n'existe pas."""
+    value = document
+    for token in _split_path(path):
+        try:
+            value = value[int(token)] if isinstance(value, (list, tuple)) else value[token]
+        except (KeyError, IndexError, ValueError, TypeError):
+            return default
+    return value
+
+
+def diff(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """Calcule la liste d'opérations (style JSON Patch) transformant `old` en `new`.
+
+    Les dictionnaires sont comparés clé par clé ; les listes et les valeurs
+    scalaires modifiées sont remplacées en bloc, les listes d'une
+    spécification (composants, technologies...) étant courtes.
+    """
+    if old is new:
+        # Sous-arbre partagé entre deux versions : inchangé par construction
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[Dict[str, Any]] = []
+        for key, old_value in old.items():
+            child_path = f"{path}/{_escape(key)}"
+            new_value = new.get(key, _MISSING)
+            if new_value is _MISSING:
+                ops.append({"op": "remove", "path": child_path})
+            else:
+                ops.extend(diff(old_value, new_value, child_path))
+        for key, new_value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": new_value})
+        return ops
+    if type(old) is type(new) and old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_patch(document: Any, ops: List[Dict[str, Any]], in_place: bool = False) -> Any:
+    """Applique une liste d'opérations produite par `diff` et retourne le document obtenu."""
+    result = document if in_place else copy.deepcopy(document)
+    for op in ops:
+        tokens = _split_path(op["path"])
+        if not tokens:
+            if op["op"] == "remove":
+                raise ValueError("Impossible de supprimer la racine du document")
+            result = copy.deepcopy(op["value"])
+            continue
+
+        parent = result
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            last = int(last)
+
+        if op["op"] == "remove":
+            del parent[last]
+        elif op["op"] in ("add", "replace"):
+            parent[last] = copy.deepcopy(op["value"])
+        else:
+            raise ValueError(f"Opération de patch inconnue : {op['op']}")
+    return result
+
+
+def apply_patch_shared(
+    document: Any,
+    ops: List[Dict[str, Any]],
+    value_factory: Callable[[Any], Any] = copy.deepcopy
+) -> Any:
+    """Applique un patch sans modifier ni copier entièrement `document`.
+
+    Seuls les conteneurs situés sur le chemin d'une opération sont copiés
+    (les tuples restent des tuples) ; le reste du document obtenu est
+    partagé avec `document`, qui ne doit donc plus être modifié. Les
+    valeurs insérées passent par `value_factory`.
+    """
+    result = document
+    for op in ops:
+        if op["op"] not in ("add", "replace", "remove"):
+            raise ValueError(f"Opération de patch inconnue : {op['op']}")
+        tokens = _split_path(op["path"])
+        if not tokens:
+            if op["op"] == "remove":
+                raise ValueError("Impossible de supprimer la racine du document")
+            result = value_factory(op["value"])
+        else:
+            result = _set_shared(result, tokens, op, value_factory)
+    return result
+
+
+def _set_shared(container: Any, tokens: List[str], op: Dict[str, Any], value_factory: Callable[[Any], Any]) -> Any:
+    copied = dict(container) if isinstance(container, dict) else list(container)
+    key = tokens[0] if isinstance(container, dict) else int(tokens[0])
+    if len(tokens) > 1:
+        copied[key] = _set_shared(copied[key], tokens[1:], op, value_factory)
+    elif op["op"] == "remove":
+        del copied[key]
+    else:
+        copied[key] = value_factory(op["value"])
+    return tuple(copied) if isinstance(container, tuple) else copied
@@ -0,0 +1,488 @@
+import argparse
+import html
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from utils.context_manager import ContextManager, get_context_manager
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics
+
+# Format d'export -> extension du fichier produit
+FORMATS = {
+    "markdown": ".md",
+    "html": ".html",
+    "print": ".html",
+    "json": ".json",
+    "yaml": ".yaml"
+}
+
+# Types d'action correspondant à une version de spécification (les évaluations
+# et soumissions sont stockées comme des versions dérivées d'un autre type)
+SPECIFICATION_ACTIONS = ("creation", "update", "optimization")
+
+# Identifiant de version : uuid, avec ou sans tirets
+_VERSION_ID = re.compile(r"[0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def check_version_id(version_id: str) -> str:
+    """Vérifie la forme d'un identifiant de version, avant tout usage dans un chemin de fichier."""
+    if not isinstance(version_id, str) or not _VERSION_ID.fullmatch(version_id):
+        raise ValueError(f"Identifiant de version invalide : {version_id!r}")
+    return version_id
+
+_CRITERIA_LABELS = {
+    "completeness": "Complétude",
+    "coherence": "Cohérence",
+    "clarity": "Clarté",
+    "feasibility": "Faisabilité",
+    "quality": "Qualité"
+}
+
+_FEEDBACK_LABELS = {
+    "strengths": "Points forts",
+    "weaknesses": "Points faibles",
+    "technical_feedback": "Retours techniques",
+    "functional_feedback": "Retours fonctionnels"
+}
+
+_REQUIREMENT_SECTIONS = (
+    ("security_requirements", "Exigences de sécurité"),
+    ("seo_requirements", "Exigences SEO"),
+    ("accessibility_requirements", "Exigences d'accessibilité")
+)
+
+_HTML_STYLE = (
+    "body{font-family:system-ui,sans-serif;max-width:60rem;margin:2rem auto;padding:0 1rem;"
+    "line-height:1.5;color:#222}table{border-collapse:collapse;margin:1rem 0}"
+    "th,td{border:1px solid #ccc;padding:.3rem .6rem;text-align:left}"
+    "section.page{border-left:3px solid #4a7;padding-left:1rem;margin:1rem 0}"
+)
+
+_PRINT_STYLE = (
+    "@page{size:A4;margin:2cm}body{font-family:Georgia,serif;font-size:11pt;line-height:1.4;color:#000}"
+    "h1{font-size:20pt}h2{font-size:15pt;break-after:avoid}h3{break-after:avoid}"
+    "table{border-collapse:collapse;width:100%;break-inside:avoid}"
+    "th,td{border:1px solid #000;padding:2pt 4pt;text-align:left}"
+    "section.page{break-inside:avoid}section.pages,section.evaluations,section.history{break-before:page}"
+)
+
+# Gabarits des formats textuels : `{{nom}}` est échappé selon le format, `{{!nom}}` inséré tel quel
+TEMPLATES: Dict[str, Dict[str, str]] = {
+    "markdown": {
+        "document_start": "# {{title}}\n\n",
+        "document_end": "",
+        "section_start": "## {{title}}\n\n",
+        "section_end": "",
+        "page_start": "### {{title}} (`{{key}}`)\n\n",
+        "page_end": "",
+        "subsection": "### {{title}}\n\n",
+        "paragraph": "{{text}}\n\n",
+        "field": "**{{label}}** : {{value}}\n\n",
+        "label": "**{{label}}**\n\n",
+        "list_start": "",
+        "list_item": "- {{text}}\n",
+        "list_end": "\n",
+        "labelled_item": "- **{{label}}** : {{value}}\n",
+        "table_header": "| {{!cells}} |\n|{{!rule}}\n",
+        "table_row": "| {{!cells}} |\n",
+        "table_end": "\n"
+    },
+    "html": {
+        "document_start": (
+            "<!DOCTYPE html>\n<html lang=\"fr\">\n<head>\n<meta charset=\"utf-8\">\n"
+            "<title>{{title}}</title>\n<style>{{!style}}</style>\n</head>\n<body>\n<h1>{{title}}</h1>\n"
+        ),
+        "document_end": "</body>\n</html>\n",
+        "section_start": "<section class=\"{{!name}}\">\n<h2>{{title}}</h2>\n",
+        "section_end": "</section>\n",
+        "page_start": "<section class=\"page\" id=\"page-{{key}}\">\n<h3>{{title}}</h3>\n",
+        "page_end": "</section>\n",
+        "subsection": "<h3>{{title}}</h3>\n",
+        "paragraph": "<p>{{text}}</p>\n",
+        "field": "<p><strong>{{label}}</strong> : {{value}}</p>\n",
+        "label": "<p><strong>{{label}}</strong></p>\n",
+        "list_start": "<ul>\n",
+        "list_item": "<li>{{text}}</li>\n",
+        "list_end": "</ul>\n",
+        "labelled_item": "<li><strong>{{label}}</strong> : {{value}}</li>\n",
+        "table_header": "<table>\n<thead><tr><th>{{!cells}}</th></tr></thead>\n<tbody>\n",
+        "table_row": "<tr><td>{{!cells}}</td></tr>\n",
+        "table_end": "</tbody>\n</table>\n"
+    }
+}
+
+# Séparateurs des cellules de tableau (en-tête, ligne) par format
+_CELL_SEPARATORS = {
+    "markdown": (" | ", " | "),
+    "html": ("</th><th>", "</td><td>")
+}
+
+_PLACEHOLDER = re.compile(r"\{\{(!?)(\w+)\}\}")
+
+
+@lru_cache(maxsize=None)
+def compile_template(template: str) -> Tuple[Tuple[str, Optional[str], bool], ...]:
+    """Découpe un gabarit en segments (texte, variable, brut), une seule fois par gabarit."""
+    segments = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(template):
+        segments.append((template[position:match.start()], match.group(2), match.group(1) == "!"))
+        position = match.end()
+    segments.append((template[position:], None, False))
+    return tuple(segments)
+
+
+def _escape_markdown(value: str) -> str:
+    # Une barre verticale casserait les tableaux
+    return value.replace("|", "\\|")
+
+
+@dataclass
+class ExportDocument:
+    """Spécification à exporter, avec ses métadonnées, évaluations et historique."""
+    specification: Dict[str, Any]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    evaluations: List[Dict[str, Any]] = field(default_factory=list)
+    history: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "metadata": self.metadata,
+            "specification": self.specification,
+            "evaluations": self.evaluations,
+            "history": self.history
+        }
+
+
+class _TextRenderer:
+    """Rendu Markdown ou HTML d'un document, produit morceau par morceau."""
+
+    def __init__(self, fmt: str, style: str = ""):
+        self.templates = {name: compile_template(text) for name, text in TEMPLATES[fmt].items()}
+        self.escape: Callable[[str], str] = html.escape if fmt == "html" else _escape_markdown
+        self.separators = _CELL_SEPARATORS[fmt]
+        self.style = style
+
+    def fill(self, template: str, **values: Any) -> Iterator[str]:
+        for text, variable, raw in self.templates[template]:
+            if text:
+                yield text
+            if variable is not None:
+                value = "" if values.get(variable) is None else str(values[variable])
+                yield value if raw else self.escape(value)
+
+    def items(self, values: Iterable[Any]) -> Iterator[str]:
+        yield from self.fill("list_start")
+        for value in values:
+            yield from self.fill("list_item", text=value)
+        yield from self.fill("list_end")
+
+    def table(self, header: List[str], rows: Iterable[List[Any]]) -> Iterator[str]:
+        header_separator, row_separator = self.separators
+        yield from self.fill(
+            "table_header",
+            cells=header_separator.join(self.escape(cell) for cell in header),
+            rule="---|" * len(header)
+        )
+        for row in rows:
+            yield from self.fill(
+                "table_row",
+                cells=row_separator.join(
+                    self.escape("" if cell is None else " ".join(str(cell).split())) for cell in row
+                )
+            )
+        yield from self.fill("table_end")
+
+    def render(self, document: ExportDocument) -> Iterator[str]:
+        spec = document.specification
+        metadata = document.metadata
+        yield from self.fill("document_start", title=spec.get("project_name", ""), style=self.style)
+        if metadata.get("version_id"):
+            yield from self.fill(
+                "field", label="Version",
+                value=f"{metadata['version_id']} ({metadata.get('agent_name', '')}, {_format_date(metadata.get('created_at'))})"
+            )
+        yield from self.fill("paragraph", text=spec.get("description", ""))
+        yield from self.fill("field", label="Public cible", value=spec.get("target_audience", ""))
+        yield from self.fill("field", label="Design responsive", value="oui" if spec.get("responsive_design") else "non")
+
+        yield from self.fill("section_start", name="pages", title="Pages")
+        for key, page in (spec.get("pages") or {}).items():
+            yield from self.fill("page_start", key=key, title=page.get("name", key))
+            yield from self.fill("paragraph", text=page.get("description", ""))
+            for attribute, label in (
+                ("components", "Composants"),
+                ("dynamic_elements", "Éléments dynamiques"),
+                ("interactions", "Interactions")
+            ):
+                if page.get(attribute):
+                    yield from self.fill("field", label=label, value=", ".join(page[attribute]))
+            yield from self.fill("page_end")
+        yield from self.fill("section_end")
+
+        yield from self.fill("section_start", name="features", title="Fonctionnalités")
+        yield from self.items(spec.get("features") or [])
+        yield from self.fill("section_end")
+
+        yield from self.fill("section_start", name="tech-stack", title="Stack technique")
+        yield from self.fill("list_start")
+        for category, technologies in (spec.get("tech_stack") or {}).items():
+            yield from self.fill("labelled_item", label=category, value=", ".join(technologies))
+        yield from self.fill("list_end")
+        yield from self.fill("section_end")
+
+        if spec.get("performance_requirements"):
+            yield from self.fill("section_start", name="performance", title="Exigences de performance")
+            yield from self.fill("list_start")
+            for name, value in spec["performance_requirements"].items():
+                yield from self.fill("labelled_item", label=name, value=value)
+            yield from self.fill("list_end")
+            yield from self.fill("section_end")
+
+        for attribute, title in _REQUIREMENT_SECTIONS:
+            if spec.get(attribute):
+                yield from self.fill("section_start", name=attribute.replace("_", "-"), title=title)
+                yield from self.items(spec[attribute])
+                yield from self.fill("section_end")
+
+        if document.evaluations:
+            yield from self.fill("section_start", name="evaluations", title="Évaluations")
+            for evaluation in document.evaluations:
+                yield from self.evaluation(evaluation)
+            yield from self.fill("section_end")
+
+        if document.history:
+            yield from self.fill("section_start", name="history", title="Historique des versions")
+            yield from self.table(
+                ["Version", "Agent", "Action", "Date"],
+                (
+                    [version["version_id"], version["agent_name"], version["action_type"],
+                     _format_date(version["created_at"])]
+                    for version in document.history
+                )
+            )
+            yield from self.fill("section_end")
+        yield from self.fill("document_end")
+
+    def evaluation(self, evaluation: Dict[str, Any]) -> Iterator[str]:
+        yield from self.fill(
+            "subsection",
+            title=f"Score {evaluation.get('total_score', 0):.2f} ({_format_date(evaluation.get('timestamp'))})"
+        )
+        yield from self.table(
+            ["Critère", "Score"],
+            (
+                [_CRITERIA_LABELS.get(name, name), score]
+                for name, score in (evaluation.get("criteria") or {}).items() if score is not None
+            )
+        )
+        for category, remarks in (evaluation.get("feedback") or {}).items():
+            if remarks:
+                yield from self.fill("label", label=_FEEDBACK_LABELS.get(category, category))
+                yield from self.items(remarks)
+        if evaluation.get("improvement_suggestions"):
+            yield from self.fill("label", label="Suggestions d'amélioration")
+            yield from self.items(evaluation["improvement_suggestions"])
+
+
+def _format_date(value: Any) -> str:
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value).strftime("%Y-%m-%d %H:%M")
+    return str(value or "")[:16].replace("T", " ")
+
+
+# Scalaires YAML pouvant être écrits sans guillemets
+_YAML_PLAIN = re.compile(r"^[A-Za-zÀ-ÿ_][\w À-ÿ.,'()/+-]*$")
+_YAML_RESERVED = {"y", "n", "yes", "no", "on", "off", "true", "false", "null", "none", "~"}
+
+
+def _yaml_scalar(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    text = str(value)
+    if _YAML_PLAIN.match(text) and not text.endswith(" ") and text.lower() not in _YAML_RESERVED:
+        return text
+    # Une chaîne JSON est un scalaire YAML valide entre guillemets doubles
+    return json.dumps(text, ensure_ascii=False)
+
+
+def _yaml_lines(value: Any, indent: int = 0) -> Iterator[str]:
+    """Émetteur YAML en flux (dictionnaires, listes et scalaires JSON)."""
+    pad = " " * indent
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, (dict, list)) and item:
+                yield f"{pad}{_yaml_scalar(key)}:\n"
+                yield from _yaml_lines(item, indent + 2)
+            else:
+                yield f"{pad}{_yaml_scalar(key)}: {_yaml_block(item)}\n"
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, (dict, list)) and item:
+                # Le premier élément d'un bloc imbriqué partage la ligne du tiret
+                lines = _yaml_lines(item, indent + 2)
+                yield f"{pad}- {next(lines).lstrip()}"
+                yield from lines
+            else:
+                yield f"{pad}- {_yaml_block(item)}\n"
+    else:
+        yield f"{pad}{_yaml_block(value)}\n"
+
+
+def _yaml_block(value: Any) -> str:
+    if isinstance(value, dict):
+        return "{}"
+    if isinstance(value, list):
+        return "[]"
+    return _yaml_scalar(value)
+
+
+def render(document: ExportDocument, fmt: str) -> Iterator[str]:
+    """Produit l'export d'un document morceau par morceau, sans le construire en mémoire."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Format d'export inconnu : {fmt} (formats : {', '.join(FORMATS)})")
+    if fmt == "json":
+        return json.JSONEncoder(ensure_ascii=False, indent=2, default=str).iterencode(document.to_dict())
+    if fmt == "yaml":
+        return _yaml_lines(json.loads(json.dumps(document.to_dict(), default=str)))
+    if fmt == "print":
+        return _TextRenderer("html", _PRINT_STYLE).render(document)
+    return _TextRenderer(fmt, _HTML_STYLE if fmt == "html" else "").render(document)
+
+
+class SpecificationExporter:
+    """Export des spécifications stockées, une version ou toutes celles d'un projet.
+
+    Le rendu est écrit dans le fichier au fil de sa production et les
+    versions d'un projet sont lues par pages : la mémoire utilisée ne dépend
+    ni de la taille des spécifications ni du nombre de versions exportées.
+    """
+
+    def __init__(self, context_manager: Optional[ContextManager] = None, page_size: int = 50):
+        self.context_manager = context_manager or get_context_manager()
+        self.page_size = page_size
+        self.logger = get_logger("SpecificationExporter")
+
+    def build_document(
+        self,
+        version_id: str,
+        include_evaluations: bool = True,
+        include_history: bool = True
+    ) -> ExportDocument:
+        """Rassemble une version, ses évaluations et son historique."""
+        check_version_id(version_id)
+        version = self.context_manager.get_specification_version(version_id)
+        if version is None or version["action_type"] not in SPECIFICATION_ACTIONS:
+            raise ValueError(f"Version de spécification introuvable : {version_id}")
+        metadata = {key: value for key, value in version.items() if key != "data"}
+        evaluations = [
+            child["data"] for child in self.context_manager.get_child_versions(version_id)
+            if child["action_type"] == "evaluation"
+        ] if include_evaluations else []
+        history = [
+            entry for entry in self.context_manager.get_version_history(version_id, with_data=False)
+            if entry["action_type"] in SPECIFICATION_ACTIONS
+        ] if include_history else []
+        return ExportDocument(
+            specification=version["data"],
+            metadata=metadata,
+            evaluations=evaluations,
+            history=[{key: value for key, value in entry.items() if key != "data"} for entry in history]
+        )
+
+    def export(self, version_id: str, fmt: str, **options: bool) -> Iterator[str]:
+        """Rendu d'une version dans un format, morceau par morceau."""
+        return render(self.build_document(version_id, **options), fmt)
+
+    def export_to_file(self, version_id: str, fmt: str, path: Union[str, Path], **options: bool) -> Path:
+        """Écrit l'export d'une version dans un fichier.
+
+        Rien n'est créé sur le disque tant que la version n'a pas été trouvée.
+        """
+        document = self.build_document(version_id, **options)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as output:
+            for chunk in render(document, fmt):
+                output.write(chunk)
+        get_metrics().counter(
+            "specification_exports_total", "Spécifications exportées par format", ("format",)
+        ).inc(format=fmt)
+        self.logger.debug(f"Version {version_id} exportée en {fmt} : {path}")
+        return path
+
+    def iter_specification_versions(self, project_id: str) -> Iterator[Dict[str, Any]]:
+        """Métadonnées des versions de spécification d'un projet, lues par pages."""
+        offset = 0
+        while True:
+            page = self.context_manager.list_versions(
+                project_id, limit=self.page_size, offset=offset, with_data=False
+            )
+            for version in page:
+                if version["action_type"] in SPECIFICATION_ACTIONS:
+                    yield version
+            if len(page) < self.page_size:
+                return
+            offset += len(page)
+
+    def export_project(
+        self,
+        project_id: str,
+        fmt: str,
+        directory: Union[str, Path],
+        **options: bool
+    ) -> List[Path]:
+        """Exporte chaque version de spécification d'un projet dans un répertoire."""
+        directory = Path(directory)
+        paths = [
+            self.export_to_file(
+                version["version_id"], fmt, directory / f"{version['version_id']}{FORMATS[fmt]}", **options
+            )
+            for version in self.iter_specification_versions(project_id)
+        ]
+        self.logger.info(f"{len(paths)} version(s) du projet {project_id} exportée(s) dans {directory}")
+        return paths
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export des spécifications stockées")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--version", help="Version de spécification à exporter")
+    target.add_argument("--project", help="Projet dont toutes les versions sont exportées")
+    parser.add_argument("-f", "--format", choices=sorted(FORMATS), default="markdown", help="Format d'export")
+    parser.add_argument(
+        "-o", "--output",
+        help="Fichier (--version, sortie standard par défaut) ou répertoire (--project, défaut : EXPORT_DIR)"
+    )
+    parser.add_argument("--no-evaluations", action="store_true", help="Sans les évaluations")
+    parser.add_argument("--no-history", action="store_true", help="Sans l'historique des versions")
+    args = parser.parse_args(argv)
+
+    exporter = SpecificationExporter()
+    options = {"include_evaluations": not args.no_evaluations, "include_history": not args.no_history}
+    if args.project:
+        paths = exporter.export_project(
+            args.project, args.format, args.output or os.getenv("EXPORT_DIR", "exports"), **options
+        )
+        print(json.dumps({"project_id": args.project, "exported": len(paths)}))
+    elif args.output:
+        print(exporter.export_to_file(args.version, args.format, args.output, **options))
+    else:
+        for chunk in exporter.export(args.version, args.format, **options):
+            sys.stdout.write(chunk)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import difflib
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Mots trop génériques pour rattacher une ligne modifiée à une page
+_STOPWORDS = {
+    "page", "pages", "section", "sections", "avec", "dans", "pour", "nous", "sera",
+    "seront", "aura", "aurons", "contenant", "contiendra", "cette", "chaque", "liste",
+    "bouton", "aussi", "plus", "tous", "toutes", "entre", "sont", "être", "etre"
+}
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def _keywords(text: str) -> Set[str]:
+    words = re.findall(r"[a-z0-9]+", _normalize(text))
+    return {word for word in words if len(word) >= 4 and word not in _STOPWORDS}
+
+
+def changed_lines(previous_input: str, new_input: str) -> List[str]:
+    """Retourne les lignes ajoutées ou supprimées entre deux soumissions."""
+    previous_lines = [line.strip() for line in (previous_input or "").splitlines() if line.strip()]
+    new_lines = [line.strip() for line in (new_input or "").splitlines() if line.strip()]
+    return [
+        line[2:]
+        for line in difflib.ndiff(previous_lines, new_lines)
+        if line.startswith(("+ ", "- "))
+    ]
+
+
+def affected_sections(pages: Dict[str, Any], lines: Iterable[str]) -> Optional[List[str]]:
+    """Rattache les lignes modifiées aux pages de la spécification.
+
+    Une page est concernée lorsque la ligne mentionne un mot-clé de son
+    identifiant ou de son nom. Retourne None si une ligne ne correspond à
+    aucune page : la modification est alors considérée comme globale.
+    """
+    page_keywords = {}
+    for key, page in pages.items():
+        name = page.get("name", "") if isinstance(page, dict) else getattr(page, "name", "")
+        page_keywords[key] = _keywords(f"{key} {name}")
+
+    affected: List[str] = []
+    for line in lines:
+        line_keywords = _keywords(line)
+        matches = [key for key, keywords in page_keywords.items() if keywords & line_keywords]
+        if not matches:
+            return None
+        for key in matches:
+            if key not in affected:
+                affected.append(key)
+    return affected
+
+
+def scope_specification(spec_data: Dict[str, Any], sections: Iterable[str]) -> Dict[str, Any]:
+    """Retourne une copie superficielle de la spécification limitée aux pages indiquées."""
+    sections = set(sections)
+    scoped = dict(spec_data)
+    scoped["pages"] = {key: page for key, page in spec_data["pages"].items() if key in sections}
+    return scoped
+
+
+def blend_scores(previous: float, scoped: float, changed: int, total: int) -> float:
+    """Combine un score partiel (pages modifiées) avec le score précédent (pages inchangées)."""
+    if total <= 0:
+        return scoped
+    ratio = min(max(changed / total, 0.0), 1.0)
+    return previous * (1 - ratio) + scoped * ratio
@@ -0,0 +1,469 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+from utils.compact_history import freeze, thaw
+from utils.database import connect
+from utils.spec_diff import apply_patch_shared, diff
+
+
+def _json_default(value: Any) -> Any:
+    """Sérialise les types non gérés nativement par json (dates, énumérations, modèles)."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
+
+
+def dumps(data: Any) -> str:
+    """Sérialisation JSON compacte utilisée pour le stockage."""
+    if isinstance(data, BaseModel):
+        # Sérialisation native de pydantic, sans passer par un dictionnaire intermédiaire
+        return data.model_dump_json()
+    return json.dumps(data, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+
+
+class VersionStore:
+    """Stockage SQLite des versions de spécifications et des dépendances entre agents.
+
+    Chaque version est indexée par identifiant, par parent et par projet.
+    La dernière version de chaque projet est maintenue dans une table dédiée
+    afin d'être obtenue en temps constant, et les remontées d'ascendance
+    s'appuient sur des accès par clé primaire.
+
+    Une version dérivée est stockée sous forme de différence (style JSON Patch)
+    par rapport à sa version parente, avec un instantané complet toutes les
+    `snapshot_interval` versions d'une chaîne. Les versions reconstituées sont
+    conservées dans un cache LRU de `cache_size` entrées, sous forme figée
+    (`compact_history.freeze`) : une version partage avec sa parente toutes
+    les pages et listes inchangées.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/context.sqlite3",
+        snapshot_interval: int = 10,
+        cache_size: int = 128
+    ):
+        self.db_path = db_path
+        self.snapshot_interval = snapshot_interval
+        self.cache_size = cache_size
+        self._materialized: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.RLock()
+        # Base partagée par les workers (journal WAL, attente des verrous)
+        self._conn = connect(db_path)
+        self._conn.row_factory = sqlite3.Row
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS versions (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    version_id TEXT NOT NULL UNIQUE,
+                    project_id TEXT NOT NULL,
+                    parent_id TEXT,
+                    agent_name TEXT NOT NULL,
+                    action_type TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    data TEXT NOT NULL,
+                    storage TEXT NOT NULL DEFAULT 'snapshot',
+                    chain_depth INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_versions_parent ON versions (parent_id);
+                CREATE INDEX IF NOT EXISTS idx_versions_project ON versions (project_id, seq);
+                CREATE INDEX IF NOT EXISTS idx_versions_project_action
+                    ON versions (project_id, action_type, seq);
+
+                CREATE TABLE IF NOT EXISTS projects (
+                    project_id TEXT PRIMARY KEY,
+                    latest_version_id TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS dependencies (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    project_id TEXT NOT NULL,
+                    source_agent TEXT NOT NULL,
+                    target_agent TEXT NOT NULL,
+                    source_version_id TEXT,
+                    context_type TEXT,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_dependencies_target
+                    ON dependencies (target_agent, priority, id);
+                CREATE INDEX IF NOT EXISTS idx_dependencies_source_version
+                    ON dependencies (source_version_id);
+
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT NOT NULL,
+                    project_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    title TEXT,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, project_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_sessions_recent ON sessions (session_id, created_at);
+                """
+            )
+            # Migration des bases créées avant le stockage différentiel
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(versions)")}
+            if "storage" not in columns:
+                self._conn.execute(
+                    "ALTER TABLE versions ADD COLUMN storage TEXT NOT NULL DEFAULT 'snapshot'"
+                )
+            if "chain_depth" not in columns:
+                self._conn.execute(
+                    "ALTER TABLE versions ADD COLUMN chain_depth INTEGER NOT NULL DEFAULT 0"
+                )
+            self._conn.commit()
+
+    def add_version(
+        self,
+        project_id: str,
+        data: Union[Dict[str, Any], BaseModel],
+        agent_name: str,
+        action_type: str,
+        parent_id: Optional[str] = None,
+        version_id: Optional[str] = None
+    ) -> str:
+        """Enregistre une nouvelle version et retourne son identifiant.
+
+        La version est stockée en différentiel par rapport à son parent lorsque
+        cela est plus compact, et en instantané complet sinon.
+        """
+        version_id = version_id or uuid.uuid4().hex
+        now = time.time()
+        payload = dumps(data)
+        normalized = json.loads(payload)
+        storage, chain_depth = "snapshot", 0
+        with self._lock:
+            parent = None
+            if parent_id is not None:
+                parent = self._conn.execute(
+                    "SELECT chain_depth FROM versions WHERE version_id = ?", (parent_id,)
+                ).fetchone()
+            if parent is None:
+                normalized = freeze(normalized)
+            else:
+                parent_data = self._materialize(parent_id)
+                normalized = freeze(normalized, parent_data)
+                if parent["chain_depth"] + 1 < self.snapshot_interval:
+                    delta = dumps(diff(parent_data, normalized))
+                    if len(delta) < len(payload):
+                        payload = delta
+                        storage, chain_depth = "delta", parent["chain_depth"] + 1
+
+            self._conn.execute(
+                "INSERT INTO versions (version_id, project_id, parent_id, agent_name, action_type, "
+                "created_at, data, storage, chain_depth) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (version_id, project_id, parent_id, agent_name, action_type, now, payload,
+                 storage, chain_depth)
+            )
+            self._conn.execute(
+                "INSERT INTO projects (project_id, latest_version_id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(project_id) DO UPDATE SET latest_version_id = excluded.latest_version_id, "
+                "updated_at = excluded.updated_at",
+                (project_id, version_id, now)
+            )
+            self._conn.commit()
+            self._remember(version_id, normalized)
+        return version_id
+
+    def get_version(self, version_id: str, frozen: bool = False) -> Optional[Dict[str, Any]]:
+        """Retourne une version (métadonnées et données) par son identifiant.
+
+        Avec `frozen=True`, les données sont celles du cache (figées, partagées,
+        à ne pas modifier) au lieu d'une copie.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM versions WHERE version_id = ?", (version_id,)
+            ).fetchone()
+        return self._row_to_version(row, frozen=frozen) if row else None
+
+    def get_project_id(self, version_id: str) -> Optional[str]:
+        """Retourne le projet auquel appartient une version."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT project_id FROM versions WHERE version_id = ?", (version_id,)
+            ).fetchone()
+        return row["project_id"] if row else None
+
+    def get_latest_version(
+        self,
+        project_id: str,
+        action_type: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Retourne la dernière version d'un projet, éventuellement filtrée par type d'action."""
+        with self._lock:
+            if action_type is None:
+                row = self._conn.execute(
+                    "SELECT v.* FROM projects p JOIN versions v ON v.version_id = p.latest_version_id "
+                    "WHERE p.project_id = ?",
+                    (project_id,)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT * FROM versions WHERE project_id = ? AND action_type = ? "
+                    "ORDER BY seq DESC LIMIT 1",
+                    (project_id, action_type)
+                ).fetchone()
+        return self._row_to_version(row) if row else None
+
+    def get_children(self, version_id: str) -> List[Dict[str, Any]]:
+        """Retourne les versions directement dérivées d'une version."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM versions WHERE parent_id = ? ORDER BY seq", (version_id,)
+            ).fetchall()
+        return [self._row_to_version(row) for row in rows]
+
+    def get_ancestry(
+        self,
+        version_id: str,
+        max_depth: Optional[int] = None,
+        with_data: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Retourne la chaîne des versions, de la version donnée jusqu'à la racine.
+
+        Avec `with_data=False`, seules les métadonnées sont retournées : les
+        versions stockées en delta ne sont pas reconstruites.
+        """
+        depth_limit = -1 if max_depth is None else max_depth
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                WITH RECURSIVE ancestry(version_id, parent_id, depth) AS (
+                    SELECT version_id, parent_id, 0 FROM versions WHERE version_id = ?
+                    UNION ALL
+                    SELECT v.version_id, v.parent_id, a.depth + 1
+                    FROM versions v JOIN ancestry a ON v.version_id = a.parent_id
+                    WHERE ? < 0 OR a.depth + 1 <= ?
+                )
+                SELECT v.* FROM ancestry a JOIN versions v ON v.version_id = a.version_id
+                ORDER BY a.depth
+                """,
+                (version_id, depth_limit, depth_limit)
+            ).fetchall()
+        return [self._row_to_version(row, with_data) for row in rows]
+
+    def list_versions(
+        self,
+        project_id: str,
+        limit: int = 50,
+        offset: int = 0,
+        newest_first: bool = True,
+        with_data: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Liste paginée des versions d'un projet (métadonnées seules si `with_data=False`)."""
+        order = "DESC" if newest_first else "ASC"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM versions WHERE project_id = ? ORDER BY seq {order} LIMIT ? OFFSET ?",
+                (project_id, limit, offset)
+            ).fetchall()
+        return [self._row_to_version(row, with_data) for row in rows]
+
+    def list_projects(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Liste paginée des projets, du plus récemment modifié au plus ancien."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM projects ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_session_entry(self, session_id: str, project_id: str, kind: str, title: Optional[str] = None) -> None:
+        """Rattache un projet (évaluation, workflow, traitement en arrière-plan) à une session.
+
+        Un projet déjà rattaché (nouvelle soumission) remonte en tête de l'historique.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, project_id, kind, title, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id, project_id) DO UPDATE SET created_at = excluded.created_at",
+                (session_id, project_id, kind, title, time.time())
+            )
+            self._conn.commit()
+
+    def list_session_entries(self, session_id: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """Liste paginée des projets d'une session, du plus récent au plus ancien.
+
+        Chaque entrée indique le nombre de versions de spécification du projet
+        et le score de sa dernière soumission, lus sans reconstituer les versions.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT s.*,
+                    (SELECT COUNT(*) FROM versions v WHERE v.project_id = s.project_id
+                        AND v.action_type IN ('creation', 'update', 'optimization')) AS versions,
+                    (SELECT json_extract(v.data, '$.evaluation.total_score') FROM versions v
+                        WHERE v.project_id = s.project_id AND v.action_type = 'submission'
+                        AND v.storage = 'snapshot' ORDER BY v.seq DESC LIMIT 1) AS score
+                FROM sessions s WHERE s.session_id = ?
+                ORDER BY s.created_at DESC LIMIT ? OFFSET ?
+                """,
+                (session_id, limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_session_entries(self, session_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0]
+
+    def get_session_entry(self, session_id: str, project_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM sessions WHERE session_id = ? AND project_id = ?", (session_id, project_id)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def find_session_project(self, session_id: str, title: Optional[str], kinds: List[str]) -> Optional[str]:
+        """Projet le plus récent d'une session portant ce titre, parmi les types d'entrée indiqués."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT project_id FROM sessions WHERE session_id = ? AND title IS ? "
+                f"AND kind IN ({', '.join('?' * len(kinds))}) ORDER BY created_at DESC LIMIT 1",
+                (session_id, title, *kinds)
+            ).fetchone()
+        return row["project_id"] if row else None
+
+    def add_dependency(
+        self,
+        project_id: str,
+        source_agent: str,
+        target_agent: str,
+        context_data: Dict[str, Any]
+    ) -> int:
+        """Enregistre une dépendance entre agents et retourne son identifiant."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO dependencies (project_id, source_agent, target_agent, source_version_id, "
+                "context_type, priority, created_at, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    project_id,
+                    source_agent,
+                    target_agent,
+                    context_data.get("source_version_id"),
+                    context_data.get("context_type"),
+                    int(context_data.get("priority", 0)),
+                    time.time(),
+                    dumps(context_data)
+                )
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def get_dependencies(self, target_agent: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Retourne les dépendances destinées à un agent, par priorité puis ancienneté."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM dependencies WHERE target_agent = ? ORDER BY priority, id LIMIT ?",
+                (target_agent, limit)
+            ).fetchall()
+        return [self._row_to_dependency(row) for row in rows]
+
+    def get_dependency(self, dependency_id: int) -> Optional[Dict[str, Any]]:
+        """Retourne une dépendance par son identifiant."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM dependencies WHERE id = ?", (dependency_id,)
+            ).fetchone()
+        return self._row_to_dependency(row) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _remember(self, version_id: str, data: Any) -> None:
+        """Ajoute une version reconstituée au cache LRU."""
+        self._materialized[version_id] = data
+        self._materialized.move_to_end(version_id)
+        while len(self._materialized) > self.cache_size:
+            self._materialized.popitem(last=False)
+
+    def _materialize(self, version_id: str) -> Any:
+        """Reconstitue les données figées d'une version depuis l'instantané le plus proche.
+
+        Le résultat est partagé avec le cache et avec les versions voisines.
+        """
+        with self._lock:
+            if version_id in self._materialized:
+                self._materialized.move_to_end(version_id)
+                return self._materialized[version_id]
+
+            # Remontée de la chaîne de différentiels jusqu'à un instantané ou une version en cache
+            patches: List[List[Dict[str, Any]]] = []
+            current_id = version_id
+            base = None
+            while base is None:
+                if current_id in self._materialized:
+                    base = self._materialized[current_id]
+                    break
+                row = self._conn.execute(
+                    "SELECT parent_id, data, storage FROM versions WHERE version_id = ?",
+                    (current_id,)
+                ).fetchone()
+                if row is None:
+                    raise KeyError(f"Version introuvable : {current_id}")
+                if row["storage"] == "snapshot":
+                    # Parties inchangées partagées avec le parent s'il est en cache
+                    base = freeze(json.loads(row["data"]), self._materialized.get(row["parent_id"]))
+                else:
+                    patches.append(json.loads(row["data"]))
+                    current_id = row["parent_id"]
+
+            # Seuls les chemins modifiés sont copiés, le reste est partagé avec la version de base
+            for ops in reversed(patches):
+                base = apply_patch_shared(base, ops, value_factory=freeze)
+            self._remember(version_id, base)
+            return base
+
+    def _row_to_version(self, row: sqlite3.Row, with_data: bool = True, frozen: bool = False) -> Dict[str, Any]:
+        if not with_data:
+            data = None
+        elif frozen:
+            data = self._materialize(row["version_id"])
+        elif row["storage"] == "snapshot":
+            data = json.loads(row["data"])
+        else:
+            data = thaw(self._materialize(row["version_id"]))
+        return {
+            "version_id": row["version_id"],
+            "project_id": row["project_id"],
+            "parent_id": row["parent_id"],
+            "agent_name": row["agent_name"],
+            "action_type": row["action_type"],
+            "created_at": row["created_at"],
+            "data": data
+        }
+
+    @staticmethod
+    def _row_to_dependency(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "project_id": row["project_id"],
+            "source_agent": row["source_agent"],
+            "target_agent": row["target_agent"],
+            "created_at": row["created_at"],
+            "context": json.loads(row["data"])
+        }
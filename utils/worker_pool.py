@@ -0,0 +1,310 @@
+import asyncio
+import inspect
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Set
+
+from utils.logging_config import get_logger
+from utils.metrics import get_metrics, start_metrics_server
+
+# Messages d'un worker vers le processus principal : (requête, type, valeur)
+_ITEM = "item"
+_DONE = "done"
+_ERROR = "error"
+
+
+def _worker_main(
+    index: int,
+    conn: Connection,
+    initializer: Optional[Callable[[], None]]
+) -> None:
+    """Point d'entrée d'un worker : exécute les tâches reçues jusqu'au signal d'arrêt."""
+    os.environ["WORKER_ID"] = str(index)
+    # Un fichier de log et un port de métriques par worker
+    log_name, _, log_ext = os.getenv("LOG_FILE", "agent.log").rpartition(".")
+    os.environ["LOG_FILE"] = f"{log_name}.worker-{index}.{log_ext}" if log_name else f"{log_ext}.worker-{index}"
+    metrics_port = int(os.getenv("METRICS_PORT") or 0)
+    if metrics_port:
+        start_metrics_server(metrics_port + 1 + index)
+    if initializer is not None:
+        initializer()
+    asyncio.run(_serve(conn))
+
+
+async def _serve(conn: Connection) -> None:
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    running = set()
+
+    async def run(request_id: str, func: Callable, args: tuple) -> None:
+        try:
+            output = func(*args)
+            if inspect.isasyncgen(output):
+                async for item in output:
+                    conn.send((request_id, _ITEM, item))
+            elif inspect.isgenerator(output):
+                done = object()
+                while True:
+                    item = await asyncio.to_thread(next, output, done)
+                    if item is done:
+                        break
+                    conn.send((request_id, _ITEM, item))
+            else:
+                conn.send((request_id, _ITEM, await output if inspect.isawaitable(output) else output))
+            conn.send((request_id, _DONE, None))
+        except Exception as e:
+            conn.send((request_id, _ERROR, f"{type(e).__name__}: {e}"))
+
+    def start(task: tuple) -> None:
+        future = asyncio.ensure_future(run(*task))
+        running.add(future)
+        future.add_done_callback(running.discard)
+
+    def read_tasks() -> None:
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                task = None
+            if task is None:
+                loop.call_soon_threadsafe(stopped.set)
+                return
+            loop.call_soon_threadsafe(start, task)
+
+    threading.Thread(target=read_tasks, name="worker-tasks", daemon=True).start()
+    await stopped.wait()
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+@dataclass
+class _Worker:
+    process: BaseProcess
+    conn: Connection
+    active: Set[str] = field(default_factory=set)
+
+
+class WorkerPool:
+    """Processus workers derrière la file d'attente de Gradio.
+
+    Les tâches sont des fonctions de module (sérialisables par référence) ;
+    les générateurs, synchrones ou asynchrones, sont relayés élément par
+    élément vers l'appelant. Chaque tâche est confiée au worker le moins
+    chargé, dans la limite de `max_tasks` tâches simultanées par worker ;
+    au-delà, elle attend dans le processus principal. Un worker arrêté
+    brutalement est relancé et ses requêtes en cours échouent ; l'état
+    (versions, dépendances, caches) est partagé par les bases SQLite et
+    survit donc au changement de worker.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_tasks: int = 8,
+        initializer: Optional[Callable[[], None]] = None,
+        start_method: str = "spawn"
+    ):
+        self.workers = workers
+        self.max_tasks = max_tasks
+        self.initializer = initializer
+        self._context = multiprocessing.get_context(start_method)
+        self._workers: List[_Worker] = []
+        self._pending: Deque[tuple] = deque()
+        self._routes: Dict[str, Callable[[str, Any], None]] = {}
+        self._lock = threading.Lock()
+        self._closing = False
+        self._dispatcher: Optional[threading.Thread] = None
+        self.logger = get_logger("WorkerPool")
+
+    def start(self) -> "WorkerPool":
+        self._workers = [self._spawn(index) for index in range(self.workers)]
+        self._dispatcher = threading.Thread(target=self._dispatch, name="worker-results", daemon=True)
+        self._dispatcher.start()
+        self.logger.info("%d workers démarrés (%d tâches simultanées chacun)", self.workers, self.max_tasks)
+        return self
+
+    def _spawn(self, index: int) -> _Worker:
+        # Un canal par worker : un worker arrêté brutalement ne bloque pas les autres
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, child_conn, self.initializer),
+            name=f"worker-{index}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process=process, conn=conn)
+
+    def _schedule(self) -> None:
+        # Appelé avec self._lock : attribue les tâches en attente aux workers les moins chargés
+        while self._pending:
+            workers = [candidate for candidate in self._workers if candidate.process.is_alive()]
+            if not workers:
+                return
+            worker = min(workers, key=lambda candidate: len(candidate.active))
+            if len(worker.active) >= self.max_tasks:
+                return
+            request_id, func, args = task = self._pending.popleft()
+            if request_id not in self._routes:
+                continue
+            worker.active.add(request_id)
+            try:
+                worker.conn.send(task)
+            except OSError:
+                # Worker arrêté entre-temps : la requête échouera à son redémarrage
+                return
+
+    def _dispatch(self) -> None:
+        """Relaie les messages des workers vers les requêtes en attente et relance les workers arrêtés."""
+        while not self._closing:
+            with self._lock:
+                workers = list(enumerate(self._workers))
+            waitables = [worker.conn for _, worker in workers] + [worker.process.sentinel for _, worker in workers]
+            ready = set(wait(waitables, timeout=1.0))
+            for index, worker in workers:
+                if worker.conn in ready:
+                    try:
+                        while worker.conn.poll():
+                            self._deliver(worker, *worker.conn.recv())
+                        continue
+                    except (EOFError, OSError):
+                        pass
+                elif worker.process.sentinel not in ready:
+                    continue
+                if not self._closing:
+                    self._restart(index, worker)
+
+    def _deliver(self, worker: _Worker, request_id: str, kind: str, value: Any) -> None:
+        with self._lock:
+            route = self._routes.get(request_id)
+            if kind in (_DONE, _ERROR):
+                worker.active.discard(request_id)
+                self._schedule()
+        if route is not None:
+            route(kind, value)
+
+    def _restart(self, index: int, worker: _Worker) -> None:
+        worker.process.join(timeout=1.0)
+        self.logger.error(f"Worker {index} arrêté (code {worker.process.exitcode}), redémarrage")
+        get_metrics().counter("worker_restarts_total", "Redémarrages de workers").inc()
+        worker.conn.close()
+        with self._lock:
+            routes = [self._routes.get(request_id) for request_id in worker.active]
+            self._workers[index] = self._spawn(index)
+            self._schedule()
+        for route in routes:
+            if route is not None:
+                route(_ERROR, f"Le worker {index} s'est arrêté pendant le traitement")
+
+    def _submit(self, func: Callable, args: tuple, route: Callable[[str, Any], None]) -> str:
+        if self._closing:
+            raise RuntimeError("Le pool de workers est arrêté")
+        request_id = uuid.uuid4().hex
+        with self._lock:
+            self._routes[request_id] = route
+            self._pending.append((request_id, func, args))
+            self._schedule()
+            inflight = len(self._routes)
+        get_metrics().gauge("worker_pool_inflight", "Requêtes en cours dans le pool de workers").set(inflight)
+        return request_id
+
+    def _release(self, request_id: str) -> None:
+        with self._lock:
+            self._routes.pop(request_id, None)
+            inflight = len(self._routes)
+        get_metrics().gauge("worker_pool_inflight", "Requêtes en cours dans le pool de workers").set(inflight)
+
+    def stream(self, func: Callable, *args) -> Iterator[Any]:
+        """Exécute `func(*args)` dans un worker et produit ses éléments au fil de l'eau."""
+        inbox: queue.SimpleQueue = queue.SimpleQueue()
+        request_id = self._submit(func, args, lambda kind, value: inbox.put((kind, value)))
+        try:
+            while True:
+                kind, value = inbox.get()
+                if kind == _ITEM:
+                    yield value
+                elif kind == _DONE:
+                    return
+                else:
+                    raise RuntimeError(value)
+        finally:
+            self._release(request_id)
+
+    async def stream_async(self, func: Callable, *args) -> AsyncIterator[Any]:
+        """Variante asynchrone de `stream`, pour les fonctions appelées depuis la boucle d'événements."""
+        loop = asyncio.get_running_loop()
+        inbox: asyncio.Queue = asyncio.Queue()
+        request_id = self._submit(
+            func, args, lambda kind, value: loop.call_soon_threadsafe(inbox.put_nowait, (kind, value))
+        )
+        try:
+            while True:
+                kind, value = await inbox.get()
+                if kind == _ITEM:
+                    yield value
+                elif kind == _DONE:
+                    return
+                else:
+                    raise RuntimeError(value)
+        finally:
+            self._release(request_id)
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Laisse les workers terminer leurs tâches en cours puis les arrête."""
+        if self._closing:
+            return
+        self._closing = True
+        with self._lock:
+            self._pending.clear()
+            for worker in self._workers:
+                worker.conn.send(None)
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout=2.0)
+        # Relais des derniers résultats pendant l'arrêt des workers
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            while worker.process.is_alive() and time.monotonic() < deadline:
+                try:
+                    while worker.conn.poll(0.05):
+                        self._deliver(worker, *worker.conn.recv())
+                except (EOFError, OSError):
+                    break
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+
+
+# Pool partagé, créé au premier usage lorsque APP_WORKERS est défini
+_worker_pool: Optional[WorkerPool] = None
+_worker_pool_lock = threading.Lock()
+
+def get_worker_pool(initializer: Optional[Callable[[], None]] = None) -> Optional[WorkerPool]:
+    """Fonction utilitaire pour obtenir le pool de workers partagé.
+
+    Retourne None en mode mono-processus (APP_WORKERS vide ou 0) et dans les
+    workers eux-mêmes. `initializer` n'est pris en compte qu'à la création.
+    """
+    global _worker_pool
+    if os.getenv("WORKER_ID") is not None:
+        return None
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            workers = int(os.getenv("APP_WORKERS") or 0)
+            if workers <= 0:
+                return None
+            _worker_pool = WorkerPool(
+                workers,
+                max_tasks=int(os.getenv("WORKER_MAX_TASKS", "8")),
+                initializer=initializer
+            ).start()
+        return _worker_pool